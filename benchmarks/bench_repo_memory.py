@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+'''
+Benchmark memory used by the scan result of RepoReader on a synthetic repository.
+
+Compares the slotted project and model records, that keep interned relative resource
+paths, against the same result built as dicts with lists of absolute paths, as
+RepoReader used to return. Memory is measured with tracemalloc.
+
+e.g.
+    python benchmarks/bench_repo_memory.py --projects 10 --models 500 --files 10
+'''
+import argparse
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from luna_ml.repository.repo_reader import RepoReader
+from bench_repo_scan import createRepo
+
+def toDicts(projects):
+    '''scan result as dicts with absolute resource paths'''
+    result = {}
+    for projectPath, project in projects.items():
+        models = {}
+        for modelPath, model in project.models.items():
+            models[modelPath] = {
+                "yaml": model.yaml,
+                "resources": [f"{modelPath}/{r}" for r in model.resources.relPaths()],
+                "action": model.action,
+                "commit": model.commit
+            }
+
+        result[projectPath] = {
+            "yaml": project.yaml,
+            "models": models,
+            "modelBasePath": project.modelBasePath,
+            "resources": [f"{projectPath}/{r}" for r in project.resources.relPaths()],
+            "action": project.action,
+            "renamedFrom": project.renamedFrom,
+            "commit": project.commit
+        }
+    return result
+
+def measure(fn):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, size
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--projects", type=int, default=10)
+    parser.add_argument("--models", type=int, default=200)
+    parser.add_argument("--files", type=int, default=20)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    try:
+        createRepo(root, args.projects, args.models, args.files)
+
+        # memory retained by the result after the scan. both include the yaml objects
+        for name, fn in [
+            ("dicts", lambda: toDicts(RepoReader(root).getAll())),
+            ("records", lambda: RepoReader(root).getAll())
+        ]:
+            _, elapsed, size = measure(fn)
+            print(f"{name:<10} {elapsed * 1000:>10.1f} ms   {size / 1024 / 1024:>8.2f} MB")
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+'''
+Benchmark RepoReader.scan() on a synthetic repository.
+
+Compares the single pass os.scandir() walk against the previous glob based scan
+and reports wall time and number of filesystem calls (os.scandir, os.stat, os.lstat)
+made from python. The walk is measured serial and with a thread pool (--parallelism).
+Use --latency to add delay to each os.scandir() call, to simulate a network filesystem.
+
+e.g.
+    python benchmarks/bench_repo_scan.py --projects 20 --models 200 --files 10 --parallelism 8
+'''
+import argparse
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from git import Repo
+from luna_ml.repository.repo_reader import RepoReader
+from luna_ml.api.project_yaml import ProjectYaml
+
+LunaYaml = """
+name: {name}
+version: v1
+kind: luna-ml/project
+evaluators:
+- name: ev1
+  image: python:3.7
+scorer:
+  image: python:3.7
+"""
+
+def createRepo(root, numProjects, numModels, numFiles):
+    Repo.init(root)
+    for p in range(numProjects):
+        projectDir = f"{root}/proj{p}"
+        os.makedirs(f"{projectDir}/src")
+        os.makedirs(f"{projectDir}/eval")
+        with open(f"{projectDir}/{ProjectYaml.FileName}", "w") as f:
+            f.write(LunaYaml.format(name=f"proj{p}"))
+        for i in range(numFiles):
+            with open(f"{projectDir}/src/file{i}", "w") as f:
+                f.write("v")
+            with open(f"{projectDir}/eval/file{i}", "w") as f:
+                f.write("v")
+
+        for m in range(numModels):
+            modelDir = f"{projectDir}/models/m{m}"
+            os.makedirs(f"{modelDir}/weights")
+            for i in range(numFiles):
+                with open(f"{modelDir}/weights/file{i}", "w") as f:
+                    f.write("v")
+
+def legacyScan(repoRootDir):
+    '''glob based scan, as RepoReader.scan() used to do'''
+    projects = {}
+    for filename in glob.glob("{}/**/{}".format(repoRootDir, ProjectYaml.FileName), recursive=True):
+        with open(filename, 'r') as file:
+            projectYaml = ProjectYaml(file.read())
+
+        projectBase = os.path.dirname(filename)
+        modelBasePath = "{}/{}".format(projectBase, projectYaml.modelBasePath.lstrip("/"))
+
+        allFilesUnderProject = glob.glob("{}/**".format(projectBase), recursive=True)
+        allFilesUnderModelBase = glob.glob("{}/**".format(modelBasePath), recursive=True)
+        localEvalResult = glob.glob("{}/eval/**".format(projectBase), recursive=True)
+        localScoreResult = glob.glob("{}/eval/**".format(projectBase), recursive=True)
+        pycache = glob.glob("{}/__pycache__/**".format(projectBase), recursive=True)
+        allFilesUnderProject = [f for f in allFilesUnderProject if os.path.isfile(f)]
+        resources = list(set(allFilesUnderProject) - set(allFilesUnderModelBase) - set([filename, modelBasePath]) - set(localEvalResult) - set(localScoreResult) - set(pycache))
+
+        models = {}
+        for modelDir in glob.glob("{}/*".format(modelBasePath)):
+            if not os.path.isdir(modelDir):
+                continue
+            allFilesUnderModel = glob.glob("{}/**".format(modelDir), recursive=True)
+            pycache = glob.glob("{}/__pycache__/**".format(modelDir), recursive=True)
+            allFilesUnderModel = [f for f in allFilesUnderModel if os.path.isfile(f)]
+            models[modelDir] = list(set(allFilesUnderModel) - set([f"{modelDir}/model.yaml"]) - set(pycache))
+
+        projects[projectBase] = (resources, models)
+    return projects
+
+def measure(fn, latency=0):
+    counts = {"scandir": 0, "stat": 0, "lstat": 0}
+
+    def counting(name, orig):
+        def wrapper(*args, **kwargs):
+            counts[name] += 1
+            if latency > 0:
+                time.sleep(latency)
+            return orig(*args, **kwargs)
+        return wrapper
+
+    with mock.patch("os.scandir", counting("scandir", os.scandir)), \
+         mock.patch("os.stat", counting("stat", os.stat)), \
+         mock.patch("os.lstat", counting("lstat", os.lstat)):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+
+    return elapsed, counts
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--projects", type=int, default=10)
+    parser.add_argument("--models", type=int, default=50)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--parallelism", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0, help="seconds added to each filesystem call")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    try:
+        createRepo(root, args.projects, args.models, args.files)
+        reader = RepoReader(root)
+
+        def scan(parallelism):
+            reader._projects = {}
+            reader._parallelism = parallelism
+            reader.scan()
+
+        for name, fn in [
+            ("glob (legacy)", lambda: legacyScan(root)),
+            ("scandir walk", lambda: scan(1)),
+            (f"{args.parallelism} threads", lambda: scan(args.parallelism))
+        ]:
+            elapsed, counts = measure(fn, args.latency)
+            total = sum(counts.values())
+            print(f"{name:<15} {elapsed * 1000:>10.1f} ms   syscalls {total:>8}   {counts}")
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+'''
+Benchmark LocalFsStorage.put() and copy() of a large file, e.g. model weights.
+
+Compares the buffered copy in user space (shutil.copyfileobj, as put() used to do)
+against put() and copy(), that copy in the kernel (reflink, copy_file_range, sendfile),
+and copy(link=True), that makes a hardlink.
+
+e.g.
+    python benchmarks/bench_storage_copy.py --size 2048 --dir /data/tmp
+'''
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from luna_ml.storage.storage_localfs import LocalFsStorage
+
+def createFile(path, sizeMb):
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(sizeMb):
+            f.write(block)
+
+def legacyPut(storage, srcPath, targetPath):
+    absPath = storage._fsAbsPath(targetPath)
+    os.makedirs(os.path.dirname(absPath), exist_ok=True)
+    with open(srcPath, "rb") as src, open(absPath, "wb") as w:
+        shutil.copyfileobj(src, w)
+
+def fastPut(storage, srcPath, targetPath):
+    with open(srcPath, "rb") as src:
+        storage.put(src, targetPath)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=1024, help="file size in MB")
+    parser.add_argument("--dir", default=None, help="directory to run on. default is the system temp directory")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(dir=args.dir)
+    try:
+        storage = LocalFsStorage(root)
+        srcPath = os.path.join(root, "src")
+        createFile(srcPath, args.size)
+
+        for name, fn in [
+            ("copyfileobj (legacy)", lambda dst: legacyPut(storage, srcPath, dst)),
+            ("put", lambda dst: fastPut(storage, srcPath, dst)),
+            ("copy", lambda dst: storage.copy("/src", dst)),
+            ("copy(link=True)", lambda dst: storage.copy("/src", dst, link=True))
+        ]:
+            dst = f"/dst/{name}"
+            start = time.perf_counter()
+            fn(dst)
+            elapsed = time.perf_counter() - start
+            os.unlink(storage._fsAbsPath(dst))
+            print(f"{name:<22} {elapsed * 1000:>10.1f} ms   {args.size / elapsed:>10.1f} MB/s")
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+'''
+Benchmark transfer codecs of Executor. Wall time against bytes on the wire.
+
+Data set is model weights (random, incompressible) and eval outputs (JSON and CSV text).
+upload:   storage -> tar -> codec -> base64, that is what _copyDataToContainer sends,
+          and the extract command of the container run locally.
+download: the compress command of the container run locally, and base64 -> codec -> tar
+          that _copyDataFromContainer reads.
+
+'est' is the estimated transfer time with the link bandwidth, with compression and network in a pipeline,
+that is max(wall time, wire bytes / bandwidth).
+
+e.g.
+    python benchmarks/bench_transfer_codec.py --weights 256 --text 64 --bandwidth 100
+'''
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from luna_ml.storage.storage_localfs import LocalFsStorage
+from luna_ml.task.codec import transferCodec, downloadReader, AutoCodec, GzipReader
+from luna_ml.task.transfer import Base64ChunkWriter, Base64ChunkReader
+
+MB = 1024 * 1024
+
+def createData(path, weightsMb, textMb):
+    os.makedirs(f"{path}/model")
+    os.makedirs(f"{path}/eval")
+    with open(f"{path}/model/weights.bin", "wb") as f:
+        for _ in range(weightsMb):
+            f.write(os.urandom(MB))
+
+    rnd = random.Random(0)
+    with open(f"{path}/eval/predictions.csv", "w") as f:
+        f.write("id,label,score\n")
+        while f.tell() < textMb * MB // 2:
+            f.write(f"{rnd.randint(0, 10**9)},{rnd.choice(['cat', 'dog', 'bird'])},{rnd.random():.6f}\n")
+    with open(f"{path}/eval/metrics.json", "w") as f:
+        f.write("[")
+        while f.tell() < textMb * MB // 2:
+            f.write(f'{{"step": {rnd.randint(0, 10**6)}, "loss": {rnd.random():.6f}, "accuracy": {rnd.random():.6f}}},')
+        f.write("{}]")
+
+def upload(spec, srcPath, dstPath):
+    storage = LocalFsStorage(srcPath)
+    fileStats = storage.list("/")
+    codec = transferCodec(spec)
+    if isinstance(codec, AutoCodec):
+        codec = codec.choose(storage, fileStats)
+
+    os.makedirs(dstPath)
+    proc = subprocess.Popen(["bash", "-c", codec.extractCommand(dstPath)], stdin=subprocess.PIPE)
+    with Base64ChunkWriter(proc.stdin.write) as encoder:
+        with codec.writer(encoder) as compressed:
+            with tarfile.open(fileobj=compressed, mode="w|") as tar:
+                for fileStat in fileStats:
+                    with storage.get(fileStat.path) as f:
+                        info = tarfile.TarInfo(name=fileStat.path.lstrip("/"))
+                        info.size = f.size
+                        tar.addfile(info, fileobj=f)
+    proc.stdin.close()
+    if proc.wait() != 0:
+        raise Exception(f"extract failed {spec}")
+    return encoder.bytesSent, codec.name
+
+def download(spec, srcPath, dstPath):
+    proc = subprocess.Popen(["bash", "-c", transferCodec(spec).compressCommand(srcPath)], stdout=subprocess.PIPE)
+    chunks = iter(lambda: proc.stdout.read(512 * 1024), b"")
+    storage = LocalFsStorage(dstPath)
+    with Base64ChunkReader(chunks) as source:
+        reader = downloadReader(source)
+        with tarfile.open(fileobj=reader, mode="r|") as tar:
+            for info in tar:
+                if info.isfile():
+                    with tar.extractfile(info) as f:
+                        storage.put(f, info.name)
+        while source.read(MB):
+            pass
+    if proc.wait() != 0:
+        raise Exception(f"compress failed {spec}")
+    used = "none" if reader == source else "gzip" if isinstance(reader, GzipReader) else "zstd"
+    return source.bytesReceived, used
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--weights", type=int, default=128, help="size of model weights in MB")
+    parser.add_argument("--text", type=int, default=64, help="size of eval outputs in MB")
+    parser.add_argument("--bandwidth", type=float, default=100, help="link bandwidth in MB/s, for 'est'")
+    parser.add_argument("--codecs", default="none,gzip:1,gzip:6,gzip:9,pigz:6,zstd:3,auto")
+    parser.add_argument("--dir", default=None, help="directory to run on. default is the system temp directory")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(dir=args.dir)
+    try:
+        createData(f"{root}/data", args.weights, args.text)
+        print(f"{'direction':<10} {'data':<6} {'codec':<8} {'used':<6} {'wall s':>8} {'wire MB':>9} {'est s':>8}")
+        for direction, fn in [("upload", upload), ("download", download)]:
+            for data in ["model", "eval"]:
+                for spec in args.codecs.split(","):
+                    dst = f"{root}/out"
+                    start = time.perf_counter()
+                    wireBytes, used = fn(spec, f"{root}/data/{data}", dst)
+                    elapsed = time.perf_counter() - start
+                    shutil.rmtree(dst)
+
+                    est = max(elapsed, wireBytes / MB / args.bandwidth)
+                    print(f"{direction:<10} {data:<6} {spec:<8} {used:<6} {elapsed:>8.2f} {wireBytes / MB:>9.1f} {est:>8.2f}")
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import yaml
+from luna_ml.api.yaml_cache import loadYaml
 
 class ModelYaml():
     FileName = "model.yaml"
@@ -8,10 +9,7 @@ class ModelYaml():
             yamlText: str
     ):
 
-        o = yaml.load(
-            yamlText,
-            Loader=yaml.SafeLoader
-        )
+        o = loadYaml(yamlText)
 
         ModelYaml._shouldNotEmpty(o, [
             "version",
@@ -28,12 +26,12 @@ class ModelYaml():
 
     @classmethod
     def default(cls, name: str):
-        yaml = f"""
-        version: v1
-        kind: luna-ml/model
-        name: {name}
-        """
-        return ModelYaml(yaml)
+        # built without yaml round trip, for models without model.yaml
+        m = cls.__new__(cls)
+        m.version = "v1"
+        m.kind = "luna-ml/model"
+        m.name = name
+        return m
 
     @classmethod
     def _shouldNotEmpty(self, o, labels, path = ""):
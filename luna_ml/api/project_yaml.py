@@ -1,4 +1,5 @@
 import yaml
+from luna_ml.api.yaml_cache import loadYaml
 
 class ProjectYaml():
     FileName = "luna.yaml"
@@ -8,10 +9,7 @@ class ProjectYaml():
             yamlText: str
     ):
 
-        o = yaml.load(
-            yamlText,
-            Loader=yaml.SafeLoader
-        )
+        o = loadYaml(yamlText)
 
 
         ProjectYaml._shouldNotEmpty(o, [
@@ -1,23 +1,163 @@
+import re
+import io
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 class ScoreFile():
+    '''
+    Score file written by a scorer. Each line is '<key> <value>', e.g.
+
+        accuracy 0.92
+        loss 0.31
+
+    Lines that do not match, or that have a value that is not a number, are skipped
+    unless strict is True.
+    '''
+    # same as the pattern fromText() always used, compiled once
+    LinePattern = re.compile(r"([^ ]+)\s+([^ ]+).*")
 
     @staticmethod
     def fromText(text: str):
-        score = {}
-        for line in text.split("\n"):
+        return ScoreFile._toDict(ScoreFile._parse(text.split("\n")))
+
+    @staticmethod
+    def fromFile(file, strict=False):
+        '''
+        file:
+          path or file object (text or binary). read line by line, without loading the whole file.
+        returns dict of key to value. the last value wins when a key appears more than once.
+        '''
+        return ScoreFile._toDict(ScoreFile.iterFile(file, strict=strict))
+
+    @staticmethod
+    def iterFile(file, strict=False):
+        '''yield (key, value) of each line of the score file'''
+        if isinstance(file, (str, bytes)) or hasattr(file, "__fspath__"):
+            with open(file, "r") as f:
+                yield from ScoreFile._parse(f, strict)
+            return
+
+        if isinstance(file, (io.RawIOBase, io.BufferedIOBase)) or "b" in getattr(file, "mode", ""):
+            text = io.TextIOWrapper(file)
+            try:
+                yield from ScoreFile._parse(text, strict)
+            finally:
+                # the caller owns the file. the wrapper would close it when garbage collected
+                text.detach()
+            return
+
+        yield from ScoreFile._parse(file, strict)
+
+    @staticmethod
+    def columns(files, strict=False):
+        '''
+        Parse many score files in one call, into ScoreColumns.
+        Every line is kept, so per-sample scores with the same key can be aggregated.
+        '''
+        files = list(files)
+        keyNames = []
+        keyIndex = {} # key name to key id
+        keyIds = array("i")
+        values = array("d")
+        fileIndex = array("i")
+
+        for i, file in enumerate(files):
+            n = len(keyIds)
+            for key, value in ScoreFile.iterFile(file, strict):
+                keyId = keyIndex.get(key)
+                if keyId == None:
+                    keyId = len(keyNames)
+                    keyIndex[key] = keyId
+                    keyNames.append(key)
+                keyIds.append(keyId)
+                values.append(value)
+            fileIndex.extend([i] * (len(keyIds) - n))
+
+        return ScoreColumns(files, keyNames, keyIds, values, fileIndex)
+
+    @staticmethod
+    def _parse(lines, strict=False):
+        match = ScoreFile.LinePattern.match
+        for lineNumber, line in enumerate(lines, 1):
             line = line.strip()
             if line == "":
                 continue
 
-            m = re.match("([^ ]+)\s+([^ ]+).*", line)
+            m = match(line)
             if m == None:
+                if strict:
+                    raise ValueError(f"line {lineNumber}: '{line}' is not '<key> <value>'")
                 continue
 
             try:
-                key = m.group(1)
                 value = float(m.group(2))
             except ValueError:
+                if strict:
+                    raise ValueError(f"line {lineNumber}: '{m.group(2)}' is not a number")
                 continue
 
+            yield m.group(1), value
+
+    @staticmethod
+    def _toDict(items):
+        score = {}
+        for key, value in items:
             score[key] = value
+        return score
+
+class ScoreColumns():
+    '''
+    Scores of many score files as columns. Row i is line keyNames[keyIds[i]] with values[i] of files[fileIndex[i]].
+    Keys are dictionary encoded, so a row is numbers only and select() compares ints.
+    keyIds, values and fileIndex are numpy arrays when numpy is installed, array.array otherwise.
+    '''
+    __slots__ = ["files", "keyNames", "keyIds", "values", "fileIndex", "_keyIndex"]
+
+    def __init__(self, files, keyNames, keyIds, values, fileIndex):
+        self.files = files
+        self.keyNames = keyNames
+        self._keyIndex = {key: keyId for keyId, key in enumerate(keyNames)}
+        if numpy != None:
+            # no copy, numpy arrays share the buffer of array.array
+            self.keyIds = numpy.frombuffer(keyIds, dtype=numpy.intc)
+            self.values = numpy.frombuffer(values, dtype=numpy.float64)
+            self.fileIndex = numpy.frombuffer(fileIndex, dtype=numpy.intc)
+        else:
+            self.keyIds = keyIds
+            self.values = values
+            self.fileIndex = fileIndex
+
+    @property
+    def keys(self):
+        '''key of each row'''
+        return [self.keyNames[keyId] for keyId in self.keyIds]
+
+    def __len__(self):
+        return len(self.keyIds)
+
+    def select(self, key, fileIndex=None):
+        '''values of the key, optionally of a single file'''
+        keyId = self._keyIndex.get(key)
+        if keyId == None:
+            return self.values[:0]
+
+        if numpy != None:
+            mask = self.keyIds == keyId
+            if fileIndex != None:
+                mask = mask & (self.fileIndex == fileIndex)
+            return self.values[mask]
+
+        rows = [i for i, k in enumerate(self.keyIds) if k == keyId and (fileIndex == None or self.fileIndex[i] == fileIndex)]
+        return array("d", [self.values[i] for i in rows])
 
-        return score
\ No newline at end of file
+    def mean(self, key, fileIndex=None):
+        selected = self.select(key, fileIndex)
+        if len(selected) == 0:
+            return None
+        if numpy != None:
+            return float(selected.mean())
+        return sum(selected) / len(selected)
@@ -0,0 +1,56 @@
+import yaml
+import threading
+from collections import OrderedDict
+
+# libyaml based loader is much faster than the pure python one. not available when pyyaml is built without libyaml
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+def loadYaml(yamlText):
+    return yaml.load(yamlText, Loader=SafeLoader)
+
+class YamlCache():
+    '''
+    Process-wide cache of parsed ProjectYaml and ModelYaml.
+
+    Key identifies the content of the file without reading it, e.g. (path, size, mtime) of
+    a file in the working tree or the blob SHA of a file in a commit. Parsed objects are
+    shared by every reader of the same content, so they must not be modified.
+    '''
+    MaxSize = 10000
+
+    def __init__(self, maxSize=MaxSize):
+        self._maxSize = maxSize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cls, key, readText):
+        '''
+        cls:
+          ProjectYaml or ModelYaml
+        readText:
+          function that returns the yaml text, called on a cache miss
+        '''
+        if key == None:
+            return cls(readText())
+
+        k = (cls, key)
+        with self._lock:
+            parsed = self._entries.get(k)
+            if parsed != None:
+                self._entries.move_to_end(k)
+                return parsed
+
+        # parse out of the lock, the same file parsed twice by two threads is harmless
+        parsed = cls(readText())
+
+        with self._lock:
+            self._entries[k] = parsed
+            if len(self._entries) > self._maxSize:
+                self._entries.popitem(last=False)
+        return parsed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+yamlCache = YamlCache()
@@ -7,13 +7,18 @@ import logging
 import json
 import tempfile
 import shutil
+from collections import deque
 from colorama import init
 from kubernetes import config
 from luna_ml.repository.repo_reader import RepoReader
 from luna_ml.api.project_yaml import ProjectYaml
 from luna_ml.api.model_yaml import ModelYaml
+from luna_ml.api.score_file import ScoreFile
+from luna_ml.leaderboard.leaderboard import Leaderboard
+from luna_ml.leaderboard.score_history import ScoreHistory
 from luna_ml.task.executor import Executor
 from luna_ml.task.task import Task
+from luna_ml.storage.storage_localfs import LocalFsStorage
 
 init()
 from colorama import Fore, Back, Style
@@ -49,7 +54,7 @@ class LunaCli(object):
         self.__next_task_id = self.__next_task_id + 1
         return self.__next_task_id
 
-    def sync(self, local_repo, orig_commit=None, current_commit=None, dry_run=False, eval=None, wait=False):
+    def sync(self, local_repo, orig_commit=None, current_commit=None, dry_run=False, eval=None, wait=False, incremental=False, cache=False, from_commit=False, detect_renames=True, parallelism=1, skip_synced=False, eval_parallelism=1, upload_codec="none", download_codec="none"):
         """Sync local git repository to update leaderboard
 
         sync command take changes of local git repository and update
@@ -63,83 +68,237 @@ class LunaCli(object):
 
             # sync changes of the local github repo in absolute path
             luna-ml sync /my/repo
+
+            # scan only projects and models changed between two commits
+            luna-ml sync . --orig_commit=HEAD~1 --current_commit=HEAD --incremental
+
+            # reuse scan result of unchanged directories from '.git/luna-cache'
+            luna-ml sync . --cache
+
+            # read projects and models of the commit from git objects, without checkout
+            luna-ml sync . --orig_commit=HEAD~1 --current_commit=HEAD --from_commit
+
+            # scan directories with 8 threads
+            luna-ml sync . --parallelism=8
+
+            # skip projects and models that have the same content as the last sync
+            luna-ml sync . --skip_synced
+
+            # evaluate locally, running up to 8 evaluations at the same time
+            luna-ml sync . --eval=local --eval_parallelism=8
+
+            # compress files copied to and from the evaluation pods. 'auto' picks a codec from the files,
+            # and runs mktemp, dd and gzip in the evaluator image. see luna_ml/task/codec.py for other codecs
+            luna-ml sync . --eval=local --upload_codec=auto --download_codec=auto
         """
         dry_run = self.__get_bool_param(dry_run, False)
         wait = self.__get_bool_param(wait, False)
+        incremental = self.__get_bool_param(incremental, False)
+        cache = self.__get_bool_param(cache, False)
+        from_commit = self.__get_bool_param(from_commit, False)
+        detect_renames = self.__get_bool_param(detect_renames, True)
+        skip_synced = self.__get_bool_param(skip_synced, False)
 
         repoPath = os.path.abspath(local_repo).rstrip("/")
         print(f"Scanning changes from local repo ({repoPath}) ...")
 
-        r = RepoReader(
+        reader = RepoReader(
                 repoPath,
                 diffOrigHash=orig_commit,
-                diffCurrHash=current_commit
+                diffCurrHash=current_commit,
+                incremental=incremental,
+                useCache=cache,
+                readFromCommit=from_commit,
+                detectRenames=detect_renames,
+                parallelism=int(parallelism),
+                lazy=True,
+                skipSynced=skip_synced
             )
 
-        projects = r.getAll()
-
-        if 0 == len(projects):
-            print("No changes detected")
-            return
-
-        print("")
-        self._printProjectSummaryAsTable(projects, repoPath)
-        print("")
-
         if dry_run:
+            projects = reader.getAll()
+            if 0 == len(projects):
+                print("No changes detected")
+                return
+
+            print("")
+            self._printProjectSummaryAsTable(projects, repoPath)
+            print("")
             return
+
         if eval == "local":
+            if from_commit:
+                logging.error("Local evaluation reads projects and models from the working tree. Can not be used with --from_commit")
+                sys.exit(1)
+
             config.load_kube_config()
-            for projectPath, project in projects.items():
-                # projectPath is absolute path
-                lunaYamlPath = f"{projectPath}/{ProjectYaml.FileName}"
-                projectPathRelativeToRepoRoot = projectPath[len(repoPath):]
-                modelBasePath = "{}/{}".format(
-                    projectPath,
-                    project["yaml"].modelBasePath.lstrip("/").rstrip("/")
-                )
+            self._executor = Executor(
+                basePath=None,
+                maxConcurrentTasks=int(eval_parallelism),
+                uploadCodec=upload_codec,
+                downloadCodec=download_codec
+            )
+            leaderboard = Leaderboard.ofRepo(repoPath)
+            history = ScoreHistory.ofRepo(repoPath)
+
+        # each project is evaluated or posted as soon as it is scanned,
+        # while the rest of the repository is still being scanned
+        numProjects = 0
+        submitted = deque() # local evaluations of all projects, in submit order
+        try:
+            for projectPath, project in reader.iterProjects():
+                if numProjects == 0:
+                    if eval != "local":
+                        # checked once there is something to sync, so a sync without changes needs no environment
+                        repoType, repoName, lunaAccessToken = self._repoEnv()
+                    print("")
+                    self._printProjectSummaryHeader()
+                self._printProjectSummaryRow(projectPath, project, repoPath)
+                numProjects = numProjects + 1
+
+                if eval == "local":
+                    # tasks of the next projects are submitted without waiting for the results of this one
+                    submitted.extend(self._submitEvaluations(projectPath, project))
+                    self._collectEvaluations(submitted, repoPath, leaderboard, history, wait=False)
+                else:
+                    self._syncProject(reader, projectPath, project, repoPath, repoType, repoName, lunaAccessToken, eval, wait)
+        finally:
+            # manifests of the projects synced so far, written once
+            reader.saveSynced()
 
-                for modelPath, model in project["models"].items():
-                    # modelPath is absolute path
-                    modelPathRelativeToModelBase = modelPath[len(modelBasePath):]
-                    if model["action"] == "update":
-                        print("Local evaluation model '{}' ... ".format(model["yaml"].name))
-                        scorer = project["yaml"].scorer
-                        for ev in project["yaml"].evaluators:
-                            print(f"evaluating with {ev.name} ... ", end='')
-                            tmpdir = tempfile.mkdtemp()
-
-                            # prepare project dir without models
-                            shutil.copytree(
-                                projectPath,
-                                f"{tmpdir}/project",
-                                ignore=lambda directory, contents: ['models'] if directory == projectPath else []
-                            )
-
-                            task = Task(
-                                taskId=self.__get_next_task_id(),
-                                image=[ev.image, scorer.image],
-                                command=[ev.command, scorer.command],
-                                copyToContainerBeforeStart=[
-                                    (modelPath, "/workspace/model"),
-                                    (f"{tmpdir}/project", "/workspace")
-                                ],
-                                copyFromContainerAfterFinish=[
-                                    ("/workspace/eval", f"{tmpdir}/eval"),
-                                    ("/workspace/score", f"{tmpdir}/score")
-                                ]
-                            )
-
-                            ret = self._executor.evaluate(task)
-                            if ret != 0:
-                                print(f"evaluation failed {ev.name} with exit code {ret}")
-                                sys.exit(ret)
-
-                            shutil.rmtree(tmpdir)
-                            print("done")
-            return
+        if eval == "local":
+            self._collectEvaluations(submitted, repoPath, leaderboard, history, wait=True)
+            self._executor.shutdown()
+
+        if numProjects == 0:
+            print("No changes detected")
 
+    def leaderboard(self, local_repo=".", project=None, evaluator=None, top=10):
+        """Show leaderboard of models evaluated locally
+
+        Models evaluated by 'luna-ml sync --eval=local' are ranked by the
+        scoreFieldName of the project's scorer, in the scorer's sort order.
+
+        e.g.
+            # show top 10 models of each project and evaluator
+            luna-ml leaderboard .
 
+            # show top 50 models of a project evaluated by 'ev1'
+            luna-ml leaderboard . --project=/proj1 --evaluator=ev1 --top=50
+        """
+        repoPath = os.path.abspath(local_repo).rstrip("/")
+        boards = Leaderboard.ofRepo(repoPath).boards(project=project, evaluator=evaluator)
+        if len(boards) == 0:
+            print("No scores. Evaluate models with 'luna-ml sync --eval=local' first")
+            return
+
+        for projectPath, evaluatorName, entries in boards:
+            print("")
+            print(f"{Style.BRIGHT}{projectPath}{Style.RESET_ALL} evaluated with {evaluatorName}")
+            print("{}{:>5}   {:<30}   {:>12}   {:<30}{}".format(Style.DIM, "Rank", "Model", "Score", "Path", Style.RESET_ALL))
+            for rank, entry in enumerate(entries[:int(top)], 1):
+                name = entry["name"] if len(entry["name"]) <= 30 else f"{entry['name'][:28]}.."
+                print("{:>5}   {:<30}   {:>12.6g}   {:<30}".format(rank, name, entry["score"], entry["model"]))
+
+    def _submitEvaluations(self, projectPath, project):
+        # all models x evaluators are submitted, and run concurrently up to the limit of the executor
+        scorer = project["yaml"].scorer
+        submitted = []
+        for modelPath, model in project["models"].items():
+            # modelPath is absolute path
+            if model["action"] == "update":
+                for ev in project["yaml"].evaluators:
+                    tmpdir = tempfile.mkdtemp()
+
+                    # prepare project dir without models, and model dir.
+                    # only resources are copied, so files excluded by .lunaignore are never copied to the pod.
+                    self._copyResources(projectPath, ProjectYaml.FileName, project["resources"], f"{tmpdir}/project")
+                    self._copyResources(modelPath, ModelYaml.FileName, model["resources"], f"{tmpdir}/model")
+
+                    task = Task(
+                        taskId=self.__get_next_task_id(),
+                        image=[ev.image, scorer.image],
+                        command=[ev.command, scorer.command],
+                        copyToContainerBeforeStart=[
+                            (f"{tmpdir}/model", "/workspace/model"),
+                            (f"{tmpdir}/project", "/workspace")
+                        ],
+                        copyFromContainerAfterFinish=[
+                            ("/workspace/eval", f"{tmpdir}/eval"),
+                            ("/workspace/score", f"{tmpdir}/score")
+                        ]
+                    )
+                    submitted.append((projectPath, project, modelPath, model, ev, tmpdir, self._executor.submit(task)))
+        return submitted
+
+    def _collectEvaluations(self, submitted, repoPath, leaderboard, history, wait):
+        # results are collected in submit order. without wait, only while the next one is already done
+        while len(submitted) > 0 and (wait or submitted[0][-1].done()):
+            projectPath, project, modelPath, model, ev, tmpdir, future = submitted[0]
+            print("Local evaluation model '{}' with {} ... ".format(model["yaml"].name, ev.name), end='')
+            try:
+                ret = future.result()
+            except BaseException:
+                self._cancelEvaluations(submitted)
+                raise
+            if ret != 0:
+                print(f"evaluation failed {ev.name} with exit code {ret}")
+                self._cancelEvaluations(submitted)
+                sys.exit(ret)
+            submitted.popleft()
+
+            score = self._readScore(f"{tmpdir}/score")
+            shutil.rmtree(tmpdir)
+
+            # projectPath and modelPath are absolute paths
+            projectPathRelativeToRepoRoot = "/" + projectPath[len(repoPath):].lstrip("/")
+            modelPathRelativeToProject = modelPath[len(projectPath):].lstrip("/")
+            history.add(projectPathRelativeToRepoRoot, modelPathRelativeToProject, ev.name, model["commit"], score)
+
+            scorer = project["yaml"].scorer
+            if scorer.scoreFieldName not in score:
+                print(f"done. '{scorer.scoreFieldName}' is not found in the score")
+                continue
+
+            rank = leaderboard.add(
+                projectPathRelativeToRepoRoot,
+                ev.name,
+                modelPathRelativeToProject,
+                score[scorer.scoreFieldName],
+                sort=scorer.sort,
+                name=model["yaml"].name,
+                commit=model["commit"]
+            )
+            print(f"done. {scorer.scoreFieldName}: {score[scorer.scoreFieldName]}, rank: {rank}")
+
+    def _cancelEvaluations(self, submitted):
+        for item in submitted:
+            item[-1].cancel()
+        self._executor.shutdown()
+        for item in submitted:
+            shutil.rmtree(item[-2], ignore_errors=True)
+
+    def _readScore(self, scoreDir):
+        # merge all score files written by the scorer
+        score = {}
+        for dirPath, _, fileNames in os.walk(scoreDir):
+            for fileName in sorted(fileNames):
+                score.update(ScoreFile.fromFile(os.path.join(dirPath, fileName)))
+        return score
+
+    def _copyResources(self, srcDir, yamlFileName, resources, dstDir):
+        # copies are only read while transferred to the pod and removed after,
+        # so they are hardlinks when possible
+        storage = LocalFsStorage(None)
+        os.makedirs(dstDir)
+        yamlPath = f"{srcDir}/{yamlFileName}"
+        if os.path.isfile(yamlPath):
+            storage.copy(yamlPath, f"{dstDir}/{yamlFileName}", link=True)
+
+        for relPath in resources.relPaths():
+            storage.copy(f"{srcDir}/{relPath}", f"{dstDir}/{relPath}", link=True)
+
+    def _repoEnv(self):
         if not "REPO_TYPE" in os.environ:
             logging.error("REPO_TYPE environment is not defined. REPO_TYPE is something like 'github.com'")
             sys.exit(1)
@@ -148,28 +307,31 @@ class LunaCli(object):
             logging.error("REPO_NAME environment is not defined. REPO_NAME is something like 'owner/repo'")
             sys.exit(1)
 
-        repoType = os.environ["REPO_TYPE"]
-        repoName = os.environ["REPO_NAME"]
-        lunaAccessToken = os.environ["LUNA_ACCESS_TOKEN"]
-
-        # post changes
-        for projectPath, project in projects.items():
-            # projectPath is absolute path
-            lunaYamlPath = f"{projectPath}/{ProjectYaml.FileName}"
-            projectPathRelativeToRepoRoot = projectPath[len(repoPath):]
-            modelBasePath = "{}/{}".format(
-                projectPath,
-                project["yaml"].modelBasePath.lstrip("/").rstrip("/")
-            )
+        return os.environ["REPO_TYPE"], os.environ["REPO_NAME"], os.environ["LUNA_ACCESS_TOKEN"]
+
+    def _closeFiles(self, files):
+        # files of a request are opened all at once. closed right after the request, not when collected
+        for _, (_, f) in files:
+            f.close()
+
+    def _syncProject(self, reader, projectPath, project, repoPath, repoType, repoName, lunaAccessToken, eval, wait):
+        # projectPath is absolute path
+        lunaYamlPath = f"{projectPath}/{ProjectYaml.FileName}"
+        projectPathRelativeToRepoRoot = projectPath[len(repoPath):]
+        modelBasePath = "{}/{}".format(
+            projectPath,
+            project["yaml"].modelBasePath.lstrip("/").rstrip("/")
+        )
 
-            # update project
-            if project["action"] == "update":
-                print("Update project '{}' ... ".format(project["yaml"].name), end='')
-                files = [("file", (ProjectYaml.FileName, open(lunaYamlPath, "rb")))]
+        # update project
+        if project["action"] == "update":
+            print("Update project '{}' ... ".format(project["yaml"].name), end='')
+            files = [("file", (ProjectYaml.FileName, reader.open(lunaYamlPath)))]
 
-                for r in project["resources"]:
-                    files.append(("file", (r[len(projectPath):], open(r, "rb"))))
+            for r in project["resources"]:
+                files.append(("file", (r[len(projectPath):], reader.open(r))))
 
+            try:
                 resp = requests.post(
                     f"{self._server}/v1/project",
                     data={
@@ -181,50 +343,54 @@ class LunaCli(object):
                     },
                     files=files
                 )
+            finally:
+                self._closeFiles(files)
+
+            if not resp.status_code == 200:
+                print("failed {}. {}".format(resp.status_code, resp.text))
+                logging.error("Update project {} failed. {}".format(project["yaml"].name, resp.text))
+                sys.exit(1)
+
+            respProject = self.__json_from_response(resp)
+            projectId = respProject["id"]
+            print("done. id: {}".format(projectId))
+            reader.markSynced(projectPath, project)
+        else:
+            # get project
+            resp = requests.get(
+                f"{self._server}/v1/project",
+                params={
+                    "repo_type": repoType,
+                    "repo_name": repoName,
+                    "path": projectPathRelativeToRepoRoot
+                }
+            )
 
-                if not resp.status_code == 200:
-                    print("failed {}. {}".format(resp.status_code, resp.text))
-                    logging.error("Update project {} failed. {}".format(project["yaml"].name, resp.text))
-                    sys.exit(1)
-
-                respProject = self.__json_from_response(resp)
-                projectId = respProject["id"]
-                print("done. id: {}".format(projectId))
-            else:
-                # get project
-                resp = requests.get(
-                    f"{self._server}/v1/project",
-                    params={
-                        "repo_type": repoType,
-                        "repo_name": repoName,
-                        "path": projectPathRelativeToRepoRoot
-                    }
-                )
-
-                if not resp.status_code == 200:
-                    logging.warn("Project {} is not created.".format(project["yaml"].name))
-                    continue
+            if not resp.status_code == 200:
+                logging.warn("Project {} is not created.".format(project["yaml"].name))
+                return
 
-                respProject = self.__json_from_response(resp)
-                projectId = respProject["id"]
+            respProject = self.__json_from_response(resp)
+            projectId = respProject["id"]
 
-            # update models
-            for modelPath, model in project["models"].items():
-                # modelPath is absolute path
-                modelPathRelativeToModelBase = modelPath[len(modelBasePath):]
-                if model["action"] == "update":
-                    print("Update model '{}' ... ".format(model["yaml"].name), end='')
+        # update models
+        for modelPath, model in project["models"].items():
+            # modelPath is absolute path
+            modelPathRelativeToModelBase = modelPath[len(modelBasePath):]
+            if model["action"] == "update":
+                print("Update model '{}' ... ".format(model["yaml"].name), end='')
 
-                    modelYamlPath = f"{modelPath}/{ModelYaml.FileName}"
+                modelYamlPath = f"{modelPath}/{ModelYaml.FileName}"
 
-                    files = []
+                files = []
 
-                    if os.path.isfile(modelYamlPath):
-                        files.append(("file", (ModelYaml.FileName, open(modelYamlPath, "rb"))))
+                if reader.exists(modelYamlPath):
+                    files.append(("file", (ModelYaml.FileName, reader.open(modelYamlPath))))
 
-                    for r in model["resources"]:
-                        files.append(("file", (r[len(modelPath.rstrip("/")):], open(r, "rb"))))
+                for r in model["resources"]:
+                    files.append(("file", (r[len(modelPath.rstrip("/")):], reader.open(r))))
 
+                try:
                     resp = requests.post(
                         f"{self._server}/v1/project/{projectId}/model",
                         data={
@@ -236,75 +402,81 @@ class LunaCli(object):
                         },
                         files=files
                     )
+                finally:
+                    self._closeFiles(files)
 
-                    if not resp.status_code == 200:
-                        print("failed {}. {}".format(resp.status_code, resp.text))
-                        logging.error("Update model {} failed. {}".format(project["yaml"].name, resp.text))
-                        sys.exit(1)
-                    respModel = self.__json_from_response(resp)
-                    modelId = respModel["id"]
-                    print("done. id: {}".format(modelId))
+                if not resp.status_code == 200:
+                    print("failed {}. {}".format(resp.status_code, resp.text))
+                    logging.error("Update model {} failed. {}".format(project["yaml"].name, resp.text))
+                    sys.exit(1)
+                respModel = self.__json_from_response(resp)
+                modelId = respModel["id"]
+                print("done. id: {}".format(modelId))
+                reader.markSynced(modelPath, model)
 
-                    if not eval:
-                        continue
+                if not eval:
+                    continue
 
-                    # trigger evaluation
-                    print("trigger evaluation ... ")
-                    for ev in project["yaml"].evaluators:
-                        resp = requests.post(
-                            f"{self._server}/v1/project/{projectId}/model/{modelId}/eval",
-                            data={
-                                "access_token": lunaAccessToken,
-                                "name": ev.name
-                            }
-                        )
+                # trigger evaluation
+                print("trigger evaluation ... ")
+                for ev in project["yaml"].evaluators:
+                    resp = requests.post(
+                        f"{self._server}/v1/project/{projectId}/model/{modelId}/eval",
+                        data={
+                            "access_token": lunaAccessToken,
+                            "name": ev.name
+                        }
+                    )
 
-                        if not resp.status_code == 200:
-                            print("Trigger evaluation failed. {} ".format(resp.status_code))
-                            sys.exit(1)
+                    if not resp.status_code == 200:
+                        print("Trigger evaluation failed. {} ".format(resp.status_code))
+                        sys.exit(1)
 
-                        if not wait:
-                            continue
+                    if not wait:
+                        continue
 
-                        taskList = self.__json_from_response(resp)
-                        if len(taskList) == 0:
-                            continue
+                    taskList = self.__json_from_response(resp)
+                    if len(taskList) == 0:
+                        continue
 
-                        task = taskList[0] # because we're evaluating one by one here
-                        taskId = task["id"]
+                    task = taskList[0] # because we're evaluating one by one here
+                    taskId = task["id"]
 
-                        print(f"Wait for the evaluation to finish ... ")
-                        while "exit_code" not in task or task["exit_code"] == None:
-                            time.sleep(5)
+                    print(f"Wait for the evaluation to finish ... ")
+                    while "exit_code" not in task or task["exit_code"] == None:
+                        time.sleep(5)
 
-                            resp = requests.get(
-                                f"{self._server}/v1/project/{projectId}/model/{modelId}/eval/{taskId}"
-                            )
+                        resp = requests.get(
+                            f"{self._server}/v1/project/{projectId}/model/{modelId}/eval/{taskId}"
+                        )
 
-                            if not resp.status_code == 200:
-                                print(f"Failed to get evaluation task {taskId}. {resp.status_code}")
-                                sys.exit(1)
+                        if not resp.status_code == 200:
+                            print(f"Failed to get evaluation task {taskId}. {resp.status_code}")
+                            sys.exit(1)
 
-                            task = self.__json_from_response(resp)
+                        task = self.__json_from_response(resp)
 
-                        if "exit_code" in task:
-                            if task["exit_code"] != 0:
-                                print(f"Task exited with {task['exit_code']} exit code.")
-                                sys.exit(1)
-                            else:
-                                continue
-                        else:
-                            # should not reach here.
+                    if "exit_code" in task:
+                        if task["exit_code"] != 0:
+                            print(f"Task exited with {task['exit_code']} exit code.")
                             sys.exit(1)
+                        else:
+                            continue
+                    else:
+                        # should not reach here.
+                        sys.exit(1)
 
     def _printProjectSummaryAsTable(self, projects, repoPath):
         projectList = list(projects.items())
         projectList.sort(key=lambda item: item[1]["yaml"].name)
 
-        title_len = 30
+        self._printProjectSummaryHeader()
+        for path, project in projectList:
+            self._printProjectSummaryRow(path, project, repoPath)
+
+    def _printProjectSummaryHeader(self):
         Col_Margin = "   "
 
-        # print header
         print("{}{:<30}{}{:<10}{}{:<30}{}".format(
             Style.DIM,
             "Project",
@@ -315,43 +487,45 @@ class LunaCli(object):
             Style.RESET_ALL
         ))
 
-        # print rows
-        for path, project in projectList:
-            title=project["yaml"].name
+    def _printProjectSummaryRow(self, path, project, repoPath):
+        title_len = 30
+        Col_Margin = "   "
+
+        title=project["yaml"].name
+        title=title if len(title) <= title_len else f"{title[:title_len-2]}.."
+        print("{:<30}{}{:<10}{}{:<30}".format(
+            title,
+            Col_Margin,
+            project["action"] if project["action"] else "none",
+            Col_Margin,
+            path[len(repoPath):]
+        ))
+
+        # print models
+        modelList = list(project["models"].items())
+        modelList.sort(key=lambda item: item[1]["yaml"].name)
+
+        model_count = 1
+        for path, model in modelList:
+            title=model["yaml"].name
             title=title if len(title) <= title_len else f"{title[:title_len-2]}.."
-            print("{:<30}{}{:<10}{}{:<30}".format(
+
+            if model_count == 1:
+                Model_Indent = "{}{:>15}{}".format(
+                    Style.DIM,
+                    "Models    ",
+                    Style.RESET_ALL,
+                )
+            else:
+                Model_Indent = "{:<15}".format("")
+
+            print("{}{:<15}{}{:<10}{}{:<30}".format(
+                Model_Indent,
                 title,
                 Col_Margin,
-                project["action"] if project["action"] else "none",
+                model["action"] if model["action"] else "none",
                 Col_Margin,
                 path[len(repoPath):]
             ))
 
-            # print models
-            modelList = list(project["models"].items())
-            modelList.sort(key=lambda item: item[1]["yaml"].name)
-
-            model_count = 1
-            for path, model in modelList:
-                title=model["yaml"].name
-                title=title if len(title) <= title_len else f"{title[:title_len-2]}.."
-
-                if model_count == 1:
-                    Model_Indent = "{}{:>15}{}".format(
-                        Style.DIM,
-                        "Models    ",
-                        Style.RESET_ALL,
-                    )
-                else:
-                    Model_Indent = "{:<15}".format("")
-
-                print("{}{:<15}{}{:<10}{}{:<30}".format(
-                    Model_Indent,
-                    title,
-                    Col_Margin,
-                    model["action"] if model["action"] else "none",
-                    Col_Margin,
-                    path[len(repoPath):]
-                ))
-
-                model_count = model_count + 1
+            model_count = model_count + 1
@@ -0,0 +1,156 @@
+import os
+import json
+import logging
+import tempfile
+from git import Repo
+from sortedcontainers import SortedList
+
+logger = logging.getLogger(__name__)
+
+class Leaderboard():
+    '''
+    Local leaderboard of models evaluated by 'luna-ml sync --eval=local'.
+
+    Each (project, evaluator) has a board ranked by the score field of the project's scorer
+    (scorer.scoreFieldName), in scorer.sort order. A board keeps its entries in a SortedList,
+    so adding or updating a score of one model and getting its rank are O(log n), not a sort of the board.
+
+    Scores are appended to a json lines file, one line per score, and replayed when loaded.
+    The file is compacted when it has many lines that are overwritten by later scores.
+    '''
+    FileName = "luna-leaderboard.jsonl"
+
+    def __init__(self, path):
+        self._path = path
+        self._boards = {} # (project, evaluator) -> _Board
+        self._numLines = 0
+        self._load()
+
+    @staticmethod
+    def ofRepo(repoPath):
+        '''leaderboard stored in the .git directory of the repository'''
+        return Leaderboard(os.path.join(Repo(repoPath).git_dir, Leaderboard.FileName))
+
+    def add(self, project, evaluator, model, score, sort="desc", name=None, commit=None):
+        '''
+        Add or update score of the model. Returns rank of the model in the board, starting from 1.
+
+        project:
+          project path relative to the repository root
+        model:
+          model path relative to the project
+        '''
+        entry = {
+            "project": project,
+            "evaluator": evaluator,
+            "model": model,
+            "name": name if name != None else model,
+            "score": score,
+            "sort": sort,
+            "commit": commit
+        }
+        self._append(entry)
+        return self._board(project, evaluator, sort).add(entry)
+
+    def rank(self, project, evaluator, model):
+        '''rank of the model starting from 1, None when the model has no score'''
+        board = self._boards.get((project, evaluator))
+        if board == None:
+            return None
+        return board.rank(model)
+
+    def boards(self, project=None, evaluator=None):
+        '''list of (project, evaluator, entries in rank order)'''
+        result = []
+        for (p, e), board in sorted(self._boards.items()):
+            if project != None and p != project:
+                continue
+            if evaluator != None and e != evaluator:
+                continue
+            result.append((p, e, board.entries()))
+        return result
+
+    def _board(self, project, evaluator, sort):
+        board = self._boards.get((project, evaluator))
+        if board == None:
+            board = _Board(sort)
+            self._boards[(project, evaluator)] = board
+        elif board.sort != sort:
+            # scorer.sort of the project changed. re-rank once
+            board = _Board(sort, board.entries())
+            self._boards[(project, evaluator)] = board
+        return board
+
+    def _load(self):
+        try:
+            with open(self._path, "r") as f:
+                for line in f:
+                    if line.strip() == "":
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # partially written last line
+                        logger.warning(f"Skip broken line in {self._path}")
+                        continue
+                    self._numLines = self._numLines + 1
+                    self._board(entry["project"], entry["evaluator"], entry["sort"]).add(entry)
+        except FileNotFoundError:
+            return
+
+        numEntries = sum(len(board) for board in self._boards.values())
+        if self._numLines > 2 * numEntries + 100:
+            self._compact()
+
+    def _append(self, entry):
+        os.makedirs(os.path.dirname(os.path.abspath(self._path)), exist_ok=True)
+        with open(self._path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        self._numLines = self._numLines + 1
+
+    def _compact(self):
+        fd, tmpPath = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self._path)))
+        try:
+            with os.fdopen(fd, "w") as f:
+                for _, _, entries in self.boards():
+                    for entry in entries:
+                        f.write(json.dumps(entry) + "\n")
+            os.replace(tmpPath, self._path)
+        except Exception:
+            os.unlink(tmpPath)
+            raise
+        self._numLines = sum(len(board) for board in self._boards.values())
+
+class _Board():
+    def __init__(self, sort, entries=None):
+        self.sort = sort
+        self._keys = SortedList() # (sort key, model)
+        self._entries = {} # model -> entry
+        for entry in entries or []:
+            self.add(entry)
+
+    def _key(self, entry):
+        score = entry["score"]
+        return (-score if self.sort == "desc" else score, entry["model"])
+
+    def add(self, entry):
+        old = self._entries.get(entry["model"])
+        if old != None:
+            self._keys.remove(self._key(old))
+
+        key = self._key(entry)
+        self._keys.add(key)
+        self._entries[entry["model"]] = entry
+        return self._keys.bisect_left(key) + 1
+
+    def rank(self, model):
+        entry = self._entries.get(model)
+        if entry == None:
+            return None
+        return self._keys.bisect_left(self._key(entry)) + 1
+
+    def entries(self):
+        return [self._entries[model] for _, model in self._keys]
+
+    def __len__(self):
+        return len(self._keys)
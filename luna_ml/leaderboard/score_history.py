@@ -0,0 +1,252 @@
+import os
+import json
+import time
+from array import array
+from git import Repo
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class ScoreHistory():
+    '''
+    Append-only history of scores, keyed by (project, model, evaluator, commit).
+
+    Each score is a row, stored column by column in fixed width binary files under the
+    history directory. Strings (project, model, evaluator, commit, score field name) are
+    dictionary encoded, stored once in 'strings.jsonl' and referred by their line number.
+
+        strings.jsonl       one json string per line. id is the line number
+        project.i32         project id of each row
+        model.i32           model id
+        evaluator.i32       evaluator id
+        commit.i32          commit id
+        field.i32           score field name id
+        value.f64           score
+        time.f64            unix time the score is added
+
+    Rows are indexed by (project, model, evaluator) and (project, evaluator, commit) on the first
+    trend() or best(), so opening and appending never scan the history, and queries only read
+    the rows of the key. Columns are memory mapped when numpy is installed, and the index is then
+    the rows sorted by key with numpy.lexsort, looked up by binary search. Appended rows are
+    mapped once, by the next query.
+    '''
+    Columns = [
+        ("project", "i"),
+        ("model", "i"),
+        ("evaluator", "i"),
+        ("commit", "i"),
+        ("field", "i"),
+        ("value", "d"),
+        ("time", "d")
+    ]
+
+    def __init__(self, dirPath):
+        self._dirPath = dirPath
+        os.makedirs(dirPath, exist_ok=True)
+
+        self._strings = []
+        self._stringIds = {}
+        self._loadStrings()
+
+        self._columns = {} # name -> numpy.memmap or array.array
+        self._numRows = self._loadColumns()
+        self._numRowsMapped = self._numRows
+
+        # key column names -> index. built on the first query, dropped when rows are added
+        self._indexes = {}
+
+    @staticmethod
+    def ofRepo(repoPath):
+        '''history stored in the .git directory of the repository'''
+        return ScoreHistory(os.path.join(Repo(repoPath).git_dir, "luna-score-history"))
+
+    def __len__(self):
+        return self._numRows
+
+    def add(self, project, model, evaluator, commit, scores, timestamp=None):
+        '''
+        Append scores of a model evaluated at the commit.
+
+        scores:
+          dict of score field name to value, e.g. returned by ScoreFile.fromFile()
+        '''
+        ids = [self._stringId(s) for s in (project, model, evaluator, commit)]
+        timestamp = time.time() if timestamp == None else timestamp
+
+        rows = {name: array(typecode) for name, typecode in ScoreHistory.Columns}
+        for field, value in scores.items():
+            for name, id in zip(["project", "model", "evaluator", "commit"], ids):
+                rows[name].append(id)
+            rows["field"].append(self._stringId(field))
+            rows["value"].append(value)
+            rows["time"].append(timestamp)
+
+        # strings are written before rows, so every id of a row is always in the strings file
+        self._flushStrings()
+        for name, _ in ScoreHistory.Columns:
+            with open(self._columnPath(name), "ab") as f:
+                rows[name].tofile(f)
+
+        if numpy == None:
+            for name, _ in ScoreHistory.Columns:
+                self._columns[name].extend(rows[name])
+            self._numRowsMapped = self._numRowsMapped + len(scores)
+        self._numRows = self._numRows + len(scores)
+        self._indexes = {}
+
+    def trend(self, project, model, evaluator, field="score"):
+        '''list of (commit, value, time) of the model, in the order the scores are added'''
+        self._mapColumns()
+        key = self._ids(project, model, evaluator)
+        rows = self._rows(("project", "model", "evaluator"), key) if key != None else []
+        return self._select(rows, field, lambda row: self._string("commit", row))
+
+    def best(self, project, evaluator, commit, field="score", sort="desc"):
+        '''(model, value) of the best score of the evaluator at the commit. None when no score'''
+        self._mapColumns()
+        key = self._ids(project, evaluator, commit)
+        rows = self._rows(("project", "evaluator", "commit"), key) if key != None else []
+        scores = self._select(rows, field, lambda row: self._string("model", row))
+        if len(scores) == 0:
+            return None
+
+        if sort == "desc":
+            model, value, _ = max(scores, key=lambda s: s[1])
+        else:
+            model, value, _ = min(scores, key=lambda s: s[1])
+        return (model, value)
+
+    def _select(self, rows, field, label):
+        fieldId = self._stringIds.get(field)
+        if fieldId == None or len(rows) == 0:
+            return []
+
+        fields = self._columns["field"]
+        values = self._columns["value"]
+        times = self._columns["time"]
+        if numpy != None:
+            rows = numpy.asarray(rows, dtype=numpy.intp)
+            rows = rows[fields[rows] == fieldId]
+            return [(label(row), float(v), float(t)) for row, v, t in zip(rows, values[rows], times[rows])]
+
+        return [(label(row), float(values[row]), float(times[row])) for row in rows if fields[row] == fieldId]
+
+    def _rows(self, names, key):
+        '''rows that have the key ids in the columns, in the order the rows are added'''
+        index = self._indexes.get(names)
+        if index == None:
+            index = self._buildIndex(names)
+            self._indexes[names] = index
+
+        if numpy == None:
+            return index.get(key, [])
+
+        # narrow down the range of the sorted rows column by column
+        order, sortedColumns = index
+        lo, hi = 0, len(order)
+        for column, id in zip(sortedColumns, key):
+            lo, hi = lo + numpy.searchsorted(column[lo:hi], id, "left"), lo + numpy.searchsorted(column[lo:hi], id, "right")
+        return order[lo:hi]
+
+    def _buildIndex(self, names):
+        c = self._columns
+        if numpy == None:
+            index = {}
+            for row in range(self._numRows):
+                index.setdefault(tuple(int(c[name][row]) for name in names), []).append(row)
+            return index
+
+        # lexsort is stable, so rows of the same key stay in the order they are added
+        order = numpy.lexsort([numpy.asarray(c[name]) for name in reversed(names)])
+        return (order, [numpy.asarray(c[name])[order] for name in names])
+
+    def _ids(self, *strings):
+        ids = tuple(self._stringIds.get(s) for s in strings)
+        return None if None in ids else ids
+
+    def _string(self, column, row):
+        return self._strings[int(self._columns[column][row])]
+
+    def _stringId(self, s):
+        id = self._stringIds.get(s)
+        if id == None:
+            id = len(self._strings)
+            self._strings.append(s)
+            self._stringIds[s] = id
+        return id
+
+    def _loadStrings(self):
+        size = 0 # bytes of complete lines
+        try:
+            with open(self._stringsPath(), "rb") as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError()
+                        s = json.loads(line.decode())
+                    except ValueError:
+                        # partially written last line. drop it, so the next append starts on a new line
+                        os.truncate(self._stringsPath(), size)
+                        break
+                    size = size + len(line)
+                    self._stringIds[s] = len(self._strings)
+                    self._strings.append(s)
+        except FileNotFoundError:
+            pass
+        self._numStringsWritten = len(self._strings)
+
+    def _flushStrings(self):
+        if self._numStringsWritten == len(self._strings):
+            return
+        with open(self._stringsPath(), "a") as f:
+            for s in self._strings[self._numStringsWritten:]:
+                f.write(json.dumps(s) + "\n")
+        self._numStringsWritten = len(self._strings)
+
+    def _loadColumns(self):
+        # number of complete rows. a crash while appending may leave columns of different length
+        numRows = None
+        for name, typecode in ScoreHistory.Columns:
+            path = self._columnPath(name)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            n = size // array(typecode).itemsize
+            numRows = n if numRows == None else min(numRows, n)
+
+        for name, typecode in ScoreHistory.Columns:
+            # drop incomplete rows, so the next append is aligned
+            path = self._columnPath(name)
+            if os.path.exists(path) and os.path.getsize(path) > numRows * array(typecode).itemsize:
+                os.truncate(path, numRows * array(typecode).itemsize)
+            self._columns[name] = self._readColumn(name, typecode, numRows)
+        return numRows
+
+    def _mapColumns(self):
+        # map the files grown by add() since the last query. nothing is read
+        if self._numRowsMapped == self._numRows:
+            return
+        for name, typecode in ScoreHistory.Columns:
+            self._columns[name] = self._readColumn(name, typecode, self._numRows)
+        self._numRowsMapped = self._numRows
+
+    def _readColumn(self, name, typecode, numRows):
+        path = self._columnPath(name)
+        if numRows == 0:
+            return array(typecode)
+
+        if numpy != None:
+            dtype = numpy.intc if typecode == "i" else numpy.float64
+            return numpy.memmap(path, dtype=dtype, mode="r", shape=(numRows,))
+
+        column = array(typecode)
+        with open(path, "rb") as f:
+            column.fromfile(f, numRows)
+        return column
+
+    def _stringsPath(self):
+        return os.path.join(self._dirPath, "strings.jsonl")
+
+    def _columnPath(self, name):
+        typecode = dict(ScoreHistory.Columns)[name]
+        return os.path.join(self._dirPath, "{}.{}".format(name, "i32" if typecode == "i" else "f64"))
@@ -0,0 +1,87 @@
+class DiffIndex():
+    '''
+    Path component trie over changed files of a diff returned by RepoReader._gitDiff().
+
+    Diff is loaded once, and each node keeps number of changed files under it,
+    so changes under a project or a model directory are found in a single lookup
+    instead of scanning the whole changed file list per project and model.
+    Paths are matched by component, so '/proj1' does not match '/proj10'.
+    '''
+    ChangeTypes = ["added", "modified", "deleted", "renamed"]
+
+    class _Node():
+        __slots__ = ["children", "count", "changes"]
+
+        def __init__(self):
+            self.children = {}
+            self.count = 0 # number of changed files at or under this node
+            self.changes = [] # list of (changeType, diff entry, order in the diff) for this exact path
+
+    def __init__(self, diff):
+        self._root = DiffIndex._Node()
+        self._numEntries = 0
+
+        for changeType in DiffIndex.ChangeTypes:
+            for entry in diff[changeType]:
+                # renamed entry is tuple of (from, to). it belongs to the new path
+                path = entry[1] if isinstance(entry, tuple) else entry
+                self._insert(path, changeType, entry)
+
+    def _insert(self, path, changeType, entry):
+        node = self._root
+        node.count = node.count + 1
+        for name in self._split(path):
+            child = node.children.get(name)
+            if child == None:
+                child = DiffIndex._Node()
+                node.children[name] = child
+            node = child
+            node.count = node.count + 1
+
+        node.changes.append((changeType, entry, self._numEntries))
+        self._numEntries = self._numEntries + 1
+
+    @staticmethod
+    def ofList(changedFileList):
+        '''index of a single list of diff entries'''
+        return DiffIndex({"added": changedFileList, "modified": [], "deleted": [], "renamed": []})
+
+    def _find(self, path):
+        node = self._root
+        for name in self._split(path):
+            node = node.children.get(name)
+            if node == None:
+                return None
+        return node
+
+    def _split(self, path):
+        return [name for name in path.split("/") if name != "" and name != "."]
+
+    def count(self, path):
+        '''number of changed files at or under the path'''
+        node = self._find(path)
+        return 0 if node == None else node.count
+
+    def changesAt(self, path, changeType=None):
+        '''diff entries of the exact file path'''
+        node = self._find(path)
+        if node == None:
+            return []
+        return [entry for t, entry, _ in node.changes if changeType == None or t == changeType]
+
+    def entriesUnder(self, path, excludePath=None):
+        '''diff entries at or under the path, except the ones under excludePath, in diff order'''
+        node = self._find(path)
+        if node == None:
+            return []
+        excluded = self._find(excludePath) if excludePath != None else None
+
+        changes = []
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            if n is excluded:
+                continue
+            changes.extend(n.changes)
+            stack.extend(n.children.values())
+        return [entry for _, entry, _ in sorted(changes, key=lambda c: c[2])]
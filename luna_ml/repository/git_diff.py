@@ -0,0 +1,139 @@
+import os
+import threading
+from git import Commit
+
+class GitDiff():
+    '''
+    List changed files between two commits, the index and the working tree,
+    using a single 'git diff --name-status -z' pass.
+
+    Output of git is parsed while it is streamed, and can be limited to pathspecs
+    (e.g. directories of Luna projects), so a diff on a large repository does not
+    need to compare, or even list, files that do not belong to any project.
+    '''
+    ReadSize = 64 * 1024
+
+    def __init__(self, repo, rootDir, renames=True, renameThreshold=None):
+        '''
+        renames:
+          Detect renamed files. When False, a rename is reported as delete and add.
+        renameThreshold:
+          Similarity index (0-100) for rename detection. Default is git's default (50).
+        '''
+        self._repo = repo
+        self._rootDir = rootDir
+        self._renames = renames
+        self._renameThreshold = renameThreshold
+
+    def diff(self, orig, current=None, pathspecs=None):
+        '''
+        orig:
+          None for the index
+        current:
+          None for working tree
+          'HEAD' for head
+        pathspecs:
+          list of paths relative to the repository root to limit the diff. None for whole repository.
+
+        returns dict of "added", "modified", "deleted" list of absolute paths, and
+        "renamed" list of tuple (from, to).
+        '''
+        diff = {
+            "added": [],
+            "modified": [],
+            "renamed": [],
+            "deleted": []
+        }
+
+        if pathspecs != None and len(pathspecs) == 0:
+            return diff
+
+        # untracked files are only relevant when comparing against the working tree
+        if current == None:
+            untracked = self._untracked(pathspecs)
+            if orig == None:
+                diff["added"] = untracked
+                return diff
+
+        args = ["--name-status", "-z", "--no-color", "--no-ext-diff"]
+        if self._renames:
+            args.append("-M" if self._renameThreshold == None else f"-M{self._renameThreshold}%")
+        else:
+            args.append("--no-renames")
+
+        if orig == None:
+            # index against the commit
+            args.extend(["--cached", "-R", self._revision(current)])
+        else:
+            args.append(self._revision(orig))
+            if current != None:
+                args.append(self._revision(current))
+
+        self._parseNameStatus(self._tokens("diff", args, pathspecs), diff)
+
+        if current == None:
+            diff["added"].extend(untracked)
+
+        return diff
+
+    def _revision(self, rev):
+        if isinstance(rev, Commit):
+            return rev.hexsha
+        return rev
+
+    def _untracked(self, pathspecs):
+        args = ["--others", "--exclude-standard", "-z"]
+        return [self._absPath(path) for path in self._tokens("ls_files", args, pathspecs)]
+
+    def _absPath(self, path):
+        return "{}/{}".format(self._rootDir, path)
+
+    def _parseNameStatus(self, tokens, diff):
+        # each entry is "<status>\0<path>\0", or "<status><score>\0<from>\0<to>\0" for rename and copy
+        for status in tokens:
+            changeType = status[0]
+            if changeType in ("R", "C"):
+                src = next(tokens)
+                dst = next(tokens)
+                if changeType == "R":
+                    diff["renamed"].append((self._absPath(src), self._absPath(dst)))
+                else:
+                    diff["added"].append(self._absPath(dst))
+                continue
+
+            path = self._absPath(next(tokens))
+            if changeType == "A":
+                diff["added"].append(path)
+            elif changeType == "D":
+                diff["deleted"].append(path)
+            elif changeType in ("M", "T"):
+                diff["modified"].append(path)
+
+    def _tokens(self, command, args, pathspecs):
+        # run git command and yield NUL separated tokens of its output while it is read
+        if pathspecs != None:
+            args = args + ["--"] + list(pathspecs)
+
+        proc = getattr(self._repo.git, command)(*args, as_process=True)
+
+        # drain stderr in a thread, so git never blocks on a full stderr pipe while stdout is read
+        stderr = []
+        stderrReader = threading.Thread(target=lambda: stderr.append(proc.stderr.read()), daemon=True)
+        stderrReader.start()
+
+        rest = b""
+        while True:
+            chunk = proc.stdout.read(GitDiff.ReadSize)
+            if not chunk:
+                break
+
+            tokens = (rest + chunk).split(b"\0")
+            rest = tokens.pop() # incomplete token, continues in the next chunk
+            for token in tokens:
+                yield os.fsdecode(token)
+
+        if rest:
+            yield os.fsdecode(rest)
+
+        stderrReader.join()
+        proc.wait(stderr=b"".join(stderr))
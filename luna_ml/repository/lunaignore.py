@@ -0,0 +1,122 @@
+import re
+import hashlib
+
+class LunaIgnore():
+    '''
+    Exclusion rules of a '.lunaignore' file, in gitignore syntax.
+
+    Rules apply to paths under the directory of the file. Patterns are translated to
+    regular expressions once when the file is loaded. Consecutive patterns of the same kind
+    (exclude or '!' include, file or '/' directory only) are compiled into a single regular
+    expression, so a path is matched against a few expressions however many patterns there are.
+    As in gitignore, the last matching pattern decides.
+    '''
+    FileName = ".lunaignore"
+
+    def __init__(self, basePath, text):
+        self.basePath = basePath.rstrip("/")
+        self.digest = hashlib.sha1(text.encode()).hexdigest()
+
+        # list of (negate, dirOnly, compiled regex), in the order of the file
+        self._groups = []
+        group = None
+        for line in text.splitlines():
+            rule = LunaIgnore._parse(line)
+            if rule == None:
+                continue
+
+            negate, dirOnly, regex = rule
+            if group == None or group[0] != negate or group[1] != dirOnly:
+                group = (negate, dirOnly, [])
+                self._groups.append(group)
+            group[2].append(regex)
+
+        self._groups = [(negate, dirOnly, re.compile("(?:{})".format("|".join(regexes)))) for negate, dirOnly, regexes in self._groups]
+
+    def match(self, path, isDir):
+        '''
+        True when the path is excluded, False when it is included by a '!' pattern,
+        None when no pattern matches.
+        '''
+        relPath = path[len(self.basePath) + 1:]
+        for negate, dirOnly, regex in reversed(self._groups):
+            if dirOnly and not isDir:
+                continue
+            if regex.fullmatch(relPath):
+                return not negate
+        return None
+
+    @staticmethod
+    def _parse(line):
+        line = line.rstrip("\n\r")
+        if line.strip() == "" or line.startswith("#"):
+            return None
+
+        # trailing spaces are ignored unless escaped
+        if not line.endswith("\\ "):
+            line = line.rstrip(" ")
+
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        elif line.startswith("\\!") or line.startswith("\\#"):
+            line = line[1:]
+
+        dirOnly = line.endswith("/")
+        line = line.rstrip("/")
+        if line == "":
+            return None
+
+        # pattern with a slash is relative to the directory of the file,
+        # otherwise it matches a name at any level
+        if "/" in line:
+            regex = LunaIgnore._translate(line.lstrip("/"))
+        else:
+            regex = "(?:.*/)?" + LunaIgnore._translate(line)
+
+        return negate, dirOnly, regex
+
+    @staticmethod
+    def _translate(pattern):
+        i = 0
+        n = len(pattern)
+        res = []
+        while i < n:
+            c = pattern[i]
+            if pattern.startswith("**/", i):
+                res.append("(?:.*/)?") # zero or more directories
+                i = i + 3
+            elif pattern.startswith("/**", i) and i + 3 == n:
+                res.append("/.*") # everything inside
+                i = i + 3
+            elif pattern.startswith("**", i):
+                res.append(".*")
+                i = i + 2
+            elif c == "*":
+                res.append("[^/]*")
+                i = i + 1
+            elif c == "?":
+                res.append("[^/]")
+                i = i + 1
+            elif c == "[" and pattern.find("]", i + 2) != -1:
+                j = pattern.find("]", i + 2)
+                body = pattern[i + 1:j]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                res.append("[{}]".format(body.replace("\\", "\\\\")))
+                i = j + 1
+            elif c == "\\" and i + 1 < n:
+                res.append(re.escape(pattern[i + 1]))
+                i = i + 2
+            else:
+                res.append(re.escape(c))
+                i = i + 1
+        return "".join(res)
+
+def isIgnored(ignores, path, isDir):
+    '''path is excluded by the innermost .lunaignore that has a matching pattern'''
+    for ignore in reversed(ignores):
+        matched = ignore.match(path, isDir)
+        if matched != None:
+            return matched
+    return False
@@ -0,0 +1,76 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+def gitBlobSha(path):
+    '''SHA of the file as a git blob object, same as 'git hash-object <path>' without filters'''
+    h = hashlib.sha1()
+    h.update(f"blob {os.path.getsize(path)}\0".encode())
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def manifestHash(entries):
+    '''
+    Merkle hash of a project or a model. entries is a list of (relative path, blob SHA)
+    of its yaml file and resources. Hash depends only on file names and content, not on
+    the location of the project or model, the commit or how the files were changed.
+    '''
+    h = hashlib.sha1()
+    for relPath, sha in sorted(entries):
+        h.update(f"{relPath}\0{sha}\n".encode())
+    return h.hexdigest()
+
+class ManifestStore():
+    '''
+    Manifest hash of each project and model at the last sync, keyed by path relative
+    to the repository root. Stored as a json file, e.g. '.git/luna-manifests.json'.
+    '''
+    def __init__(self, path):
+        self._path = path
+        self._manifests = None
+
+    def _load(self):
+        if self._manifests != None:
+            return
+
+        try:
+            with open(self._path, "r") as f:
+                self._manifests = json.load(f)
+        except FileNotFoundError:
+            self._manifests = {}
+        except Exception as e:
+            # broken file is the same as nothing synced yet
+            logger.warning(f"Can not read {self._path}. {e}")
+            self._manifests = {}
+
+    def get(self, relPath):
+        self._load()
+        return self._manifests.get(relPath)
+
+    def put(self, relPath, manifest):
+        self._load()
+        self._manifests[relPath] = manifest
+
+    def remove(self, relPath):
+        self._load()
+        self._manifests.pop(relPath, None)
+
+    def save(self):
+        if self._manifests == None:
+            return
+
+        # write to temporary file and rename, so the file is never partially written
+        fd, tmpPath = tempfile.mkstemp(dir=os.path.dirname(self._path))
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self._manifests, f, indent=1, sort_keys=True)
+            os.replace(tmpPath, self._path)
+        except Exception:
+            os.unlink(tmpPath)
+            raise
@@ -0,0 +1,122 @@
+import sys
+
+class ResourceList():
+    '''
+    Resource files of a project or a model.
+
+    Paths are kept relative to the project or model directory and interned, so the same
+    relative path (e.g. 'weights/model.bin') is stored once and shared by every model that
+    has it. Absolute paths are built when iterated, so the list still behaves as a list of
+    absolute paths.
+    '''
+    __slots__ = ["_basePath", "_relPaths"]
+
+    def __init__(self, basePath, relPaths=None):
+        self._basePath = basePath
+        self._relPaths = [] if relPaths == None else [sys.intern(r) for r in relPaths]
+
+    @property
+    def basePath(self):
+        return self._basePath
+
+    def relPaths(self):
+        '''list of paths relative to the base path'''
+        return self._relPaths
+
+    def add(self, relPath):
+        self._relPaths.append(sys.intern(relPath))
+
+    def append(self, path):
+        '''add an absolute path under the base path'''
+        self.add(path[len(self._basePath) + 1:])
+
+    def sort(self):
+        # base path is the common prefix, so relative paths sort the same as absolute paths
+        self._relPaths.sort()
+
+    def _abs(self, relPath):
+        return f"{self._basePath}/{relPath}"
+
+    def __len__(self):
+        return len(self._relPaths)
+
+    def __iter__(self):
+        for relPath in self._relPaths:
+            yield self._abs(relPath)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._abs(r) for r in self._relPaths[i]]
+        return self._abs(self._relPaths[i])
+
+    def __contains__(self, path):
+        prefix = f"{self._basePath}/"
+        return path.startswith(prefix) and path[len(prefix):] in self._relPaths
+
+    def __eq__(self, other):
+        if isinstance(other, ResourceList):
+            return self._basePath == other._basePath and self._relPaths == other._relPaths
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+class _Record():
+    '''
+    Record with fixed fields. Fields are attributes, and can also be read and written
+    as dict items (record["action"]), as records used to be dicts.
+    '''
+    __slots__ = []
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def keys(self):
+        return list(self.__slots__)
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.__slots__]
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, dict(self.items()))
+
+class ProjectRecord(_Record):
+    __slots__ = ["yaml", "models", "modelBasePath", "resources", "action", "renamedFrom", "commit", "manifest"]
+
+    def __init__(self, projectBase, projectYaml, modelBasePath, commit):
+        self.yaml = projectYaml
+        self.models = {} # model path -> ModelRecord
+        self.modelBasePath = modelBasePath # absolute path
+        self.resources = ResourceList(projectBase) # resource files
+        self.action = None # action need to be taken for this project. "update", "delete", "rename". None for no change
+        self.renamedFrom = None # previous luna.yaml file path, in case of action is "rename"
+        self.commit = commit
+        self.manifest = None # hash of luna.yaml and resources content, when computed
+
+class ModelRecord(_Record):
+    __slots__ = ["yaml", "resources", "action", "commit", "manifest"]
+
+    def __init__(self, modelPath, commit):
+        self.yaml = None # loaded when the model directory is visited
+        self.resources = ResourceList(modelPath) # resource files
+        self.action = None
+        self.commit = commit # shared with the project, not copied
+        self.manifest = None # hash of model.yaml and resources content, when computed
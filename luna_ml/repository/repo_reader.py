@@ -1,237 +1,655 @@
 from git import Repo, InvalidGitRepositoryError
-import glob
 import sys, os
 import logging
+import hashlib
 from datetime import datetime
 import time
+from concurrent.futures import ThreadPoolExecutor
 from git import Commit
 from luna_ml.api.project_yaml import ProjectYaml
 from luna_ml.api.model_yaml import ModelYaml
+from luna_ml.api.yaml_cache import yamlCache
+from luna_ml.repository.scan_cache import ScanCache
+from luna_ml.repository.diff_index import DiffIndex
+from luna_ml.repository.repo_source import WorkingTreeSource, GitTreeSource
+from luna_ml.repository.git_diff import GitDiff
+from luna_ml.repository.records import ProjectRecord, ModelRecord, ResourceList
+from luna_ml.repository.manifest import ManifestStore, manifestHash
+from luna_ml.repository.lunaignore import LunaIgnore, isIgnored
 
 class RepoReader():
-    def __init__(self, repoRootDir, diffOrigHash=None, diffCurrHash=None):
+    def __init__(self, repoRootDir, diffOrigHash=None, diffCurrHash=None, incremental=False, useCache=False, readFromCommit=False, detectRenames=True, parallelism=1, lazy=False, skipSynced=False):
+        '''
+        incremental:
+          When True, only projects and models touched by the diff are walked and returned.
+          Untouched projects and models (the ones that would have action None) are skipped.
+        useCache:
+          When True, scan result of each project and model directory is stored in '.git/luna-cache'
+          keyed by its git tree SHA, and reused when the directory has no uncommitted change.
+        readFromCommit:
+          When True, projects and models are read from the diffCurrHash commit in the git object
+          database instead of the working tree, so no checkout is required. Use open() and stat()
+          to access resource files.
+        detectRenames:
+          Detect renamed files in the diff. When False, renames are reported as delete and add.
+        parallelism:
+          Number of threads listing directories and reading yaml files. 1 to scan in the calling thread.
+        lazy:
+          When True, the repository is not scanned on creation. Use iterProjects() or iterModels()
+          to get each project and model as soon as it is scanned, or getAll() to scan everything.
+        skipSynced:
+          When True, a manifest (hash of the yaml file and resources content) is computed for each
+          project and model, and the ones with the same manifest as the last sync get action None,
+          regardless of the diff. Use markSynced() and saveSynced() to remember synced ones.
+        '''
         self._repoRootDir = repoRootDir
-        self._projects = {}
+        self._projects = None
+        self._incremental = incremental
+        self._cache = None
+        self._cacheHits = 0
+        self._detectRenames = detectRenames
+        self._parallelism = parallelism
+        self._manifests = None
 
         self._repo = Repo(repoRootDir)
 
         if diffCurrHash == None: # working tree
+            if readFromCommit:
+                raise ValueError("readFromCommit requires diffCurrHash")
+
             ts = datetime.utcfromtimestamp(time.time()).strftime('%Y-%m-%d %H:%M:%S')
             self._commit = f"working_tree {ts}"
+            self._source = WorkingTreeSource(self._repo, repoRootDir)
         else:
             if isinstance(diffCurrHash, Commit):
-                self._commit = diffCurrHash.hexsha
+                commit = diffCurrHash
             else:
-                self._commit = self._repo.rev_parse(diffCurrHash).hexsha
-
-        # diff and scan
-        diff = self._gitDiff(orig=diffOrigHash, current=diffCurrHash)
-        self.scan(diff=diff)
-
-    def getAll(self):
-        return self._projects
+                commit = self._repo.rev_parse(diffCurrHash)
+            self._commit = commit.hexsha
 
-    def scan(self, diff=None):
-        lunaYamlPathList = []
-        modelBasePathList = []
-
-        # scan subdirs to find luna.yaml, and load
-        for filename in glob.iglob("{}/**/{}".format(self._repoRootDir.rstrip("/"), ProjectYaml.FileName), recursive=True):
-            lunaYamlPathList.append(filename)
-
-        for filename in lunaYamlPathList:
-            with open(filename, 'r') as file:
-                yaml = file.read()
-                projectYaml = ProjectYaml(yaml)
-
-            projectBase = os.path.dirname(filename).rstrip("/")
-
-            modelBasePath = "{}/{}".format(
-                projectBase,
-                projectYaml.modelBasePath.lstrip("/")
-            )
-            modelBasePathList.append(modelBasePath)
-
-            # project resources
-            resources = []
-            allFilesUnderProject = glob.glob("{}/**".format(projectBase), recursive=True)
-            allFilesUnderModelBase = glob.glob("{}/**".format(modelBasePath), recursive=True)
-            notPartOfResource = [filename, modelBasePath]
-            localEvalResult = glob.glob("{}/eval/**".format(projectBase), recursive=True)
-            localScoreResult = glob.glob("{}/eval/**".format(projectBase), recursive=True)
-            pycache = glob.glob("{}/__pycache__/**".format(projectBase), recursive=True)
-
-            # filter files only
-            allFilesUnderProject = [f for f in allFilesUnderProject if os.path.isfile(f)]
-
-            # build project resources
-            resources = list(set(allFilesUnderProject) - set(allFilesUnderModelBase) - set(notPartOfResource) - set(localEvalResult) - set(localScoreResult) - set(pycache))
-
-            # retreive action
-            if diff == None:
-                action = "update" # when no diff is provided, consider it modified
-                renamedFrom = None
+            if readFromCommit:
+                self._source = GitTreeSource(self._repo, repoRootDir, commit)
             else:
-                action, renamedFrom = self._getActionForProject(diff, os.path.dirname(filename), modelBasePath)
-
-            # get model dict
-            models = {}
-            for modelDir in glob.glob("{}/*".format(modelBasePath)):
-                if not os.path.isdir(modelDir):
-                    continue
-
-                m = self._scan_model(modelDir, diff=diff)
-                models[modelDir] = m
+                self._source = WorkingTreeSource(self._repo, repoRootDir)
 
-            self._projects[projectBase] = {
-                "yaml": projectYaml,
-                "models": models,
-                "modelBasePath": modelBasePath, # absolute path
-                "resources": resources, # list of resource files. absolute path
-                "action": action, # action need to be taken for this project. "update", "delete", "rename". None for no change
-                "renamedFrom": renamedFrom, # previous luna.yaml file path, in case of action is "rename"
-                "commit": self._commit
-            }
+        if useCache:
+            self._cache = ScanCache(os.path.join(self._repo.git_dir, "luna-cache"))
 
-    def _scan_model(self, path, diff=None):
-        path = path.rstrip("/")
-        modelYamlPath = "{}/{}".format(path, ModelYaml.FileName)
+        if skipSynced:
+            self._manifests = ManifestStore(os.path.join(self._repo.git_dir, "luna-manifests.json"))
 
-        # resources
-        allFilesUnderModel = glob.glob("{}/**".format(path), recursive=True)
-        notPartOfResource = [modelYamlPath]
-        pycache = glob.glob("{}/__pycache__/**".format(path), recursive=True)
+        # diff and scan. diff is limited to the project directories
+        pathspecs = self._projectPathspecs(diffOrigHash, diffCurrHash)
+        self._diff = self._gitDiff(orig=diffOrigHash, current=diffCurrHash, pathspecs=pathspecs)
+        if not lazy:
+            self.scan(diff=self._diff)
 
-        # filter files only
-        allFilesUnderModel = [f for f in allFilesUnderModel if os.path.isfile(f)]
-
-        resources = list(set(allFilesUnderModel) - set(notPartOfResource) - set(pycache))
-
-        # if ModelYaml.FileName does not exists, create a default one
-        if os.path.isfile(modelYamlPath):
-            with open(modelYamlPath, 'r') as file:
-                yaml = file.read()
-                modelYaml = ModelYaml(yaml)
-        else:
-            modelYaml = ModelYaml.default(os.path.basename(os.path.dirname(modelYamlPath)))
-
-        action, renamedFrom = self._getActionForModel(diff, path)
+    def getAll(self):
+        if self._projects == None:
+            self.scan(diff=self._diff)
+        return self._projects
 
-        return {
-            "yaml": modelYaml,
-            "resources": resources,
-            "action": action,
-            "commit": self._commit
-        }
+    def iterProjects(self):
+        '''
+        Scan the repository and yield (projectPath, project) as soon as each project and all
+        its models are scanned. Projects are not kept by the reader, so memory use is bounded
+        by the projects being scanned, not by the whole repository.
+        '''
+        for event, projectPath, _, record in self._iterScan(self._diff):
+            if event == "project":
+                yield projectPath, record
 
-    def _gitDiff(self, orig, current=None):
+    def iterModels(self):
         '''
-        current:
-          None for working tree
-          'HEAD' for head
+        Scan the repository and yield (projectPath, modelPath, model) as soon as each model is scanned.
         '''
+        for event, projectPath, modelPath, record in self._iterScan(self._diff):
+            if event == "model":
+                yield projectPath, modelPath, record
 
-        diff = {
-            "added": [],
-            "modified": [],
-            "renamed": [],
-            "deleted": []
-        }
+    def markSynced(self, path, record):
+        '''
+        Remember the manifest of the project or model synced to the server, so the next
+        scan with skipSynced skips it while its content does not change.
+        '''
+        if self._manifests == None:
+            return
 
-        untracked = []
-        for f in self._repo.untracked_files:
-            untracked.append("{}/{}".format(self._repoRootDir, f))
+        if record["action"] == "delete":
+            self._manifests.remove(self._relPath(path))
+            return
 
-        if orig == None and current == None:
-            diff["added"] = untracked
-            return diff
+        if record.get("renamedFrom") != None:
+            self._manifests.remove(self._relPath(os.path.dirname(record["renamedFrom"])))
+        self._manifests.put(self._relPath(path), record["manifest"])
 
-        if orig == None:
-            origIndex = self._repo.index
-        elif isinstance(orig, Commit):
-            origIndex = orig
-        else:
-            origIndex = self._repo.rev_parse(orig)
+    def saveSynced(self):
+        if self._manifests != None:
+            self._manifests.save()
 
-        if current == None:
-            currentIndex = None
-        elif isinstance(current, Commit):
-            currentIndex = current
-        else:
-            currentIndex = self._repo.rev_parse(current)
+    def open(self, path):
+        '''open a file (luna.yaml, model.yaml, resources) in binary mode'''
+        return self._source.open(path)
 
-        diffIndex = origIndex.diff(currentIndex)
-        for diffItem in diffIndex.iter_change_type("A"):
-            diff["added"].append("{}/{}".format(self._repoRootDir, diffItem.b_path))
+    def exists(self, path):
+        return self._source.exists(path)
 
-        for diffItem in diffIndex.iter_change_type("M"):
-            diff["modified"].append("{}/{}".format(self._repoRootDir, diffItem.b_path))
+    def stat(self, path):
+        '''size and blob SHA (when reading from commit) of a file'''
+        return self._source.stat(path)
 
-        for diffItem in diffIndex.iter_change_type("R"):
-            diff["renamed"].append(
-                ("{}/{}".format(self._repoRootDir, diffItem.a_path),
-                "{}/{}".format(self._repoRootDir, diffItem.b_path))
-            )
+    def scan(self, diff=None):
+        projects = {}
+        for event, projectPath, _, record in self._iterScan(diff):
+            if event == "project":
+                projects[projectPath] = record
+
+        # output does not depend on the order directories are walked
+        self._projects = dict(sorted(projects.items()))
+
+    def _iterScan(self, diff):
+        # Walk the repository once. Each directory is listed once by the source and
+        # every file is classified into project resource, model resource or excluded path while
+        # walking, so no path is visited twice. Classification is driven by 'contexts', a tuple of
+        # (role, record, anchorPath, modelBasePath) for every project the directory belongs to.
+        #
+        # In incremental mode, directories outside of any project or model are only walked when
+        # they are on the path to a changed file, so the walk grows with the size of the diff.
+        #
+        # When the cache is enabled, clean project and model directories are restored from the
+        # cache instead of being walked.
+        #
+        # Files and directories excluded by .lunaignore files of the repository root, projects and
+        # models are pruned while walking. 'ignores' is a tuple of LunaIgnore that apply to the directory.
+        #
+        # Listing directories and reading yaml files and cache entries is done by _visitDir(), on a
+        # thread pool when parallelism > 1. Everything else is done by the calling thread.
+        #
+        # Each project and model counts its directories being walked. When the count drops to zero
+        # the record is complete, and yielded as ("project", projectPath, None, project) or
+        # ("model", projectPath, modelPath, model).
+        self._tracking = {} # id of record -> _Tracking, for records being scanned
+        self._diffIndex = DiffIndex(diff) if diff != None else None
+        self._incrementalScan = self._incremental and self._diffIndex != None
+
+        rootDir = self._repoRootDir.rstrip("/")
+        if self._cache != None:
+            self._source.treeSha(rootDir) # load tree SHAs before visiting directories from threads
+
+        yield from self._walk(rootDir)
+
+    def _walk(self, rootDir):
+        if self._parallelism <= 1:
+            stack = [(rootDir, (), ())]
+            while stack:
+                dirPath, contexts, ignores = stack.pop()
+                children, events = self._processDir(dirPath, contexts, ignores, self._visitDir(dirPath, contexts, ignores))
+
+                # push in reverse order to visit subdirs in name order
+                stack.extend(reversed(children))
+                yield from events
+            return
+
+        # walk in the same depth first order, while the next directories on the stack are visited ahead
+        # on the pool. visits in flight are bounded, so a project is completed and yielded before
+        # the walk moves on to the next one.
+        maxInFlight = 2 * self._parallelism
+        with ThreadPoolExecutor(max_workers=self._parallelism) as pool:
+            stack = [[rootDir, (), (), None]] # [dirPath, contexts, ignores, future]
+            inFlight = 0
+            try:
+                while stack:
+                    # visit ahead from the top of the stack, which is walked next
+                    i = len(stack) - 1
+                    while i >= 0 and inFlight < maxInFlight:
+                        entry = stack[i]
+                        if entry[3] == None:
+                            entry[3] = pool.submit(self._visitDir, entry[0], entry[1], entry[2])
+                            inFlight += 1
+                        i -= 1
+
+                    dirPath, contexts, ignores, future = stack.pop()
+                    inFlight -= 1
+                    children, events = self._processDir(dirPath, contexts, ignores, future.result())
+                    stack.extend([subPath, childContexts, childIgnores, None] for subPath, childContexts, childIgnores in reversed(children))
+                    yield from events
+            except BaseException:
+                for entry in stack:
+                    if entry[3] != None:
+                        entry[3].cancel()
+                raise
+
+    def _visitDir(self, dirPath, contexts, ignores):
+        # Read everything needed to process the directory. May run on a worker thread,
+        # so it must not modify any state of the reader.
+        visit = {
+            "fileNames": [],
+            "dirNames": [],
+            "modelYaml": None, # when the directory is a model directory
+            "modelEntry": None, # cache entry, when the model is restored from the cache
+            "projectYaml": None, # when the directory is a project directory
+            "projectEntry": None, # cache entry, when the project is restored from the cache
+            "lunaIgnore": None, # LunaIgnore of the repository root, project or model directory
+            "ignoresKey": None # part of the cache key of the project or model directory
+        }
 
-        for diffItem in diffIndex.iter_change_type("D"):
-            diff["deleted"].append("{}/{}".format(self._repoRootDir, diffItem.b_path))
+        isModel = any(role == RepoReader._RoleModel and anchorPath == dirPath for role, _, anchorPath, _ in contexts)
+        if self._cache != None:
+            visit["ignoresKey"] = self._ignoresKey(dirPath, ignores)
+
+        # model directory that does not belong to any other project area
+        if isModel and self._cache != None and len(contexts) == 1:
+            visit["modelEntry"] = self._getFromCache("model", dirPath, os.path.basename(dirPath), visit["ignoresKey"])
+            if visit["modelEntry"] != None:
+                return visit
+
+        visit["fileNames"], visit["dirNames"] = self._source.listDir(dirPath)
+
+        if isModel:
+            visit["modelYaml"] = self._loadModelYaml(dirPath, visit["fileNames"])
+
+        isProject = ProjectYaml.FileName in visit["fileNames"]
+        if isProject:
+            if self._cache != None and len(contexts) == 0:
+                visit["projectEntry"] = self._getFromCache("project", dirPath, visit["ignoresKey"])
+
+            if visit["projectEntry"] == None:
+                visit["projectYaml"] = self._parseYaml(ProjectYaml, f"{dirPath}/{ProjectYaml.FileName}")
+
+        # .lunaignore is a hidden file, that is not listed. only looked up where it is allowed.
+        if dirPath == self._repoRootDir.rstrip("/") or isProject or isModel:
+            lunaIgnorePath = f"{dirPath}/{LunaIgnore.FileName}"
+            if self._source.exists(lunaIgnorePath):
+                visit["lunaIgnore"] = LunaIgnore(dirPath, self._source.readText(lunaIgnorePath))
+
+        return visit
+
+    def _processDir(self, dirPath, contexts, ignores, visit):
+        # returns list of (subPath, childContexts, childIgnores) to walk next, and list of completed records
+        if visit["modelEntry"] != None:
+            self._restoreModel(dirPath, contexts[0][1], visit["modelEntry"])
+            return [], self._leaveDir(contexts)
+
+        contexts = self._enterDir(dirPath, visit, contexts)
+
+        fileNames = visit["fileNames"]
+        dirNames = visit["dirNames"]
+        if visit["lunaIgnore"] != None:
+            ignores = ignores + (visit["lunaIgnore"],)
+        if len(ignores) > 0:
+            fileNames = [name for name in fileNames if not isIgnored(ignores, f"{dirPath}/{name}", False)]
+            dirNames = [name for name in dirNames if not isIgnored(ignores, f"{dirPath}/{name}", True)]
+
+        for role, record, anchorPath, _ in contexts:
+            if role == RepoReader._RoleProject:
+                excluded = ProjectYaml.FileName
+            elif role == RepoReader._RoleModel:
+                excluded = ModelYaml.FileName
+            else: # files directly under model base path are not part of any model
+                continue
+
+            # resources are kept relative to the project or model directory
+            if dirPath == anchorPath:
+                for name in fileNames:
+                    if name != excluded:
+                        record.resources.add(name)
+            else:
+                relDir = dirPath[len(anchorPath) + 1:]
+                for name in fileNames:
+                    record.resources.add(f"{relDir}/{name}")
+
+        children = []
+        for name in dirNames:
+            subPath = f"{dirPath}/{name}"
+            if self._incrementalScan and self._diffIndex.count(subPath) == 0 and not self._isMaterialized(contexts):
+                continue
+
+            childContexts = []
+            for context in contexts:
+                childContext = self._childContext(context, dirPath, name, subPath)
+                if childContext != None:
+                    childContexts.append(childContext)
+
+            # subdirs of the project area restored from the cache, other than model base path, need no walk.
+            # cache entry is created only for a project that does not have other projects inside.
+            if len(childContexts) == 0 and len(contexts) > 0 and all(c[0] == RepoReader._RoleCachedProject for c in contexts):
+                continue
+
+            for t in self._trackingOf(childContexts):
+                t.pending = t.pending + 1
+            children.append((subPath, tuple(childContexts), ignores))
+
+        return children, self._leaveDir(contexts)
+
+    def _isMaterialized(self, contexts):
+        # directory belongs to a project area or a model that is going to be returned
+        for role, _, _, _ in contexts:
+            if role == RepoReader._RoleProject or role == RepoReader._RoleModel:
+                return True
+        return False
+
+    def _trackingOf(self, contexts):
+        # records the directory belongs to, including the project of a model
+        trackings = {}
+        for _, record, _, _ in contexts:
+            t = self._tracking[id(record)]
+            trackings[id(record)] = t
+            if t.project != None:
+                trackings[id(t.project)] = self._tracking[id(t.project)]
+        return trackings.values()
+
+    def _leaveDir(self, contexts):
+        events = []
+
+        # models complete before the project they belong to
+        for t in sorted(self._trackingOf(contexts), key=lambda t: t.kind != "model"):
+            t.pending = t.pending - 1
+            if t.pending == 0:
+                event = self._complete(t)
+                if event != None:
+                    events.append(event)
+
+        return events
+
+    def _complete(self, t):
+        del self._tracking[id(t.record)]
+        record = t.record
+        record.resources.sort()
+
+        if t.kind == "model":
+            project = t.project
+            projectPath = self._tracking[id(project)].path
+            if self._diffIndex == None:
+                record.action = "update"
+            else:
+                record.action, _ = self._getActionForModel(self._diffIndex, t.path)
 
-        if current == None:
-            diff["added"].extend(untracked)
+            self._skipIfSynced(t)
+            self._storeToCache(t)
 
-        return diff
+            if self._incrementalScan and record.action == None:
+                del project.models[t.path]
+                return None
+            return ("model", projectPath, t.path, record)
+        else:
+            record.models = dict(sorted(record.models.items()))
+            if self._diffIndex == None:
+                record.action = "update" # when no diff is provided, consider it modified
+                record.renamedFrom = None
+            else:
+                record.action, record.renamedFrom = self._getActionForProject(self._diffIndex, t.path, record.modelBasePath)
+
+            self._skipIfSynced(t)
+            self._storeToCache(t)
+
+            if self._incrementalScan and record.action == None and len(record.models) == 0:
+                return None
+            return ("project", t.path, None, record)
+
+    def _skipIfSynced(self, t):
+        if self._manifests == None:
+            return
+
+        record = t.record
+        if record.action == "delete":
+            return
+
+        record.manifest = self._manifestOf(t)
+        if record.action == "update" and self._manifests.get(self._relPath(t.path)) == record.manifest:
+            record.action = None
+
+    def _manifestOf(self, t):
+        # blob SHA is taken from git when the file is not modified, so unchanged files are not read
+        entries = [(r, self._source.blobSha(f"{t.path}/{r}")) for r in t.record.resources.relPaths()]
+
+        yamlName = ModelYaml.FileName if t.kind == "model" else ProjectYaml.FileName
+        yamlPath = f"{t.path}/{yamlName}"
+        if self._source.exists(yamlPath):
+            entries.append((yamlName, self._source.blobSha(yamlPath)))
+
+        return manifestHash(entries)
+
+    def _relPath(self, path):
+        # path relative to the repository root
+        return path[len(self._repoRootDir.rstrip("/")):].lstrip("/") or "."
+
+    _RoleProject = "project"
+    _RoleCachedProject = "cachedProject" # project area restored from the cache. only walked toward the model base path
+    _RoleModelBase = "modelBase"
+    _RoleModel = "model"
+
+    def _enterDir(self, dirPath, visit, contexts):
+        # the directory is a model directory
+        for role, record, anchorPath, _ in contexts:
+            if role == RepoReader._RoleModel and dirPath == anchorPath:
+                record.yaml = visit["modelYaml"]
+                self._tracking[id(record)].ignoresKey = visit["ignoresKey"]
+
+        # the directory is a project directory
+        if visit["projectEntry"] != None or visit["projectYaml"] != None:
+            # enclosing projects and models have a project inside, that can not be restored from the cache
+            for t in self._trackingOf(contexts):
+                t.nested = True
+
+            if visit["projectEntry"] != None:
+                project = self._restoreProject(dirPath, visit["projectEntry"])
+                role = RepoReader._RoleCachedProject
+            else:
+                project = self._addProject(dirPath, visit["projectYaml"])
+                self._tracking[id(project)].ignoresKey = visit["ignoresKey"]
+                role = RepoReader._RoleProject
+
+            modelBasePath = os.path.normpath(project.modelBasePath)
+            if modelBasePath == dirPath:
+                role = RepoReader._RoleModelBase
+            contexts = contexts + ((role, project, dirPath, modelBasePath),)
+
+        return contexts
+
+    def _childContext(self, context, dirPath, name, subPath):
+        role, record, anchorPath, modelBasePath = context
+
+        if role == RepoReader._RoleProject:
+            if subPath == modelBasePath:
+                return (RepoReader._RoleModelBase, record, anchorPath, modelBasePath)
+            if dirPath == anchorPath and name in ("eval", "__pycache__"):
+                return None # local eval result, score result and pycache are not part of resources
+            return context
+
+        if role == RepoReader._RoleCachedProject:
+            if subPath == modelBasePath:
+                return (RepoReader._RoleModelBase, record, anchorPath, modelBasePath)
+            if modelBasePath.startswith(f"{subPath}/"):
+                return context
+            return None
+
+        if role == RepoReader._RoleModelBase:
+            # each subdir of the model base path is a model
+            model = ModelRecord(subPath, self._commit)
+            record.models[subPath] = model
+            self._tracking[id(model)] = _Tracking("model", subPath, model, project=record)
+            return (RepoReader._RoleModel, model, subPath, None)
+
+        if role == RepoReader._RoleModel:
+            if dirPath == anchorPath and name == "__pycache__":
+                return None
+            return context
+
+        return None
+
+    def _addProject(self, projectBase, projectYaml):
+        modelBasePath = "{}/{}".format(
+            projectBase,
+            projectYaml.modelBasePath.lstrip("/")
+        )
+
+        project = ProjectRecord(projectBase, projectYaml, modelBasePath, self._commit)
+
+        t = _Tracking("project", projectBase, project)
+        t.pending = 1 # the project directory itself
+        self._tracking[id(project)] = t
+        return project
+
+    def _loadModelYaml(self, path, fileNames):
+        # if ModelYaml.FileName does not exists, create a default one
+        if ModelYaml.FileName in fileNames:
+            return self._parseYaml(ModelYaml, f"{path}/{ModelYaml.FileName}")
+        else:
+            return ModelYaml.default(os.path.basename(path))
 
-    def _getActionForProject(self, diff, projectPath, modelbasePath):
-        filteredDiff = {
-            "added": self._filterChangedFileListForProject(diff["added"], projectPath, modelbasePath),
-            "modified": self._filterChangedFileListForProject(diff["modified"], projectPath, modelbasePath),
-            "deleted": self._filterChangedFileListForProject(diff["deleted"], projectPath, modelbasePath),
-            "renamed": self._filterChangedFileListForProject(diff["renamed"], projectPath, modelbasePath)
-        }
+    def _parseYaml(self, cls, path):
+        # the same file content is parsed once in the process
+        return yamlCache.get(cls, self._source.contentKey(path), lambda: self._source.readText(path))
 
+    def _gitDiff(self, orig, current=None, pathspecs=None):
+        '''
+        current:
+          None for working tree
+          'HEAD' for head
+        pathspecs:
+          list of paths relative to the repository root to limit the diff. None for whole repository.
+        '''
+        return GitDiff(
+            self._repo,
+            self._repoRootDir,
+            renames=self._detectRenames
+        ).diff(orig, current=current, pathspecs=pathspecs)
+
+    def _projectPathspecs(self, orig=None, current=None):
+        # directories of projects in current, from luna.yaml files only.
+        # cheaper than walking the repository, and lets the diff skip files outside of projects.
+        lunaYamlGlob = f":(glob)**/{ProjectYaml.FileName}"
+        lunaYamlPaths = []
+        if current == None or orig == None:
+            # working tree, from the index and untracked files. or the index, when diffed against a commit
+            others = ["--others", "--exclude-standard"] if current == None else []
+            lunaYamlPaths.extend(self._repo.git.ls_files("-z", "--cached", *others, "--", lunaYamlGlob).split("\0"))
+        if current != None:
+            # projects of the commit. ls-tree has no glob pathspec, names are filtered here
+            rev = current.hexsha if isinstance(current, Commit) else current
+            for path in self._repo.git.ls_tree("-r", "-z", "--name-only", rev).split("\0"):
+                if os.path.basename(path) == ProjectYaml.FileName:
+                    lunaYamlPaths.append(path)
+
+        pathspecs = set()
+        for path in lunaYamlPaths:
+            if path == "":
+                continue
+            pathspecs.add(os.path.dirname(path) or ".")
+
+        # directories of projects deleted or renamed since orig. they are not in current any more,
+        # and the old side of a rename has to be in the diff for the rename to be detected.
+        if orig != None:
+            lunaYamlDiff = self._gitDiff(orig, current=current, pathspecs=[lunaYamlGlob])
+            for path in lunaYamlDiff["deleted"] + [ren[0] for ren in lunaYamlDiff["renamed"]]:
+                pathspecs.add(self._relPath(os.path.dirname(path)))
+        return sorted(pathspecs)
+
+    def _getActionForProject(self, diffIndex, projectPath, modelbasePath):
         yamlPath = "{}/{}".format(projectPath, ProjectYaml.FileName)
 
         # action is delete when luna.yaml is deleted
-        if yamlPath in filteredDiff["deleted"]:
+        if len(diffIndex.changesAt(yamlPath, "deleted")) > 0:
             return ("delete", None)
-        
+
         # action is rename when luna.yaml is renamed
-        for ren in filteredDiff["renamed"]:
-            if ren[1] == yamlPath:
-                return ("rename", ren[0])
+        for ren in diffIndex.changesAt(yamlPath, "renamed"):
+            return ("rename", ren[0])
 
-        # action is update for any other changes
-        if len(filteredDiff["added"]) + len(filteredDiff["modified"]) + len(filteredDiff["deleted"]) + len(filteredDiff["renamed"]) > 0:
+        # action is update for any other changes, except changes under the model base path
+        numChanges = diffIndex.count(projectPath)
+        if self._isUnder(modelbasePath, projectPath):
+            numChanges = numChanges - diffIndex.count(modelbasePath)
+
+        if numChanges > 0:
             return ("update", None)
 
         # no action required
         return (None, None)
 
-    def _getActionForModel(self, diff, modelPath):
-        filteredDiff = {
-            "added": self._filterChangedFileListForModel(diff["added"], modelPath),
-            "modified": self._filterChangedFileListForModel(diff["modified"], modelPath),
-            "deleted": self._filterChangedFileListForModel(diff["deleted"], modelPath),
-            "renamed": self._filterChangedFileListForModel(diff["renamed"], modelPath)
-        }
-
-        yamlPath = "{}/{}".format(modelPath, ModelYaml.FileName)
-
+    def _getActionForModel(self, diffIndex, modelPath):
         # for now, model delete, rename is not supported.
 
         # action is update for any changes
-        if len(filteredDiff["added"]) + len(filteredDiff["modified"]) + len(filteredDiff["deleted"]) + len(filteredDiff["renamed"]) > 0:
+        if diffIndex.count(modelPath) > 0:
             return ("update", None)
 
         # no action required
         return (None, None)
 
+    def _isUnder(self, path, dirPath):
+        path = os.path.normpath(path)
+        dirPath = os.path.normpath(dirPath)
+        return path == dirPath or path.startswith(dirPath.rstrip("/") + "/")
 
     def _filterChangedFileListForProject(self, changedFileList, projectPath, modelbasePath):
-        changedFileInTheProject = [f for f in changedFileList if (isinstance(f, tuple) and f[1].startswith(projectPath)) or (isinstance(f, str) and f.startswith(projectPath))]
-        changedFileInTheProjectExcludeModels = [f for f in changedFileInTheProject if not ((isinstance(f, tuple) and f[1].startswith(modelbasePath)) or (isinstance(f, str) and f.startswith(modelbasePath)))]
-        return changedFileInTheProjectExcludeModels
+        # changes of the project excluding its models, for callers of the list api
+        return DiffIndex.ofList(changedFileList).entriesUnder(projectPath, excludePath=modelbasePath)
 
     def _filterChangedFileListForModel(self, changedFileList, modelPath):
-        changedFileListForModel = [f for f in changedFileList if (isinstance(f, tuple) and f[1].startswith(modelPath)) or (isinstance(f, str) and f.startswith(modelPath))]
-        return changedFileListForModel
+        return DiffIndex.ofList(changedFileList).entriesUnder(modelPath)
+
+    def _getFromCache(self, kind, dirPath, *args):
+        treeSha = self._source.treeSha(dirPath)
+        if treeSha == None:
+            return None
+        return self._cache.get(self._cache.key(kind, treeSha, *args))
+
+    def _ignoresKey(self, dirPath, ignores):
+        # cached scan result of a directory depends on .lunaignore files of the enclosing directories
+        return ",".join(f"{os.path.relpath(ignore.basePath, dirPath)}:{ignore.digest}" for ignore in ignores)
+
+    def _restoreProject(self, projectBase, entry):
+        project = self._addProject(projectBase, self._yamlFromCache(ProjectYaml, entry["yaml"]))
+        project.resources = ResourceList(projectBase, entry["resources"])
+        self._tracking[id(project)].restored = True
+        self._cacheHits = self._cacheHits + 1
+        return project
+
+    def _restoreModel(self, modelDir, model, entry):
+        if entry["yaml"] == None:
+            model.yaml = ModelYaml.default(os.path.basename(modelDir))
+        else:
+            model.yaml = self._yamlFromCache(ModelYaml, entry["yaml"])
+        model.resources = ResourceList(modelDir, entry["resources"])
+        self._tracking[id(model)].restored = True
+        self._cacheHits = self._cacheHits + 1
+
+    def _storeToCache(self, t):
+        if self._cache == None or t.restored or t.nested:
+            return
+
+        treeSha = self._source.treeSha(t.path)
+        if treeSha == None:
+            return
+
+        if t.kind == "model":
+            key = self._cache.key("model", treeSha, os.path.basename(t.path), t.ignoresKey)
+            yamlPath = f"{t.path}/{ModelYaml.FileName}"
+        else:
+            key = self._cache.key("project", treeSha, t.ignoresKey)
+            yamlPath = f"{t.path}/{ProjectYaml.FileName}"
+
+        # yaml text, not the parsed object, so the entry is plain data. None for a model without model.yaml
+        self._cache.put(key, {
+            "yaml": self._source.readText(yamlPath) if self._source.exists(yamlPath) else None,
+            "resources": t.record.resources.relPaths()
+        })
+
+    def _yamlFromCache(self, cls, yamlText):
+        # the same text is parsed once in the process
+        return yamlCache.get(cls, ("text", hashlib.sha1(yamlText.encode()).hexdigest()), lambda: yamlText)
+
+class _Tracking():
+    '''state of a project or a model while it is scanned'''
+    __slots__ = ["kind", "path", "record", "project", "pending", "restored", "nested", "ignoresKey"]
+
+    def __init__(self, kind, path, record, project=None):
+        self.kind = kind # "project" or "model"
+        self.path = path
+        self.record = record
+        self.project = project # project record of the model
+        self.pending = 0 # number of directories of the record being walked
+        self.restored = False # restored from the cache
+        self.nested = False # has other projects inside
+        self.ignoresKey = None # .lunaignore files of the enclosing directories, for the cache key
@@ -0,0 +1,278 @@
+import os
+import io
+import logging
+import threading
+from git import GitCommandError
+from luna_ml.repository.manifest import gitBlobSha
+
+logger = logging.getLogger(__name__)
+
+class ResourceStat():
+    def __init__(self, path, size=0, sha=None):
+        self.path = path # absolute path
+        self.size = size
+        self.sha = sha # git blob SHA. None when not known without reading the file
+
+class WorkingTreeSource():
+    '''
+    Read directories and files of the repository from the working tree.
+    '''
+    def __init__(self, repo, rootDir):
+        self._repo = repo
+        self._rootDir = rootDir.rstrip("/")
+        self._treeShas = None
+        self._blobShas = None
+        self._dirtyPaths = None
+
+    def listDir(self, dirPath):
+        fileNames = []
+        dirNames = []
+        with os.scandir(dirPath) as it:
+            for entry in it:
+                # hidden files and directories (including .git) are never part of projects
+                if entry.name.startswith("."):
+                    continue
+
+                # DirEntry caches file type from the directory listing, no extra stat is needed
+                if entry.is_dir():
+                    dirNames.append(entry.name)
+                elif entry.is_file():
+                    fileNames.append(entry.name)
+
+        fileNames.sort()
+        dirNames.sort()
+        return fileNames, dirNames
+
+    def readText(self, path):
+        with open(path, 'r') as file:
+            return file.read()
+
+    def open(self, path):
+        return open(path, "rb")
+
+    def exists(self, path):
+        return os.path.isfile(path)
+
+    def stat(self, path):
+        return ResourceStat(path, size=os.stat(path).st_size)
+
+    def contentKey(self, path):
+        '''key that changes when the file content changes, without reading the file'''
+        st = os.stat(path)
+        return (path, st.st_size, st.st_mtime_ns)
+
+    def treeSha(self, dirPath):
+        '''
+        Git tree SHA of the directory in HEAD, when the directory has no modified, untracked
+        or ignored files. None otherwise.
+        '''
+        if self._treeShas == None:
+            self._loadTreeShas()
+
+        if dirPath in self._dirtyPaths:
+            return None
+        return self._treeShas.get(dirPath)
+
+    def blobSha(self, path):
+        '''
+        Git blob SHA of the file. Taken from HEAD when the file is not modified,
+        otherwise computed from the file content.
+        '''
+        if self._treeShas == None:
+            self._loadTreeShas()
+
+        if path not in self._dirtyPaths:
+            sha = self._blobShas.get(path)
+            if sha != None:
+                return sha
+        return gitBlobSha(path)
+
+    def _loadTreeShas(self):
+        self._treeShas = {}
+        self._blobShas = {}
+        self._dirtyPaths = set()
+
+        try:
+            rootTreeSha = self._repo.head.commit.tree.hexsha
+            lsTree = self._repo.git.ls_tree("-r", "-t", "-z", "HEAD")
+            status = self._repo.git.status("--porcelain", "-z", "--untracked-files=all", "--ignored")
+        except (ValueError, GitCommandError):
+            # repository without commit
+            return
+
+        # SHA of every directory and file in HEAD. "<mode> <type> <sha>\t<path>"
+        self._treeShas[self._rootDir] = rootTreeSha
+        for entry in lsTree.split("\0"):
+            if entry == "":
+                continue
+            meta, path = entry.split("\t", 1)
+            _, objectType, sha = meta.split(" ")
+            if objectType == "tree":
+                self._treeShas[f"{self._rootDir}/{path}"] = sha
+            elif objectType == "blob":
+                self._blobShas[f"{self._rootDir}/{path}"] = sha
+
+        # modified, untracked or ignored files, and directories that have them. "XY <path>"
+        entries = status.split("\0")
+        i = 0
+        while i < len(entries):
+            entry = entries[i]
+            i = i + 1
+            if entry == "":
+                continue
+
+            paths = [entry[3:]]
+            if entry[0] in ("R", "C"): # followed by original path
+                paths.append(entries[i])
+                i = i + 1
+
+            for path in paths:
+                d = f"{self._rootDir}/{path.rstrip('/')}"
+                while d.startswith(self._rootDir) and d not in self._dirtyPaths:
+                    self._dirtyPaths.add(d)
+                    d = os.path.dirname(d)
+
+class GitTreeSource():
+    '''
+    Read directories and files of the repository from a commit in the git object database,
+    without checkout. Paths are still absolute paths under the repository root directory,
+    as if the commit is checked out there.
+
+    GitPython reads objects through a single 'git cat-file' process, that can not be shared
+    by threads or by two streams at the same time. So all object reads are serialized, and
+    open() returns a file object that streams the blob from a separate git process.
+    '''
+    def __init__(self, repo, rootDir, commit):
+        self._repo = repo
+        self._rootDir = rootDir.rstrip("/")
+        self._trees = {self._rootDir: commit.tree}
+        self._lock = threading.RLock()
+
+    def _relPath(self, path):
+        return path[len(self._rootDir):].lstrip("/")
+
+    def _tree(self, dirPath):
+        tree = self._trees.get(dirPath)
+        if tree == None:
+            tree = self._trees[self._rootDir] / self._relPath(dirPath)
+            self._trees[dirPath] = tree
+        return tree
+
+    def _blob(self, path):
+        try:
+            blob = self._tree(os.path.dirname(path)) / os.path.basename(path)
+        except KeyError:
+            raise FileNotFoundError(path)
+
+        if blob.type != "blob":
+            raise FileNotFoundError(path)
+        return blob
+
+    def listDir(self, dirPath):
+        with self._lock:
+            return self._listDir(dirPath)
+
+    def _listDir(self, dirPath):
+        fileNames = []
+        dirNames = []
+        for item in self._tree(dirPath):
+            if item.name.startswith("."):
+                continue
+
+            if item.type == "tree":
+                dirNames.append(item.name)
+                self._trees[f"{dirPath}/{item.name}"] = item
+            elif item.type == "blob":
+                fileNames.append(item.name)
+            # submodules ("commit") are not part of projects
+
+        fileNames.sort()
+        dirNames.sort()
+        return fileNames, dirNames
+
+    def readBytes(self, path):
+        with self._lock:
+            return self._blob(path).data_stream.read()
+
+    def readText(self, path):
+        return self.readBytes(path).decode()
+
+    def open(self, path):
+        with self._lock:
+            sha = self._blob(path).hexsha # raise FileNotFoundError early
+        return _BlobFile(self._repo, path, sha)
+
+    def exists(self, path):
+        with self._lock:
+            try:
+                self._blob(path)
+                return True
+            except FileNotFoundError:
+                return False
+
+    def stat(self, path):
+        with self._lock:
+            blob = self._blob(path)
+            return ResourceStat(path, size=blob.size, sha=blob.hexsha)
+
+    def blobSha(self, path):
+        return self.stat(path).sha
+
+    def contentKey(self, path):
+        return self.blobSha(path)
+
+    def treeSha(self, dirPath):
+        # commit never changes, every directory is clean
+        with self._lock:
+            try:
+                return self._tree(dirPath).hexsha
+            except KeyError:
+                return None
+
+class _BlobFile(io.RawIOBase):
+    '''
+    Read-only file object of a blob. Content is streamed from its own 'git cat-file blob' process,
+    started on the first read, so a large blob is never held in memory and reading it does not
+    block other reads of the source.
+    '''
+    def __init__(self, repo, path, sha):
+        self.name = path
+        self._repo = repo
+        self._sha = sha
+        self._proc = None
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._eof:
+            return 0
+        if self._proc == None:
+            self._proc = self._repo.git.cat_file("blob", self._sha, as_process=True)
+
+        n = self._proc.stdout.readinto(b)
+        if n == 0:
+            # git is done. its pipes are closed now, not when the file object is closed or collected
+            self._eof = True
+            err = self._proc.stderr.read()
+            ret = self._closeProcess()
+            if ret != 0:
+                raise IOError(f"Can not read {self.name}. {err.decode(errors='replace')}")
+        return n
+
+    def close(self):
+        if not self.closed and self._proc != None:
+            self._closeProcess()
+        super().close()
+
+    def _closeProcess(self):
+        # stop git when the blob is not read to the end. returns exit code
+        proc = self._proc.proc
+        if proc.poll() == None:
+            proc.kill()
+        proc.stdout.close()
+        proc.stderr.close()
+        ret = proc.wait()
+        self._proc = None
+        return ret
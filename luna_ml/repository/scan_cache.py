@@ -0,0 +1,56 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+class ScanCache():
+    '''
+    On-disk cache of RepoReader scan results.
+
+    Entries are keyed by the git tree object SHA of the scanned directory, so the same
+    entry can be reused across runs, branches and CI runners as long as the directory
+    content does not change. Layout is similar to git objects, '<cacheDir>/ab/abcdef...'.
+
+    Entries are json, not pickle. The cache directory may be restored from elsewhere (e.g. CI cache),
+    and reading it must never run code. Values are limited to what json can represent.
+    '''
+    # bump when format of cached entries changes
+    Version = 2
+
+    def __init__(self, cacheDir):
+        self._cacheDir = cacheDir
+
+    def key(self, kind, treeSha, *args):
+        k = ":".join([str(ScanCache.Version), kind, treeSha] + [str(a) for a in args])
+        return hashlib.sha1(k.encode()).hexdigest()
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # broken entry is just a cache miss
+            logger.debug(f"Can not read scan cache entry {key}. {e}")
+            return None
+
+    def put(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # write to temporary file and rename, so concurrent readers never see partial entry
+        fd, tmpPath = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+            os.replace(tmpPath, path)
+        except Exception:
+            os.unlink(tmpPath)
+            raise
+
+    def _path(self, key):
+        return os.path.join(self._cacheDir, key[:2], key)
@@ -0,0 +1,118 @@
+import os
+import io
+import sys
+import stat
+import errno
+import shutil
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ioctl request to clone a file on btrfs, xfs and other filesystems that support reflink (linux/fs.h)
+FICLONE = 0x40049409
+
+ChunkSize = 64 * 1024 * 1024
+
+def fileDescriptor(file):
+    '''file descriptor of a regular file behind the file object, None when there is none'''
+    try:
+        fd = file.fileno()
+    except (AttributeError, io.UnsupportedOperation, OSError, ValueError):
+        return None
+
+    try:
+        if not stat.S_ISREG(os.fstat(fd).st_mode):
+            return None
+    except OSError:
+        return None
+    return fd
+
+def copyFileObj(src, dst):
+    '''
+    Copy from the current position of src file object to dst file object opened for writing.
+
+    When both are regular files, data is copied in the kernel. The file is cloned when the
+    filesystem supports reflink, otherwise copied with copy_file_range() or sendfile().
+    Falls back to a buffered copy in user space.
+    '''
+    srcFd = fileDescriptor(src)
+    dstFd = fileDescriptor(dst)
+    if srcFd == None or dstFd == None:
+        shutil.copyfileobj(src, dst)
+        return
+
+    # position of the file object, that may differ from the position of the fd when buffered
+    offset = src.tell()
+    size = os.fstat(srcFd).st_size
+    dst.flush()
+
+    if offset == 0 and dst.tell() == 0 and _reflink(srcFd, dstFd):
+        src.seek(size)
+        return
+
+    copied = _copyRange(srcFd, dstFd, offset, size - offset)
+    src.seek(offset + copied)
+    dst.seek(0, os.SEEK_END)
+
+    # kernel could not copy the rest. e.g. unsupported filesystem
+    if offset + copied < size:
+        shutil.copyfileobj(src, dst)
+
+def _reflink(srcFd, dstFd):
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        import fcntl
+        fcntl.ioctl(dstFd, FICLONE, srcFd)
+        return True
+    except (ImportError, OSError):
+        return False
+
+def _copyRange(srcFd, dstFd, offset, count):
+    # returns number of bytes copied
+    copied = 0
+    for method in (_copyFileRange, _sendfile):
+        while copied < count:
+            try:
+                n = method(srcFd, dstFd, offset + copied, min(ChunkSize, count - copied))
+            except OSError as e:
+                if e.errno in (errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF, errno.ETXTBSY):
+                    break # try next method
+                raise
+            if n == None:
+                break # not available
+            if n == 0:
+                return copied # end of file
+            copied = copied + n
+    return copied
+
+def _copyFileRange(srcFd, dstFd, offset, count):
+    if not hasattr(os, "copy_file_range"): # python >= 3.8 on linux
+        return None
+    return os.copy_file_range(srcFd, dstFd, count, offset_src=offset)
+
+def _sendfile(srcFd, dstFd, offset, count):
+    # sendfile to a regular file is only supported on linux
+    if not hasattr(os, "sendfile") or not sys.platform.startswith("linux"):
+        return None
+    return os.sendfile(dstFd, srcFd, offset, count)
+
+def copyFile(srcPath, dstPath, link=False):
+    '''
+    Copy a file. When link is True and both paths are on the same filesystem, dstPath is
+    a hardlink of srcPath. Only use link for content that is never modified in place.
+    '''
+    if link:
+        try:
+            if os.path.lexists(dstPath):
+                os.unlink(dstPath)
+            os.link(srcPath, dstPath)
+            return
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EOPNOTSUPP):
+                raise
+            logger.debug(f"Can not link {srcPath} -> {dstPath}. {e}. Copy instead")
+
+    with open(srcPath, "rb") as src, open(dstPath, "wb") as dst:
+        copyFileObj(src, dst)
+    shutil.copystat(srcPath, dstPath)
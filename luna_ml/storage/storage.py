@@ -0,0 +1,65 @@
+from abc import ABC, abstractmethod
+
+class FileStat:
+    def __init__(self, path, size=0, etag=None, lastModified=None):
+        self.path = path # relative path from the storage base
+        self.size = size
+        self.etag = etag
+        self.lastModified = lastModified
+
+class Storage(ABC):
+    '''
+    Interface of the storage that keeps task inputs and outputs.
+    Paths are '/' separated and relative to the base of the storage.
+    A backend that does not implement every abstract method can not be created.
+    '''
+    @abstractmethod
+    def put(self, file, targetPath):
+        '''write the rest of the file object, from its current position, to targetPath'''
+
+    @abstractmethod
+    def get(self, targetPath, offset=0, length=None):
+        '''open a file for read. Returns a file object with 'stat' and 'size', that is a context manager'''
+
+    @abstractmethod
+    def getMapped(self, targetPath, offset=0, length=None):
+        '''read-only memory map of a file. Returns MappedFile'''
+
+    @abstractmethod
+    def stat(self, targetPath):
+        '''FileStat of a file. Raises FileNotFoundError'''
+
+    @abstractmethod
+    def copy(self, srcPath, targetPath, link=False):
+        '''copy a file in the storage. link allows sharing the content instead of copying it'''
+
+    @abstractmethod
+    def iterList(self, targetPath, sort=False, startAfter=None, limit=None):
+        '''yield FileStat of files under the targetPath'''
+
+    def list(self, targetPath):
+        return list(self.iterList(targetPath))
+
+def openStorage(url):
+    '''
+    Storage of the url.
+      None or a path: LocalFsStorage. None is the local filesystem root
+      dedup://<path>: DedupStorage
+      s3://<bucket>/<prefix>: S3Storage. Endpoint and credentials are taken from the environment
+    '''
+    if url == None or "://" not in url:
+        from luna_ml.storage.storage_localfs import LocalFsStorage
+        return LocalFsStorage(url)
+
+    scheme, path = url.split("://", 1)
+    if scheme == "file":
+        from luna_ml.storage.storage_localfs import LocalFsStorage
+        return LocalFsStorage(path)
+    if scheme == "dedup":
+        from luna_ml.storage.storage_dedup import DedupStorage
+        return DedupStorage(path)
+    if scheme == "s3":
+        from luna_ml.storage.storage_s3 import S3Storage
+        bucket, _, prefix = path.partition("/")
+        return S3Storage(bucket, prefix)
+    raise ValueError(f"Unsupported storage url {url}")
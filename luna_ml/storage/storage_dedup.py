@@ -0,0 +1,232 @@
+import os
+import hashlib
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+from luna_ml.storage.storage import Storage, FileStat
+from luna_ml.storage.fast_copy import fileDescriptor, copyFileObj
+from luna_ml.storage.storage_file import StorageFile, MappedFile
+
+class DedupStorage(Storage):
+    '''
+    Content addressed storage. Same interface as LocalFsStorage.
+
+    File content is stored once as a blob named by its SHA-256, '<basePath>/blobs/ab/abcdef...'.
+    Paths are references to blobs, kept in a sqlite index '<basePath>/index.db' with a reference
+    count of each blob. Putting the same content on many paths (e.g. the same model evaluated by
+    many evaluators at many commits) uses the disk space of a single copy, and copy() only adds
+    a reference. A blob is removed when its last reference is overwritten or deleted.
+    '''
+    ReadSize = 1024 * 1024
+    TmpMaxAge = 24 * 60 * 60 # seconds a temporary file of put() is kept before gc() removes it
+
+    def __init__(self, basePath):
+        self._basePath = basePath
+        self._blobDir = os.path.join(basePath, "blobs")
+        self._tmpDir = os.path.join(basePath, "tmp")
+        os.makedirs(self._blobDir, exist_ok=True)
+        os.makedirs(self._tmpDir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(basePath, "index.db"), check_same_thread=False)
+        with self._db:
+            self._db.execute("CREATE TABLE IF NOT EXISTS refs (path TEXT PRIMARY KEY, sha TEXT NOT NULL, mtime REAL NOT NULL)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS blobs (sha TEXT PRIMARY KEY, size INTEGER NOT NULL, refcount INTEGER NOT NULL)")
+
+    def close(self):
+        self._db.close()
+
+    def _path(self, path):
+        return "/" + path.lstrip("/")
+
+    def _blobPath(self, sha):
+        return os.path.join(self._blobDir, sha[:2], sha)
+
+    def put(self, file, targetPath):
+        sha = None
+        if fileDescriptor(file) != None:
+            # regular file. hash first, so identical content is never written again
+            offset = file.tell()
+            sha, size = self._hash(file)
+            with self._lock:
+                if self._hasBlob(sha):
+                    self._setRef(self._path(targetPath), sha, size)
+                    return
+            file.seek(offset)
+
+        # write to a temporary file while hashing, then move into place unless the blob already exists
+        fd, tmpPath = tempfile.mkstemp(dir=self._tmpDir)
+        try:
+            with os.fdopen(fd, "wb") as w:
+                if sha != None:
+                    copyFileObj(file, w) # hashed above. copied in the kernel
+                else:
+                    sha, size = self._hash(file, w)
+
+            with self._lock:
+                if not self._hasBlob(sha):
+                    blobPath = self._blobPath(sha)
+                    os.makedirs(os.path.dirname(blobPath), exist_ok=True)
+                    os.chmod(tmpPath, 0o444) # blobs are shared, never modified
+                    os.replace(tmpPath, blobPath)
+                self._setRef(self._path(targetPath), sha, size)
+        finally:
+            if os.path.exists(tmpPath):
+                os.unlink(tmpPath)
+
+    def _hash(self, file, w=None):
+        # returns (sha256, size) of the rest of the file. also writes to w when given
+        h = hashlib.sha256()
+        size = 0
+        for chunk in iter(lambda: file.read(DedupStorage.ReadSize), b""):
+            h.update(chunk)
+            size = size + len(chunk)
+            if w != None:
+                w.write(chunk)
+        return h.hexdigest(), size
+
+    def _hasBlob(self, sha):
+        # caller holds the lock
+        return os.path.exists(self._blobPath(sha))
+
+    def copy(self, srcPath, targetPath, link=False):
+        '''add a reference to the blob of srcPath. no data is copied'''
+        with self._lock:
+            row = self._db.execute("SELECT refs.sha, blobs.size FROM refs JOIN blobs ON refs.sha = blobs.sha WHERE path = ?", (self._path(srcPath),)).fetchone()
+            if row == None:
+                raise FileNotFoundError(srcPath)
+            self._setRef(self._path(targetPath), row[0], row[1])
+
+    def delete(self, targetPath):
+        with self._lock:
+            with self._db:
+                row = self._db.execute("SELECT sha FROM refs WHERE path = ?", (self._path(targetPath),)).fetchone()
+                if row == None:
+                    raise FileNotFoundError(targetPath)
+                self._db.execute("DELETE FROM refs WHERE path = ?", (self._path(targetPath),))
+                orphaned = self._release(row[0])
+            if orphaned:
+                self._unlinkBlob(row[0])
+
+    def get(self, targetPath, offset=0, length=None):
+        stat, sha = self._stat(targetPath)
+        return StorageFile(open(self._blobPath(sha), "rb", buffering=0), stat, offset=offset, length=length)
+
+    def getMapped(self, targetPath, offset=0, length=None):
+        stat, sha = self._stat(targetPath)
+        return MappedFile(self._blobPath(sha), stat, offset=offset, length=length)
+
+    def stat(self, targetPath):
+        return self._stat(targetPath)[0]
+
+    def iterList(self, targetPath, sort=False, startAfter=None, limit=None):
+        '''
+        Yield FileStat of files under the targetPath, ordered by the path string (e.g. 'a.txt' before 'a/b').
+        sort is accepted for compatibility with LocalFsStorage, files are always sorted.
+        startAfter, limit:
+          Path returned by the previous page, and maximum number of files to yield.
+        '''
+        prefix = self._path(targetPath).rstrip("/") + "/"
+        query = "SELECT path, refs.sha, size, mtime FROM refs JOIN blobs ON refs.sha = blobs.sha WHERE path >= ? AND path < ?"
+        # '0' is the character after '/'
+        args = [prefix, prefix[:-1] + "0"]
+        if startAfter != None:
+            query = query + " AND path > ?"
+            args.append(self._path(startAfter))
+        query = query + " ORDER BY path"
+        if limit != None:
+            query = query + " LIMIT ?"
+            args.append(int(limit))
+
+        with self._lock:
+            rows = self._db.execute(query, args).fetchall()
+        for path, sha, size, mtime in rows:
+            yield self._toFileStat(path, sha, size, mtime)
+
+    def gc(self, tmpMaxAge=None):
+        '''
+        Remove blobs that have no reference, e.g. left by an interrupted put() or a crash
+        between the index update and the file removal, and temporary files older than
+        tmpMaxAge seconds (TmpMaxAge by default) left by a killed put(). Returns number of removed files.
+        '''
+        tmpMaxAge = DedupStorage.TmpMaxAge if tmpMaxAge == None else tmpMaxAge
+        removed = 0
+        with self._lock:
+            with self._db:
+                live = set(sha for (sha,) in self._db.execute("SELECT sha FROM blobs WHERE refcount > 0"))
+                self._db.execute("DELETE FROM blobs WHERE refcount <= 0")
+
+            for dirPath, _, fileNames in os.walk(self._blobDir):
+                for fileName in fileNames:
+                    if fileName not in live:
+                        os.unlink(os.path.join(dirPath, fileName))
+                        removed = removed + 1
+
+        # temporary files being written by put() are newer than tmpMaxAge
+        expired = time.time() - tmpMaxAge
+        for entry in os.scandir(self._tmpDir):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < expired:
+                    os.unlink(entry.path)
+                    removed = removed + 1
+            except FileNotFoundError:
+                pass # moved into place or removed by put() meanwhile
+        return removed
+
+    def usage(self):
+        '''(total size of files by path, size of stored blobs)'''
+        with self._lock:
+            logical = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM refs JOIN blobs ON refs.sha = blobs.sha").fetchone()[0]
+            physical = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        return logical, physical
+
+    def _setRef(self, path, sha, size):
+        # caller holds the lock
+        with self._db:
+            row = self._db.execute("SELECT sha FROM refs WHERE path = ?", (path,)).fetchone()
+            if row != None and row[0] == sha:
+                self._db.execute("UPDATE refs SET mtime = ? WHERE path = ?", (time.time(), path))
+                return
+
+            self._db.execute("INSERT OR IGNORE INTO blobs (sha, size, refcount) VALUES (?, ?, 0)", (sha, size))
+            self._db.execute("UPDATE blobs SET refcount = refcount + 1 WHERE sha = ?", (sha,))
+            self._db.execute("INSERT OR REPLACE INTO refs (path, sha, mtime) VALUES (?, ?, ?)", (path, sha, time.time()))
+            orphaned = row != None and self._release(row[0])
+        if orphaned:
+            self._unlinkBlob(row[0])
+
+    def _release(self, sha):
+        # drop a reference. caller holds the lock and the transaction.
+        # returns True when it was the last one. the blob file is removed by the caller after the commit
+        self._db.execute("UPDATE blobs SET refcount = refcount - 1 WHERE sha = ?", (sha,))
+        refcount = self._db.execute("SELECT refcount FROM blobs WHERE sha = ?", (sha,)).fetchone()[0]
+        if refcount <= 0:
+            self._db.execute("DELETE FROM blobs WHERE sha = ?", (sha,))
+            return True
+        return False
+
+    def _unlinkBlob(self, sha):
+        # caller holds the lock. a blob left by a failure here is removed by gc()
+        try:
+            os.unlink(self._blobPath(sha))
+        except FileNotFoundError:
+            pass
+
+    def _stat(self, targetPath):
+        path = self._path(targetPath)
+        with self._lock:
+            row = self._db.execute("SELECT refs.sha, size, mtime FROM refs JOIN blobs ON refs.sha = blobs.sha WHERE path = ?", (path,)).fetchone()
+        if row == None:
+            raise FileNotFoundError(targetPath)
+        sha, size, mtime = row
+        return self._toFileStat(targetPath, sha, size, mtime), sha
+
+    def _toFileStat(self, path, sha, size, mtime):
+        return FileStat(
+            path=path,
+            size=size,
+            etag=sha, # content hash
+            lastModified=datetime.utcfromtimestamp(int(mtime))
+        )
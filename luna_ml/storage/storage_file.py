@@ -0,0 +1,105 @@
+import io
+import mmap
+
+class StorageFile(io.RawIOBase):
+    '''
+    Read-only file returned by storage get(). Reads a byte range of the file when offset or
+    length is given. Use as a context manager to close the file.
+
+    stat:
+      FileStat of the whole file
+    size:
+      number of bytes that can be read, that is the length of the range
+    '''
+    def __init__(self, file, stat, offset=0, length=None):
+        self._file = file
+        self.stat = stat
+        self._offset = min(offset, stat.size)
+        self.size = stat.size - self._offset if length == None else max(0, min(length, stat.size - self._offset))
+        self._pos = 0
+        self.name = stat.path
+        if self._offset > 0:
+            self._file.seek(self._offset)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def fileno(self):
+        # fd is only exposed for the whole file, so a fast copy never reads past the range
+        if self._offset != 0 or self.size != self.stat.size:
+            raise io.UnsupportedOperation("fileno of a byte range")
+        return self._file.fileno()
+
+    def readinto(self, b):
+        n = min(len(b), self.size - self._pos)
+        if n <= 0:
+            return 0
+
+        read = self._file.readinto(memoryview(b)[:n])
+        self._pos = self._pos + read
+        return read
+
+    def seek(self, pos, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            pos = self._pos + pos
+        elif whence == io.SEEK_END:
+            pos = self.size + pos
+        self._pos = max(0, min(pos, self.size))
+        self._file.seek(self._offset + self._pos)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+class MappedFile():
+    '''
+    Read-only memory map of a byte range of a file, returned by storage getMapped().
+    'view' is a memoryview over the range, that can be sliced without copy.
+    Use as a context manager to unmap. Slices of the view must not be used after.
+    '''
+    def __init__(self, path, stat, offset=0, length=None):
+        self.stat = stat
+        offset = min(offset, stat.size)
+        length = stat.size - offset if length == None else max(0, min(length, stat.size - offset))
+
+        self._mmap = None
+        self._base = None
+        if length == 0:
+            # empty file can not be mapped
+            self.view = memoryview(b"")
+            return
+
+        # offset of mmap must be a multiple of the allocation granularity
+        aligned = offset - offset % mmap.ALLOCATIONGRANULARITY
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), length + offset - aligned, access=mmap.ACCESS_READ, offset=aligned)
+        self._base = memoryview(self._mmap)
+        self.view = self._base[offset - aligned:]
+
+    def __len__(self):
+        return len(self.view)
+
+    def __getitem__(self, key):
+        return self.view[key]
+
+    def close(self):
+        # slices of view taken by the caller must be released before
+        self.view.release()
+        if self._mmap != None:
+            self._base.release()
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -1,18 +1,12 @@
 from io import BytesIO
 from datetime import datetime
 from urllib.parse import urlparse
-import shutil
 import os
-import glob
+from luna_ml.storage.fast_copy import copyFileObj, copyFile
+from luna_ml.storage.storage_file import StorageFile, MappedFile
+from luna_ml.storage.storage import Storage, FileStat
 
-class FileStat:
-    def __init__(self, path, size=0, etag=None, lastModified=None):
-        self.path = path # relative path from the storage base
-        self.size = size
-        self.etag = etag
-        self.lastModified = lastModified
-
-class LocalFsStorage():
+class LocalFsStorage(Storage):
     def __init__(self, basePath):
         self._basePath = basePath
 
@@ -28,17 +22,46 @@ class LocalFsStorage():
         absPath = self._fsAbsPath(targetPath)
         os.makedirs(os.path.dirname(absPath), exist_ok=True)
 
+        # copied in the kernel when the file is a regular file
         with open(self._fsAbsPath(targetPath), "wb") as w:
-            shutil.copyfileobj(file, w)
+            copyFileObj(file, w)
+
+    def copy(self, srcPath, targetPath, link=False):
+        '''
+        Copy a file in the storage.
+        link:
+          Make a hardlink instead of a copy when possible. Only for content that is never modified in place.
+        '''
+        absPath = self._fsAbsPath(targetPath)
+        os.makedirs(os.path.dirname(absPath), exist_ok=True)
+        copyFile(self._fsAbsPath(srcPath), absPath, link=link)
+
+    def get(self, targetPath, offset=0, length=None):
+        '''
+        Open a file for read. Returns StorageFile, that is a context manager.
+        offset, length:
+          byte range to read. Whole file by default.
+        '''
+        f = open(self._fsAbsPath(targetPath), "rb", buffering=0)
+        try:
+            stat = self._toFileStat(os.fstat(f.fileno()), targetPath)
+        except Exception:
+            f.close()
+            raise
+        return StorageFile(f, stat, offset=offset, length=length)
 
-    def get(self, targetPath):
+    def getMapped(self, targetPath, offset=0, length=None):
+        '''
+        Memory map a file read-only. Returns MappedFile, that is a context manager,
+        with a memoryview of the byte range.
+        '''
         absPath = self._fsAbsPath(targetPath)
-        f = open(absPath, "rb")
-        return f, self.stat(targetPath)
+        return MappedFile(absPath, self.stat(targetPath), offset=offset, length=length)
 
     def stat(self, targetPath):
-        stat = os.stat(self._fsAbsPath(targetPath))
+        return self._toFileStat(os.stat(self._fsAbsPath(targetPath)), targetPath)
 
+    def _toFileStat(self, stat, targetPath):
         return FileStat(
             path=targetPath,
             size=stat.st_size,
@@ -49,20 +72,86 @@ class LocalFsStorage():
     def __etag(self, stat, path) -> str:
         return f"{stat.st_size}-{stat.st_mtime}-{path}"
 
-    def list(self, targetPath):
-        fileList = []
+    def iterList(self, targetPath, sort=False, startAfter=None, limit=None):
+        '''
+        Yield FileStat of files under the targetPath, while walking the directory tree.
+        Only one directory listing is held in memory at a time. Hidden files and directories are skipped.
+
+        sort:
+          Yield in walk order with names sorted in each directory, that is the order of
+          path components (e.g. 'a/b' before 'a.txt'). Unordered otherwise.
+        startAfter:
+          Path returned by the previous page. Yield files after it. Requires sort.
+        limit:
+          Maximum number of files to yield.
+        '''
+        if startAfter != None and not sort:
+            raise ValueError("startAfter requires sort")
+
         basePath = self._fsAbsPath("").rstrip("/")
-        absPath = self._fsAbsPath(targetPath)
-        for path in glob.glob(f"{absPath}/**", recursive=True):
-            if not os.path.isfile(path):
+        absPath = self._fsAbsPath(targetPath).rstrip("/")
+        start = self._components(self._fsAbsPath(startAfter)) if startAfter != None else None
+
+        count = 0
+        # ("dir", path) to walk, and with sort, ("file", DirEntry) of files that come after a subdir
+        stack = [("dir", absPath)]
+        while stack:
+            kind, item = stack.pop()
+            if kind == "file":
+                # files next to the walked subdirs
+                yield self._fileStat(item, basePath)
+                count = count + 1
+                if limit != None and count >= limit:
+                    return
+                continue
+
+            try:
+                it = os.scandir(item)
+            except OSError:
+                # removed while walking, not a directory, or not readable. skipped, as glob does
                 continue
 
-            stat = os.stat(path)
-            fileList.append(FileStat(
-                path=path[len(basePath):],
-                size=stat.st_size,
-                etag=self.__etag(stat, path),
-                lastModified=datetime.utcfromtimestamp(int(stat.st_mtime))
-            ))
+            pending = [] # with sort, subdirs and the files that come after the first subdir
+            with it:
+                for entry in (sorted(it, key=lambda entry: entry.name) if sort else it):
+                    if entry.name.startswith("."):
+                        continue
 
-        return fileList
+                    if entry.is_dir():
+                        # skip subtree that is entirely before the start
+                        if start != None:
+                            c = self._components(entry.path)
+                            if c < start[:len(c)]:
+                                continue
+                        pending.append(("dir", entry.path))
+                        continue
+
+                    if not entry.is_file():
+                        continue
+                    if start != None and self._components(entry.path) <= start:
+                        continue
+
+                    if sort and len(pending) > 0:
+                        # yielded after the subdirs before it are walked
+                        pending.append(("file", entry))
+                        continue
+
+                    yield self._fileStat(entry, basePath)
+                    count = count + 1
+                    if limit != None and count >= limit:
+                        return
+
+            stack.extend(reversed(pending))
+
+    def _components(self, path):
+        return path.rstrip("/").split("/")
+
+    def _fileStat(self, entry, basePath):
+        # DirEntry caches the stat result. no separate isfile() and stat() calls
+        stat = entry.stat()
+        return FileStat(
+            path=entry.path[len(basePath):],
+            size=stat.st_size,
+            etag=self.__etag(stat, entry.path),
+            lastModified=datetime.utcfromtimestamp(int(stat.st_mtime))
+        )
@@ -0,0 +1,218 @@
+import io
+import os
+import tempfile
+from datetime import timezone
+from luna_ml.storage.storage import Storage, FileStat
+from luna_ml.storage.storage_file import MappedFile
+
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.config import Config
+    from botocore.exceptions import ClientError
+except ImportError:
+    # S3Storage is optional. pip install 'luna-ml[s3]'
+    boto3 = None
+
+MB = 1024 * 1024
+
+class S3Storage(Storage):
+    '''
+    Storage on S3 or a S3 compatible object storage (e.g. MinIO), so several executors can share artifacts.
+    Files are objects '<prefix>/<path>' in the bucket.
+
+    Files larger than multipartThreshold are uploaded, downloaded and copied in parts of chunkSize,
+    by up to 'concurrency' threads. Threads share the pool of connections of the client,
+    that are kept open and reused across requests.
+
+    client:
+      boto3 s3 client. Created from the environment (e.g. AWS_ACCESS_KEY_ID, AWS_ENDPOINT_URL) by default.
+    '''
+    def __init__(
+        self,
+        bucket,
+        prefix="",
+        client=None,
+        endpointUrl=None,
+        concurrency=10,
+        chunkSize=8 * MB,
+        multipartThreshold=8 * MB):
+        if boto3 == None:
+            raise ImportError("S3Storage requires boto3. pip install 'luna-ml[s3]'")
+
+        self._bucket = bucket
+        self._prefix = prefix.strip("/")
+        if client == None:
+            client = boto3.session.Session().client(
+                "s3",
+                endpoint_url=endpointUrl or os.environ.get("AWS_ENDPOINT_URL"),
+                # one connection for each transfer thread, plus requests made outside of transfers
+                config=Config(max_pool_connections=concurrency + 2, retries={"max_attempts": 5, "mode": "standard"})
+            )
+        self._client = client
+        self._transferConfig = TransferConfig(
+            multipart_threshold=multipartThreshold,
+            multipart_chunksize=chunkSize,
+            max_concurrency=concurrency,
+            use_threads=concurrency > 1
+        )
+
+    def _key(self, path):
+        path = path.lstrip("/")
+        return f"{self._prefix}/{path}" if self._prefix else path
+
+    def _path(self, key):
+        return "/" + key[len(self._prefix):].lstrip("/") if self._prefix else "/" + key
+
+    def put(self, file, targetPath):
+        # from the current position of the file. file that is not seekable is streamed
+        self._client.upload_fileobj(file, self._bucket, self._key(targetPath), Config=self._transferConfig)
+
+    def copy(self, srcPath, targetPath, link=False):
+        '''copy in the object storage, without download. link is ignored'''
+        self._client.copy(
+            {"Bucket": self._bucket, "Key": self._key(srcPath)},
+            self._bucket,
+            self._key(targetPath),
+            Config=self._transferConfig
+        )
+
+    def delete(self, targetPath):
+        self._client.delete_object(Bucket=self._bucket, Key=self._key(targetPath))
+
+    def download(self, targetPath, file):
+        '''download a file to a file object opened for writing, in parallel when large'''
+        with _NotFound(targetPath):
+            self._client.download_fileobj(self._bucket, self._key(targetPath), file, Config=self._transferConfig)
+
+    def get(self, targetPath, offset=0, length=None):
+        '''
+        Open a file for read, streamed over a single connection. Returns S3File, that is a context manager.
+        offset, length:
+          byte range to read. Whole file by default.
+        '''
+        if offset == 0 and length == None:
+            with _NotFound(targetPath):
+                resp = self._client.get_object(Bucket=self._bucket, Key=self._key(targetPath))
+            stat = self._toFileStat(targetPath, resp["ContentLength"], resp["ETag"], resp["LastModified"])
+            return S3File(resp["Body"], stat, stat.size)
+
+        stat = self.stat(targetPath)
+        offset = min(offset, stat.size)
+        size = stat.size - offset if length == None else max(0, min(length, stat.size - offset))
+        if size == 0:
+            # empty range can not be requested
+            return S3File(io.BytesIO(b""), stat, 0)
+
+        with _NotFound(targetPath):
+            resp = self._client.get_object(
+                Bucket=self._bucket,
+                Key=self._key(targetPath),
+                Range=f"bytes={offset}-{offset + size - 1}",
+                IfMatch=f'"{stat.etag}"' # fails when the file is replaced after stat
+            )
+        return S3File(resp["Body"], stat, size)
+
+    def getMapped(self, targetPath, offset=0, length=None):
+        '''
+        Download a file, or a byte range of it, to a temporary file and memory map it.
+        Returns MappedFile. The temporary file is removed when unmapped.
+        '''
+        fd, tmpPath = tempfile.mkstemp()
+        try:
+            with os.fdopen(fd, "wb") as w:
+                if offset == 0 and length == None:
+                    stat = self.stat(targetPath)
+                    self.download(targetPath, w)
+                else:
+                    with self.get(targetPath, offset, length) as f:
+                        stat = f.stat
+                        for chunk in iter(lambda: f.read(MB), b""):
+                            w.write(chunk)
+                        offset = 0
+                        length = f.size
+
+            return MappedFile(tmpPath, stat, offset=offset, length=length)
+        finally:
+            # the mapping is valid after the file is removed
+            os.unlink(tmpPath)
+
+    def stat(self, targetPath):
+        with _NotFound(targetPath):
+            resp = self._client.head_object(Bucket=self._bucket, Key=self._key(targetPath))
+        return self._toFileStat(targetPath, resp["ContentLength"], resp["ETag"], resp["LastModified"])
+
+    def iterList(self, targetPath, sort=False, startAfter=None, limit=None):
+        '''
+        Yield FileStat of files under the targetPath, one page of the listing at a time.
+        Ordered by the path string (e.g. 'a.txt' before 'a/b'), that is the order of the object storage.
+        sort is accepted for compatibility with LocalFsStorage, files are always sorted.
+
+        startAfter:
+          Path returned by the previous page. Yield files after it.
+        limit:
+          Maximum number of files to yield.
+        '''
+        prefix = self._key(targetPath).rstrip("/")
+        args = {
+            "Bucket": self._bucket,
+            "Prefix": prefix + "/" if prefix else "",
+            "PaginationConfig": {"PageSize": min(1000, limit) if limit != None else 1000, "MaxItems": limit}
+        }
+        if startAfter != None:
+            args["StartAfter"] = self._key(startAfter)
+
+        for page in self._client.get_paginator("list_objects_v2").paginate(**args):
+            for obj in page.get("Contents", []):
+                yield self._toFileStat(self._path(obj["Key"]), obj["Size"], obj["ETag"], obj["LastModified"])
+
+    def _toFileStat(self, path, size, etag, lastModified):
+        return FileStat(
+            path=path,
+            size=size,
+            etag=etag.strip('"'),
+            # naive utc, like LocalFsStorage
+            lastModified=lastModified.astimezone(timezone.utc).replace(tzinfo=None, microsecond=0)
+        )
+
+class _NotFound():
+    # raises FileNotFoundError for a missing object, like the local storages
+    def __init__(self, path):
+        self._path = path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, exc, tb):
+        if isinstance(exc, ClientError) and exc.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            raise FileNotFoundError(self._path) from exc
+        return False
+
+class S3File(io.RawIOBase):
+    '''
+    Read-only file streamed from the object storage, returned by S3Storage.get().
+
+    stat:
+      FileStat of the whole file
+    size:
+      number of bytes that can be read, that is the length of the range
+    '''
+    def __init__(self, body, stat, size):
+        self._body = body
+        self.stat = stat
+        self.size = size
+        self.name = stat.path
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        data = self._body.read(len(b))
+        n = len(data)
+        b[:n] = data
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._body.close()
+        super().close()
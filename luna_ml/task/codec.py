@@ -0,0 +1,302 @@
+'''
+Codecs compress the tar stream of the files transferred to and from the container.
+
+Upload: the codec compresses locally (writer()) and the container decompresses (extractCommand()).
+Download: the container runs compressCommand(), that writes a 1 byte header telling the codec
+it actually used (e.g. 'G' when zstd is not in the image and gzip is used instead), followed by
+the compressed tar. downloadReader() decompresses by the header.
+
+Spec is one of
+  none             no compression
+  gzip[:level]     gzip in a single thread. level 1-9
+  pigz[:level]     gzip in parallel threads. pigz in the container when present, gzip otherwise
+  zstd[:level]     zstd. Requires zstandard module, and zstd in the container
+  auto             none or pigz, by compressibility of a sample of the data
+'''
+import io
+import os
+import zlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .transfer import GzipWriter
+
+try:
+    import zstandard
+except ImportError:
+    # zstd codec is optional. pip install 'luna-ml[zstd]'
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+HeaderNone = b"N"
+HeaderGzip = b"G"
+HeaderZstd = b"Z"
+
+class NoneCodec():
+    name = "none"
+
+    def writer(self, w):
+        return _PassThroughWriter(w)
+
+    def extractCommand(self, containerPath):
+        return f"base64 -d | tar xf - -C {containerPath}"
+
+    def compressCommand(self, containerPath):
+        return f"{{ printf {HeaderNone.decode()}; tar cf - -C {containerPath} .; }} | base64"
+
+class GzipCodec():
+    name = "gzip"
+
+    def __init__(self, level=6):
+        self.level = level
+
+    def writer(self, w):
+        return GzipWriter(w, level=self.level)
+
+    def extractCommand(self, containerPath):
+        return f"base64 -d | gzip -dc | tar xf - -C {containerPath}"
+
+    def compressCommand(self, containerPath):
+        return f"{{ printf {HeaderGzip.decode()}; tar cf - -C {containerPath} . | gzip -c -{self.level}; }} | base64"
+
+class PigzCodec(GzipCodec):
+    name = "pigz"
+
+    def __init__(self, level=6, threads=None):
+        super().__init__(level)
+        self.threads = threads or os.cpu_count() or 1
+
+    def writer(self, w):
+        return ParallelGzipWriter(w, level=self.level, threads=self.threads)
+
+    def extractCommand(self, containerPath):
+        return f"base64 -d | $(command -v pigz || echo gzip) -dc | tar xf - -C {containerPath}"
+
+    def compressCommand(self, containerPath):
+        return f"{{ printf {HeaderGzip.decode()}; tar cf - -C {containerPath} . | $(command -v pigz || echo gzip) -c -{self.level}; }} | base64"
+
+class ZstdCodec():
+    name = "zstd"
+    requires = "zstd" # command required in the container to extract upload
+
+    def __init__(self, level=3):
+        self.level = level
+
+    def writer(self, w):
+        # all cores. frame is written to w as it is compressed
+        return zstandard.ZstdCompressor(level=self.level, threads=-1).stream_writer(w, closefd=False)
+
+    def extractCommand(self, containerPath):
+        return f"base64 -d | zstd -dc | tar xf - -C {containerPath}"
+
+    def compressCommand(self, containerPath):
+        # gzip when zstd is not in the image
+        tar = f"tar cf - -C {containerPath} ."
+        return (
+            f"if command -v zstd >/dev/null; then {{ printf {HeaderZstd.decode()}; {tar} | zstd -c -{self.level} -T0; }} | base64; "
+            f"else {{ printf {HeaderGzip.decode()}; {tar} | gzip -c -6; }} | base64; fi"
+        )
+
+class AutoCodec():
+    '''none for data that does not compress (e.g. model weights), pigz otherwise'''
+    name = "auto"
+    SampleSize = 64 * 1024
+    MaxSamples = 8
+    MaxListed = 1000 # files the samples are chosen from, on upload
+    MinRatio = 0.9 # compressed / raw. compress only when smaller than this
+
+    def __init__(self, level=6):
+        self.level = level
+
+    def choose(self, storage, fileStats):
+        '''codec for uploading the files. reads a sample of the largest files, that dominate the transfer'''
+        largest = sorted(fileStats, key=lambda s: s.size, reverse=True)[:AutoCodec.MaxSamples]
+        total = sum([s.size for s in largest])
+        if total == 0:
+            return NoneCodec()
+
+        estimated = 0
+        for s in largest:
+            # middle of the file. headers at the start are often more compressible than the rest
+            offset = max(0, s.size // 2 - AutoCodec.SampleSize // 2)
+            with storage.get(s.path, offset=offset, length=AutoCodec.SampleSize) as f:
+                sample = f.read()
+            if len(sample) > 0:
+                estimated = estimated + s.size * compressionRatio(sample)
+
+        codec = PigzCodec(self.level) if estimated / total < AutoCodec.MinRatio else NoneCodec()
+        logger.debug(f"auto codec: estimated ratio {estimated / total:.2f}, {codec.name}")
+        return codec
+
+    def extractCommand(self, containerPath):
+        raise ValueError("auto codec is chosen by choose() before the upload")
+
+    def compressCommand(self, containerPath):
+        # a single tar stream. up to the first 1MB is kept in a temporary file and compressed with the
+        # fastest level to choose, then sent followed by the rest of the stream.
+        # dd reads the pipe with plain read() calls, so it never takes more than it writes to the sample
+        return (
+            f"tar cf - -C {containerPath} . | {{ "
+            f"sample=$(mktemp); "
+            f"dd bs=65536 count=16 of=\"$sample\" 2>/dev/null; "
+            f"raw=$(wc -c < \"$sample\"); "
+            f"compressed=$(gzip -c -1 < \"$sample\" | wc -c); "
+            f"if [ $((compressed * 10)) -lt $((raw * {int(AutoCodec.MinRatio * 10)})) ]; then "
+            f"{{ printf {HeaderGzip.decode()}; cat \"$sample\" - | $(command -v pigz || echo gzip) -c -{self.level}; }} | base64; "
+            f"else {{ printf {HeaderNone.decode()}; cat \"$sample\" -; }} | base64; fi; "
+            f"rm -f \"$sample\"; }}"
+        )
+
+def compressionRatio(data):
+    '''compressed / raw size of the data, with the fastest level'''
+    return len(zlib.compress(data, 1)) / len(data)
+
+def transferCodec(spec):
+    '''codec of the spec, e.g. 'gzip:6'. a codec object is returned as is'''
+    if spec == None:
+        return None
+    if not isinstance(spec, str):
+        return spec
+
+    name, _, level = spec.partition(":")
+    args = [int(level)] if level else []
+    if name == "none":
+        return NoneCodec()
+    if name == "gzip":
+        return GzipCodec(*args)
+    if name == "pigz":
+        return PigzCodec(*args)
+    if name == "zstd":
+        if zstandard == None:
+            logger.warning("zstandard module is not installed. use pigz instead of zstd")
+            return PigzCodec()
+        return ZstdCodec(*args)
+    if name == "auto":
+        return AutoCodec(*args)
+    raise ValueError(f"Unknown transfer codec {spec}")
+
+def downloadReader(source):
+    '''tar stream of the output of compressCommand(), decompressed by its header'''
+    header = source.read(1)
+    if header == HeaderNone:
+        return source
+    if header == HeaderGzip:
+        return GzipReader(source)
+    if header == HeaderZstd:
+        if zstandard == None:
+            raise Exception("zstd output can not be read without zstandard module")
+        return zstandard.ZstdDecompressor().stream_reader(source, read_across_frames=True)
+    raise Exception(f"Unknown transfer codec header {header}")
+
+class _PassThroughWriter(io.RawIOBase):
+    def __init__(self, w):
+        self._w = w
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._w.write(b)
+        return len(b)
+
+class GzipReader(io.RawIOBase):
+    '''Read-only file that decompresses gzip data of a stream, including concatenated members'''
+    ReadSize = 256 * 1024
+
+    def __init__(self, source):
+        self._source = source
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self._buf = b""
+        self._pos = 0
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self._pos >= len(self._buf):
+            if self._eof:
+                return 0
+            data = self._decompressor.unconsumed_tail or self._source.read(GzipReader.ReadSize)
+            if not data:
+                self._eof = True
+                continue
+            self._buf = self._decompressor.decompress(data, GzipReader.ReadSize)
+            self._pos = 0
+            if self._decompressor.eof:
+                # next member
+                rest = self._decompressor.unused_data
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                if rest:
+                    self._buf = self._buf + self._decompressor.decompress(rest, GzipReader.ReadSize)
+
+        n = min(len(b), len(self._buf) - self._pos)
+        b[:n] = self._buf[self._pos:self._pos + n]
+        self._pos = self._pos + n
+        return n
+
+class ParallelGzipWriter(io.RawIOBase):
+    '''
+    Write-only file that gzip compresses blocks of the data in parallel threads, like pigz.
+    Each block is a gzip member, and members are written to w in order. Output is a valid
+    multi-member gzip stream. At most 2 x threads blocks are in memory.
+    When closed by a with block that raised, pending blocks are dropped instead of written.
+    '''
+    BlockSize = 1024 * 1024
+
+    def __init__(self, w, level=6, threads=4):
+        self._w = w
+        self._level = level
+        self._threads = threads
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="pigz")
+        self._pending = [] # futures of compressed blocks, in order
+        self._buf = bytearray()
+        self._failed = False
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._buf.extend(b)
+        while len(self._buf) >= ParallelGzipWriter.BlockSize:
+            self._submit(bytes(self._buf[:ParallelGzipWriter.BlockSize]))
+            del self._buf[:ParallelGzipWriter.BlockSize]
+        return len(b)
+
+    def __exit__(self, excType, exc, tb):
+        if excType != None:
+            # the stream w is broken or abandoned. nothing more is written to it
+            self._failed = True
+        return super().__exit__(excType, exc, tb)
+
+    def close(self):
+        if not self.closed:
+            try:
+                if not self._failed:
+                    if len(self._buf) > 0:
+                        self._submit(bytes(self._buf))
+                        self._buf = bytearray()
+                    while self._pending:
+                        self._w.write(self._pending.pop(0).result())
+            finally:
+                for future in self._pending:
+                    future.cancel()
+                self._pending = []
+                self._buf = bytearray()
+                self._pool.shutdown()
+        super().close()
+
+    def _submit(self, block):
+        # zlib releases the GIL while compressing
+        self._pending.append(self._pool.submit(_gzipBlock, block, self._level))
+        # write completed blocks in order. wait when too many blocks are in flight
+        while self._pending and (self._pending[0].done() or len(self._pending) >= 2 * self._threads):
+            try:
+                self._w.write(self._pending.pop(0).result())
+            except BaseException:
+                self._failed = True
+                raise
+
+def _gzipBlock(block, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(block) + compressor.flush()
@@ -1,17 +1,19 @@
 import os, yaml, logging, threading, io, sys
-from kubernetes import client, config, watch
+import itertools
+from concurrent.futures import Future, ThreadPoolExecutor, CancelledError, InvalidStateError
+from concurrent.futures._base import RUNNING, CANCELLED_AND_NOTIFIED
+from kubernetes import client, config
 from kubernetes.stream import stream
 import tarfile
 from tarfile import TarInfo
-from tempfile import TemporaryFile
-import base64
-import time
-from base64io import Base64IO
 import pkgutil
 from jinja2 import Template
 
 from .kube_apply import createOrUpdateOrReplace, deleteObject
 from .task import Task
+from .pod_watcher import PodWatcher, containerStatus
+from .transfer import Base64ChunkWriter, Base64ChunkReader, ExecStdin, ExecStdout
+from .codec import transferCodec, downloadReader, AutoCodec, PigzCodec
 from luna_ml.storage.storage_localfs import LocalFsStorage
 from luna_ml.api.score_file import ScoreFile
 
@@ -22,6 +24,7 @@ class Executor():
     ModelContainerPath = "/workspace/model"
     EvalResultContainerPath = "/workspace/eval"
     ScoreResultContainerPath = "/workspace/score"
+    TaskLabel = "luna-ml/task" # label of the task pods
 
     """
     Run tasks on Kubernetes cluster.
@@ -32,25 +35,123 @@ class Executor():
         self,
         basePath, # basePath of the local clone of the repository
         kube_client=None,
-        namespace="default"):
+        namespace="default",
+        storage=None, # Storage of task inputs and outputs. LocalFsStorage of basePath by default
+        maxConcurrentTasks=None, # number of tasks submit() runs at the same time. None for no limit
+        uploadCodec="none", # transfer codec spec of files copied to the container. see codec.py
+        downloadCodec="none"): # transfer codec spec of files copied from the container
         self._kube_client = kube_client
         self._namespace = namespace
-        self._storage = LocalFsStorage(basePath)
+        self._storage = storage if storage != None else LocalFsStorage(basePath)
+        self._podWatchers = {} # namespace -> PodWatcher
+        self._lock = threading.Lock()
+        self._maxConcurrentTasks = maxConcurrentTasks
+        self._pool = None
+        self._futures = set() # TaskFuture not done
+        self._cancelled = set() # running tasks to cancel. tasks of the same id may be submitted again
+        self._uploadCodec = transferCodec(uploadCodec)
+        self._downloadCodec = transferCodec(downloadCodec)
+
+    def submit(self, task):
+        '''
+        Run the task in background. At most maxConcurrentTasks tasks run at the same time,
+        the others wait in submit order. Returns TaskFuture, whose result is the exit code of evaluate().
+        '''
+        with self._lock:
+            if self._pool == None:
+                # threads are started on demand, so without a limit every task starts when it is submitted
+                maxWorkers = self._maxConcurrentTasks if self._maxConcurrentTasks != None else sys.maxsize
+                self._pool = ThreadPoolExecutor(max_workers=maxWorkers, thread_name_prefix="luna-task")
+            future = TaskFuture(self, task)
+            self._futures.add(future)
+            self._pool.submit(self._runTask, future)
+        return future
+
+    def shutdown(self, wait=True, cancel=False):
+        '''stop the scheduler. cancel: cancel waiting and running tasks'''
+        with self._lock:
+            pool = self._pool
+            self._pool = None
+            futures = list(self._futures) if cancel else []
+        for future in futures:
+            future.cancel()
+        if pool != None:
+            pool.shutdown(wait=wait)
+
+        if wait:
+            # no task is running
+            with self._lock:
+                watchers = self._podWatchers
+                self._podWatchers = {}
+            for watcher in watchers.values():
+                watcher.stop()
+
+    def _runTask(self, future):
+        task = future.task
+        try:
+            if not future.set_running_or_notify_cancel():
+                return # cancelled while waiting
+            try:
+                ret = self.evaluate(task)
+                error = None
+            except BaseException as e:
+                error = e
+
+            # a cancelled task fails in evaluate() or finishes before the pod is removed.
+            # the future is already cancelled then
+            try:
+                if error != None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(ret)
+            except InvalidStateError:
+                pass
+        finally:
+            with self._lock:
+                self._cancelled.discard(task)
+                self._futures.discard(future)
+
+    def _cancelRunning(self, future):
+        # pod is removed, that makes the waits of evaluate() fail
+        task = future.task
+        with self._lock:
+            if future not in self._futures:
+                return # _runTask() is done
+            self._cancelled.add(task)
+        try:
+            self._removePod(self._namespace, f"luna-{task.id}")
+        except client.rest.ApiException as e:
+            if e.status != 404:
+                raise
+            # pod is not created yet. evaluate() removes it after creating
+
+    def _checkCancelled(self, task, podName=None):
+        with self._lock:
+            cancelled = task in self._cancelled
+        if cancelled:
+            if podName != None:
+                self._removePod(self._namespace, podName)
+            raise CancelledError(f"Task {task.id} is cancelled")
 
     def evaluate(self, task):
         podName = f"luna-{task.id}"
-        self._startTask(task)
-        self._waitForContainerReady(self._namespace, podName, "pre-task")
+        self._checkCancelled(task)
+        created = self._startTask(task)
+        self._checkCancelled(task, podName)
+
+        # pod names are reused by tasks of the same id. waits only fail when this pod is deleted
+        podUid = next((o.metadata.uid for o in created.values() if o.kind == "Pod" and o.metadata.name == podName), None)
+        self._waitForContainerReady(self._namespace, podName, "pre-task", podUid)
         self._copyDataToContainer(self._namespace, podName, "pre-task", task)
-        ret = self._waitForContainerExit(self._namespace, podName, "task-1")
+        ret = self._waitForContainerExit(self._namespace, podName, "task-1", podUid)
         if ret != 0:
             logger.info(f"Evaluator terminated with exit code {ret}")
             return ret
-        self._waitForContainerExit(self._namespace, podName, "task-2")
+        ret = self._waitForContainerExit(self._namespace, podName, "task-2", podUid)
         if ret != 0:
             logger.info(f"Scorer terminated with exit code {ret}")
             return ret
-        self._waitForContainerReady(self._namespace, podName, "post-task")
+        self._waitForContainerReady(self._namespace, podName, "post-task", podUid)
         self._copyDataFromContainer(self._namespace, podName, "post-task", task)
         self._removePod(self._namespace, podName)
 
@@ -83,6 +184,7 @@ class Executor():
             for _, yamlDoc in applied_yamls.items():
                 deleteObject(yamlDoc, self._kube_client, namespace=self._namespace)
             raise Exception(failures)
+        return k8s_objects
 
     def _removePod(self, namespace, podName):
         corev1 = client.CoreV1Api(self._kube_client)
@@ -92,63 +194,60 @@ class Executor():
         corev1.delete_namespaced_pod(podName, namespace, body=body)
 
 
-    def _waitForContainerExit(self, namespace, podName, containerName):
-        corev1 = client.CoreV1Api(self._kube_client)
-
-        while True:
-            pod = corev1.read_namespaced_pod(podName, namespace)
-            if pod == None or pod.status == None or pod.status.init_container_statuses == None:
-                logging.info(f"Waiting for pod {podName} start")
-                time.sleep(1)
-                continue
-
-            containerStatusList = pod.status.init_container_statuses
-            filteredContainerStatuses = list(filter(lambda s: s.name == containerName, containerStatusList))
-
-            if len(filteredContainerStatuses) == 0:
-                logging.info(f"Container status not ready {podName}:{containerName}")
-                time.sleep(1)
-                continue
-
-            status = filteredContainerStatuses[0]
+    def _podWatcher(self, namespace):
+        # one watch of all task pods in the namespace, shared by the tasks
+        with self._lock:
+            watcher = self._podWatchers.get(namespace)
+            if watcher == None:
+                watcher = PodWatcher(client.CoreV1Api(self._kube_client), namespace, Executor.TaskLabel)
+                self._podWatchers[namespace] = watcher
+            return watcher
+
+    def _waitForContainerExit(self, namespace, podName, containerName, podUid=None):
+        def exitCode(pod):
+            status = containerStatus(pod, containerName)
+            if status == None or not status.state.terminated:
+                return None
+            return status.state.terminated.exit_code
+
+        logging.info(f"Waiting for container exit {podName}:{containerName}")
+        return self._podWatcher(namespace).waitFor(podName, exitCode, uid=podUid)
+
+    def _waitForContainerReady(self, namespace, podName, containerName, podUid=None):
+        def running(pod):
+            status = containerStatus(pod, containerName)
+            if status == None:
+                return None
             if status.state.terminated:
-                return status.state.terminated.exit_code
-            else:
-                time.sleep(2)
-                continue
-
-    def _waitForContainerReady(self, namespace, podName, containerName):
-        corev1 = client.CoreV1Api(self._kube_client)
-
-        while True:
-            pod = corev1.read_namespaced_pod(podName, namespace)
-            if pod == None or pod.status == None or pod.status.init_container_statuses == None:
-                logging.info(f"Waiting for pod {podName} start")
-                time.sleep(1)
-                continue
-
-            containerStatusList = pod.status.init_container_statuses
-            filteredContainerStatuses = list(filter(lambda s: s.name == containerName, containerStatusList))
-
-            if len(filteredContainerStatuses) == 0:
-                logging.info(f"Container status not ready {podName}:{containerName}")
-                time.sleep(1)
-                continue
-
-            status = filteredContainerStatuses[0]
-            if status.state.running:
-                break
-            else:
-                time.sleep(2)
-                continue
+                raise Exception(f"Container {podName}:{containerName} terminated with exit code {status.state.terminated.exit_code}")
+            return True if status.state.running else None
 
+        logging.info(f"Waiting for container ready {podName}:{containerName}")
+        self._podWatcher(namespace).waitFor(podName, running, uid=podUid)
 
     def _copyDataToContainer(self, namespace, podName, containerName, task):
         corev1 = client.CoreV1Api(self._kube_client)
 
         for storagePath, containerPath in task.copyToContainerBeforeStart:
-            logging.info(f"Copy dir in storage '{storagePath}' -> container '{namespace}:{podName}:{containerPath}'")
-            exec_command = ['bash', '-c', f"cat | base64 -d | tar xvfz - -C {containerPath}"]
+            fileList = self._storage.iterList(storagePath)
+            firstFile = next(fileList, None)
+            if firstFile == None:
+                continue
+            fileList = itertools.chain([firstFile], fileList)
+
+            codec = transferCodec(task.uploadCodec) or self._uploadCodec
+            if isinstance(codec, AutoCodec):
+                # chosen from the first files listed, so the listing is never held in memory
+                listed = list(itertools.islice(fileList, AutoCodec.MaxListed))
+                codec = codec.choose(self._storage, listed)
+                fileList = itertools.chain(listed, fileList)
+            requires = getattr(codec, "requires", None)
+            if requires != None and not self._hasCommand(namespace, podName, containerName, requires):
+                logging.info(f"'{requires}' is not found in the container. use pigz codec")
+                codec = PigzCodec()
+
+            logging.info(f"Copy dir in storage '{storagePath}' -> container '{namespace}:{podName}:{containerPath}' ({codec.name})")
+            exec_command = ['bash', '-c', codec.extractCommand(containerPath)]
             resp = stream(
                 corev1.connect_get_namespaced_pod_exec,
                 podName,
@@ -160,45 +259,23 @@ class Executor():
                 _preload_content=False
             )
 
-            fileList = self._storage.list(storagePath)
-            if len(fileList) == 0:
-                continue
-
-            with TemporaryFile() as tar_buffer:
-                # write tar file
-                with tarfile.open(fileobj=tar_buffer, mode="w:gz") as tar:
-                    for fileStat in fileList:
-                        f, stat = self._storage.get(fileStat.path)
-                        info = TarInfo(name=fileStat.path[len(storagePath):])
-                        info.size = stat.size
-                        tar.addfile(info ,fileobj=f)
-
-                tar_buffer.flush()
-                tar_buffer.seek(0)
-
-                with TemporaryFile() as b64_encoded_tar:
-                    with Base64IO(b64_encoded_tar) as b64_encoded_tar_buffer:
-                        for line in tar_buffer.readlines():
-                            b64_encoded_tar_buffer.write(line)
-
-                    b64_encoded_tar.flush()
-                    b64_encoded_tar.seek(0)
-
-                    commands = []
-                    commands.append(b64_encoded_tar.read())
-
-                    while resp.is_open():
-                        resp.update(timeout=1)
-                        if resp.peek_stdout():
-                            logger.debug("UPLOAD stdout: {}".format(resp.read_stdout()))
-                        if resp.peek_stderr():
-                            logger.debug("UPLOAD stderr: {}".format(resp.read_stderr()))
-                        if commands:
-                            c = commands.pop(0)
-                            resp.write_stdin(c)
-                        else:
-                            break
-            resp.close()
+            # storage file -> tar -> codec -> base64 -> stdin, in chunks.
+            # the first chunk is sent while the archive is being written, and memory use does not depend on the size
+            stdin = ExecStdin(resp, "UPLOAD")
+            try:
+                with Base64ChunkWriter(stdin.send) as encoder:
+                    with codec.writer(encoder) as compressed:
+                        with tarfile.open(fileobj=compressed, mode="w|") as tar:
+                            for fileStat in fileList:
+                                with self._storage.get(fileStat.path) as f:
+                                    info = TarInfo(name=fileStat.path[len(storagePath):])
+                                    info.size = f.size
+                                    tar.addfile(info, fileobj=f)
+                ret = stdin.finish()
+            finally:
+                resp.close()
+            if ret != None and ret != 0:
+                raise Exception(f"Copy to container '{namespace}:{podName}:{containerPath}' failed with exit code {ret}")
 
         # create done file
         exec_command = ['touch', '/tmp/done']
@@ -218,58 +295,43 @@ class Executor():
         corev1 = client.CoreV1Api(self._kube_client)
 
         for containerPath, storagePath in task.copyFromContainerAfterFinish:
-            logging.info(f"Copy dir to storage {storagePath} <- container '{namespace}:{podName}:{containerPath}'")
-            exec_command = ['bash', '-c', f"tar cf - -C {containerPath} . | base64"]
-
-            with TemporaryFile() as b64_encoded_buffer:
-                resp = stream(
-                    corev1.connect_get_namespaced_pod_exec,
-                    podName,
-                    namespace,
-                    container=containerName,
-                    command=exec_command,
-                    stderr=True, stdin=True,
-                    stdout=True, tty=False,
-                    _preload_content=False)
-
-                # write base64 encoded data into temporary file (b64_encoded_buffer).
-                # reason we can not stream resp.read_stdout() directly into tarfile.open() to extract
-                # is that resp object is not file object.
-                #
-                # Also, we can not decode base64 here, because each resp.read_stdout() might
-                # return incomplete string to decode.
-                while resp.is_open():
-                    resp.update(timeout=1)
-                    if resp.peek_stdout():
-                        out = resp.read_stdout()
-                        # print("STDOUT: %s" % len(out))
-                        b64_encoded_buffer.write(out.encode())
-                    if resp.peek_stderr():
-                        logging.debug("DOWNLOAD stderr: %s" % resp.read_stderr())
-                resp.close()
-                b64_encoded_buffer.flush()
-                b64_encoded_buffer.seek(0)
-
-                # write base64 decoded data into another temporary file (tar_buffer).
-                # Reason we can not pipe this data into Base64IO and stream into tarfile is,
-                # that Base64IO returns file object that does not support seek(), which tarfile requires.
-                with TemporaryFile() as tar_buffer:
-                    with Base64IO(b64_encoded_buffer) as source:
-                        for line in source:
-                            tar_buffer.write(line)
-
-                    tar_buffer.flush()
-                    tar_buffer.seek(0)
-
-                    with tarfile.open(fileobj=tar_buffer, mode='r:') as tar:
-                        for info in tar.getmembers():
+            codec = transferCodec(task.downloadCodec) or self._downloadCodec
+            logging.info(f"Copy dir to storage {storagePath} <- container '{namespace}:{podName}:{containerPath}' ({codec.name})")
+            exec_command = ['bash', '-c', codec.compressCommand(containerPath)]
+            resp = stream(
+                corev1.connect_get_namespaced_pod_exec,
+                podName,
+                namespace,
+                container=containerName,
+                command=exec_command,
+                stderr=True, stdin=False,
+                stdout=True, tty=False,
+                _preload_content=False)
+
+            # stdout -> base64 decode -> codec -> tar (stream mode) -> storage, while the output arrives.
+            # each file is written to the storage as it is read from the stream
+            stdout = ExecStdout(resp, "DOWNLOAD")
+            try:
+                with Base64ChunkReader(stdout.chunks()) as source:
+                    with tarfile.open(fileobj=downloadReader(source), mode="r|") as tar:
+                        for info in tar:
                             if not info.isfile():
                                 continue
 
-                            relPathInContainer = filename = info.name.lstrip("./") # info.name[len(containerPath):].lstrip("/").rstrip("/")
+                            relPathInContainer = info.name[2:] if info.name.startswith("./") else info.name.lstrip("/")
                             pathInStorage = f"""{storagePath.rstrip("/")}/{relPathInContainer}"""
-                            f = tar.extractfile(info)
-                            self._storage.put(f, pathInStorage)
+                            with tar.extractfile(info) as f:
+                                self._storage.put(f, pathInStorage)
+
+                    # padding after the end of the archive
+                    while source.read(io.DEFAULT_BUFFER_SIZE):
+                        pass
+            finally:
+                resp.close()
+
+            ret = stdout.returncode()
+            if ret != None and ret != 0:
+                raise Exception(f"Copy from container '{namespace}:{podName}:{containerPath}' failed with exit code {ret}")
 
         # create done file
         exec_command = ['touch', '/tmp/done']
@@ -286,6 +348,23 @@ class Executor():
         resp.close()
 
 
+    def _hasCommand(self, namespace, podName, containerName, command):
+        corev1 = client.CoreV1Api(self._kube_client)
+        resp = stream(
+            corev1.connect_get_namespaced_pod_exec,
+            podName,
+            namespace,
+            container=containerName,
+            command=['sh', '-c', f"command -v {command} || true"],
+            stderr=True, stdin=False,
+            stdout=True, tty=False,
+            _preload_content=False
+        )
+        try:
+            return "".join(ExecStdout(resp, "PROBE").chunks()).strip() != ""
+        finally:
+            resp.close()
+
     def _renderTemplate(self, templateText, task):
         context = self._getTemplateContext(task)
         context["task"] = task
@@ -308,6 +387,7 @@ class Executor():
         return {
             "k8s": {
                 "namespace": self._namespace,
+                "taskLabel": Executor.TaskLabel,
                 "workspaceMount": Executor.SharedVolumeMount,
                 "setupCommand": f"mkdir -p {Executor.ModelContainerPath} {Executor.EvalResultContainerPath} {Executor.ScoreResultContainerPath}",
                 "envs": {
@@ -321,3 +401,35 @@ class Executor():
         data = pkgutil.get_data(__name__, "template/{}".format(templateFile))
         return data.decode()
 
+class TaskFuture(Future):
+    '''
+    Future of a task submitted to Executor. result() is the exit code of the task.
+    cancel() also stops a running task, by removing its pod. The future is then cancelled like a waiting one,
+    cancelled() returns True and result() raises CancelledError. A finished task is not cancelled.
+    '''
+    def __init__(self, executor, task):
+        super().__init__()
+        self.task = task
+        self._executor = executor
+
+    def cancel(self):
+        if super().cancel():
+            return True
+        if not self._cancelRunning():
+            return False
+        self._executor._cancelRunning(self)
+        return True
+
+    def _cancelRunning(self):
+        # Future.cancel() only cancels a pending future. move a running one to the cancelled state the same way,
+        # waking up result(), wait() and as_completed(). returns False when the result is already set
+        with self._condition:
+            if self._state != RUNNING:
+                return False
+            self._state = CANCELLED_AND_NOTIFIED
+            for waiter in self._waiters:
+                waiter.add_cancelled(self)
+            self._condition.notify_all()
+        self._invoke_callbacks()
+        return True
+
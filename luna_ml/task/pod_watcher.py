@@ -0,0 +1,168 @@
+import logging
+import threading
+import time
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+
+logger = logging.getLogger(__name__)
+
+class PodWatcher():
+    '''
+    Keeps the latest state of the pods in a namespace that match the label selector,
+    with a single watch shared by all tasks. Waiting threads are woken up on each pod event,
+    so a phase transition is seen as soon as the api server reports it, and the number of
+    requests to the api server does not depend on the number of tasks.
+
+    The watch is (re)started from a list of the pods, when the watcher is started and when
+    the watch fails or expires. When the watch keeps failing while the list succeeds, pods are
+    listed every RetryIntervalSeconds instead. When the list fails MaxListFailures times in a row
+    (e.g. the service account is not allowed to list pods), waiting threads raise until a list succeeds.
+
+    The service account needs 'list' and 'watch' permissions on pods in the namespace.
+    '''
+    WatchTimeoutSeconds = 300
+    RetryIntervalSeconds = 1
+    MaxListFailures = 5
+
+    def __init__(self, corev1, namespace, labelSelector, watchFactory=watch.Watch):
+        self._corev1 = corev1
+        self._namespace = namespace
+        self._labelSelector = labelSelector
+        self._watchFactory = watchFactory
+
+        self._pods = {} # pod name -> V1Pod
+        self._deleted = {} # pod name -> uid of the pod last deleted with the name. names of pods are reused
+        self._synced = False # pods are listed at least once
+        self._error = None # last error of the list, when it fails MaxListFailures times in a row
+        self._cond = threading.Condition()
+        self._thread = None
+        self._watch = None
+        self._stopped = False
+
+    def start(self):
+        with self._cond:
+            if self._thread != None:
+                return
+            self._thread = threading.Thread(target=self._run, name=f"pod-watcher-{self._namespace}", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._watch != None:
+            self._watch.stop()
+
+    def waitFor(self, podName, condition, timeout=None, uid=None):
+        '''
+        Wait until condition(pod) returns a value that is not None, and return the value.
+        condition is called with None while the pod does not exist yet.
+        uid:
+          uid of the pod, e.g. returned when it is created. None for the first pod seen with the name,
+          then a pod deleted before it is seen is not noticed. a deleted pod of the same name with
+          another uid, e.g. of a previous task, is ignored.
+        Raises Exception when the pod is deleted or the pods can not be listed, TimeoutError on timeout.
+        '''
+        self.start()
+        deadline = None if timeout == None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._stopped:
+                    raise Exception("Pod watcher is stopped")
+                if self._error != None:
+                    raise Exception(f"Pod watcher failed to list pods. {self._error}")
+
+                pod = self._pods.get(podName)
+                if uid == None and pod != None:
+                    uid = pod.metadata.uid
+                if uid != None and self._deleted.get(podName) == uid:
+                    raise Exception(f"Pod {podName} is deleted")
+
+                if self._synced:
+                    result = condition(pod)
+                    if result != None:
+                        return result
+
+                remaining = None if deadline == None else deadline - time.monotonic()
+                if remaining != None and remaining <= 0:
+                    raise TimeoutError(f"Timeout waiting for pod {podName}")
+                self._cond.wait(remaining)
+
+    def _run(self):
+        listFailures = 0
+        while not self._stopped:
+            try:
+                resourceVersion = self._list()
+                listFailures = 0
+            except Exception as e:
+                if self._stopped:
+                    break
+                listFailures = listFailures + 1
+                logger.info(f"Pod list failed. {e}. retry")
+                if listFailures >= PodWatcher.MaxListFailures:
+                    with self._cond:
+                        self._error = e
+                        self._cond.notify_all()
+                time.sleep(PodWatcher.RetryIntervalSeconds)
+                continue
+
+            try:
+                self._watchFrom(resourceVersion)
+            except Exception as e:
+                if self._stopped:
+                    break
+                if isinstance(e, ApiException) and e.status == 410:
+                    logger.debug("Pod watch expired. list again")
+                else:
+                    logger.info(f"Pod watch failed. {e}. retry")
+                    time.sleep(PodWatcher.RetryIntervalSeconds)
+
+    def _list(self):
+        pods = self._corev1.list_namespaced_pod(self._namespace, label_selector=self._labelSelector)
+        with self._cond:
+            listed = {pod.metadata.name: pod for pod in pods.items}
+            # deleted while the watch was not running
+            for name, pod in self._pods.items():
+                if name not in listed or listed[name].metadata.uid != pod.metadata.uid:
+                    self._deleted[name] = pod.metadata.uid
+            self._pods = listed
+            self._synced = True
+            self._error = None
+            self._cond.notify_all()
+        return pods.metadata.resource_version
+
+    def _watchFrom(self, resourceVersion):
+        while not self._stopped:
+            self._watch = self._watchFactory()
+            for event in self._watch.stream(
+                self._corev1.list_namespaced_pod,
+                self._namespace,
+                label_selector=self._labelSelector,
+                resource_version=resourceVersion,
+                timeout_seconds=PodWatcher.WatchTimeoutSeconds
+            ):
+                pod = event["object"]
+                resourceVersion = pod.metadata.resource_version
+                self._onEvent(event["type"], pod)
+
+            # watch ended by the timeout. continue from the last event
+
+    def _onEvent(self, eventType, pod):
+        name = pod.metadata.name
+        with self._cond:
+            if eventType == "DELETED":
+                self._pods.pop(name, None)
+                self._deleted[name] = pod.metadata.uid
+            else:
+                self._pods[name] = pod
+            self._cond.notify_all()
+
+def containerStatus(pod, containerName):
+    '''status of the init container of the pod, None when it is not reported yet'''
+    if pod == None or pod.status == None or pod.status.init_container_statuses == None:
+        return None
+
+    for status in pod.status.init_container_statuses:
+        if status.name == containerName:
+            return status
+    return None
@@ -8,10 +8,14 @@ class Task():
                  image: str, # list of images
                  command: list, # corresponding list of 'command list' for each images.
                  copyToContainerBeforeStart=[],  # list of tuple (srcDirOnStorage, dstDirOnContainerFs)
-                 copyFromContainerAfterFinish=[] # list of tuple (srcDirOnContainerFs, dstDirOnStorage)
+                 copyFromContainerAfterFinish=[], # list of tuple (srcDirOnContainerFs, dstDirOnStorage)
+                 uploadCodec=None, # transfer codec spec (e.g. 'gzip:6') of copyToContainerBeforeStart. Executor default when None
+                 downloadCodec=None # transfer codec spec of copyFromContainerAfterFinish. Executor default when None
     ):
         self.id = taskId
         self.image = image
         self.command = command
         self.copyToContainerBeforeStart = copyToContainerBeforeStart
         self.copyFromContainerAfterFinish = copyFromContainerAfterFinish
+        self.uploadCodec = uploadCodec
+        self.downloadCodec = downloadCodec
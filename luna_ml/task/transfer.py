@@ -0,0 +1,179 @@
+import io
+import zlib
+import base64
+import logging
+
+logger = logging.getLogger(__name__)
+
+# size of the base64 encoded chunks written to stdin of the container. multiple of 4
+ChunkSize = 512 * 1024
+
+class Base64ChunkWriter(io.RawIOBase):
+    '''
+    Write-only file that base64 encodes the data and sends it in chunks of chunkSize
+    encoded bytes. At most one chunk is buffered, whatever the size of the data.
+    send is called with bytes, and blocks while the receiver is behind.
+    close() sends the rest, with padding.
+    '''
+    def __init__(self, send, chunkSize=ChunkSize):
+        self._send = send
+        self._rawChunkSize = chunkSize // 4 * 3 # 3 raw bytes are 4 encoded bytes
+        self._buf = bytearray()
+        self.bytesSent = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._buf.extend(b)
+        if len(self._buf) >= self._rawChunkSize:
+            # whole chunks only. the rest is carried over to the next write
+            end = len(self._buf) - len(self._buf) % self._rawChunkSize
+            view = memoryview(self._buf)
+            try:
+                for pos in range(0, end, self._rawChunkSize):
+                    self._sendEncoded(view[pos:pos + self._rawChunkSize])
+            finally:
+                view.release()
+            del self._buf[:end]
+        return len(b)
+
+    def close(self):
+        if not self.closed:
+            if len(self._buf) > 0:
+                self._sendEncoded(self._buf)
+                self._buf = bytearray()
+        super().close()
+
+    def _sendEncoded(self, data):
+        encoded = base64.b64encode(data)
+        self._send(encoded)
+        self.bytesSent = self.bytesSent + len(encoded)
+
+class Base64ChunkReader(io.RawIOBase):
+    '''
+    Read-only file that decodes base64 text from an iterator of chunks as they arrive.
+    Chunks can be str or bytes, split anywhere, and contain line breaks. Characters that
+    do not complete a 4 character group are carried over to the next chunk.
+    '''
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._carry = ""
+        self._buf = b""
+        self._pos = 0
+        self.bytesReceived = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self._pos >= len(self._buf):
+            chunk = next(self._chunks, None)
+            if chunk == None:
+                if self._carry:
+                    raise ValueError(f"Incomplete base64 data. {len(self._carry)} characters left")
+                return 0
+            if isinstance(chunk, bytes):
+                chunk = chunk.decode("ascii")
+            self.bytesReceived = self.bytesReceived + len(chunk)
+
+            text = self._carry + "".join(chunk.split())
+            end = len(text) - len(text) % 4
+            self._carry = text[end:]
+            self._buf = base64.b64decode(text[:end])
+            self._pos = 0
+
+        n = min(len(b), len(self._buf) - self._pos)
+        b[:n] = self._buf[self._pos:self._pos + n]
+        self._pos = self._pos + n
+        return n
+
+class GzipWriter(io.RawIOBase):
+    '''Write-only file that gzip compresses the data into the file object w. close() does not close w'''
+    def __init__(self, w, level=9):
+        self._w = w
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS) # gzip header
+        self.bytesIn = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.bytesIn = self.bytesIn + len(b)
+        out = self._compressor.compress(b)
+        if out:
+            self._w.write(out)
+        return len(b)
+
+    def close(self):
+        if not self.closed:
+            self._w.write(self._compressor.flush())
+        super().close()
+
+class ExecStdin():
+    '''
+    Sends data to stdin of a process running in a container through the exec websocket.
+    Output of the process is drained while sending, so the process never blocks on a full pipe.
+    '''
+    V5ChannelProtocol = "v5.channel.k8s.io"
+
+    def __init__(self, resp, name):
+        self._resp = resp
+        self._name = name
+
+    def send(self, data):
+        # blocks while the socket buffer is full, so the sender never gets ahead of the network
+        self._resp.write_stdin(data)
+        self._resp.update(timeout=0)
+        self._drain()
+
+    def finish(self):
+        '''
+        Close stdin and wait for the process to exit, when the api server supports closing a channel.
+        Otherwise the connection is closed, that also closes stdin.
+        Returns exit code of the process, None when unknown.
+        '''
+        if getattr(self._resp, "subprotocol", None) != ExecStdin.V5ChannelProtocol:
+            self._resp.update(timeout=0)
+            self._drain()
+            self._resp.close()
+            return None
+
+        self._resp.close_channel(0)
+        while self._resp.is_open():
+            self._resp.update(timeout=1)
+            self._drain()
+        return self._resp.returncode
+
+    def _drain(self):
+        if self._resp.peek_stdout():
+            logger.debug(f"{self._name} stdout: {self._resp.read_stdout()}")
+        if self._resp.peek_stderr():
+            logger.debug(f"{self._name} stderr: {self._resp.read_stderr()}")
+
+class ExecStdout():
+    '''Reads stdout of a process running in a container through the exec websocket, as it arrives'''
+    def __init__(self, resp, name):
+        self._resp = resp
+        self._name = name
+
+    def chunks(self):
+        '''yield stdout in chunks until the process exits'''
+        while self._resp.is_open():
+            self._resp.update(timeout=1)
+            if self._resp.peek_stdout():
+                yield self._resp.read_stdout()
+            if self._resp.peek_stderr():
+                logger.debug(f"{self._name} stderr: {self._resp.read_stderr()}")
+
+        # received with the close
+        if self._resp.peek_stdout():
+            yield self._resp.read_stdout()
+
+    def returncode(self):
+        '''exit code of the process after it exits, None when unknown'''
+        try:
+            return self._resp.returncode
+        except Exception:
+            # not supported by the client, or the status is not received
+            return None
@@ -0,0 +1,110 @@
+import unittest
+import tempfile, os, io
+import shutil
+import subprocess
+import tarfile
+from storage.storage_localfs import LocalFsStorage
+from task.codec import transferCodec, downloadReader, AutoCodec, NoneCodec, PigzCodec, ParallelGzipWriter, GzipReader
+from task.transfer import Base64ChunkWriter, Base64ChunkReader
+
+@unittest.skipIf(shutil.which("bash") == None or shutil.which("tar") == None, "bash and tar are required")
+class TestCodec(unittest.TestCase):
+    '''commands of the container are run locally'''
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self._files = {
+            "weights": os.urandom(2 * 1024 * 1024),
+            "eval/result.json": b'{"loss": 0.1, "accuracy": 0.9}\n' * 50000
+        }
+        for name, content in self._files.items():
+            path = f"{self._tmpdir}/src/{name}"
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(content)
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def _specs(self):
+        specs = ["none", "gzip:1", "pigz", "auto"]
+        if shutil.which("zstd") != None:
+            specs.append("zstd:3")
+        return specs
+
+    def _assertExtracted(self, dirPath):
+        for name, content in self._files.items():
+            with open(f"{dirPath}/{name}", "rb") as f:
+                self.assertEqual(content, f.read())
+
+    def test_upload(self):
+        storage = LocalFsStorage(f"{self._tmpdir}/src")
+        for spec in self._specs():
+            # given
+            codec = transferCodec(spec)
+            fileStats = storage.list("/")
+            if isinstance(codec, AutoCodec):
+                codec = codec.choose(storage, fileStats)
+            dst = f"{self._tmpdir}/upload-{spec}"
+            os.makedirs(dst)
+
+            # when
+            chunks = []
+            with Base64ChunkWriter(chunks.append) as encoder:
+                with codec.writer(encoder) as compressed:
+                    with tarfile.open(fileobj=compressed, mode="w|") as tar:
+                        for fileStat in fileStats:
+                            with storage.get(fileStat.path) as f:
+                                info = tarfile.TarInfo(name=fileStat.path.lstrip("/"))
+                                info.size = f.size
+                                tar.addfile(info, fileobj=f)
+            subprocess.run(["bash", "-c", codec.extractCommand(dst)], input=b"".join(chunks), check=True)
+
+            # then
+            self._assertExtracted(dst)
+
+    def test_download(self):
+        for spec in self._specs():
+            # when
+            out = subprocess.run(["bash", "-c", transferCodec(spec).compressCommand(f"{self._tmpdir}/src")], stdout=subprocess.PIPE, check=True).stdout
+            dst = f"{self._tmpdir}/download-{spec}"
+            with Base64ChunkReader([out[pos:pos + 10000] for pos in range(0, len(out), 10000)]) as source:
+                with tarfile.open(fileobj=downloadReader(source), mode="r|") as tar:
+                    tar.extractall(dst)
+
+            # then
+            self._assertExtracted(dst)
+
+    def test_auto_should_not_compress_incompressible_data(self):
+        storage = LocalFsStorage(f"{self._tmpdir}/src")
+        codec = AutoCodec()
+        self.assertTrue(isinstance(codec.choose(storage, [storage.stat("/weights")]), NoneCodec))
+        self.assertTrue(isinstance(codec.choose(storage, [storage.stat("/eval/result.json")]), PigzCodec))
+
+    def test_parallel_gzip_is_multi_member_gzip(self):
+        data = b"abc" * 1000000 + os.urandom(1000)
+        out = io.BytesIO()
+        with ParallelGzipWriter(out, level=1, threads=3) as w:
+            for pos in range(0, len(data), 100000):
+                w.write(data[pos:pos + 100000])
+
+        out.seek(0)
+        self.assertEqual(data, GzipReader(out).read())
+
+    def test_parallel_gzip_should_not_write_after_error(self):
+        # given a stream that breaks on the first write
+        class BrokenStream():
+            def __init__(self):
+                self.writes = 0
+            def write(self, b):
+                self.writes = self.writes + 1
+                raise BrokenPipeError()
+        out = BrokenStream()
+
+        # when
+        with self.assertRaises(BrokenPipeError):
+            with ParallelGzipWriter(out, level=1, threads=2) as w:
+                for _ in range(8):
+                    w.write(os.urandom(ParallelGzipWriter.BlockSize))
+
+        # then close() does not flush the pending blocks into the broken stream
+        self.assertEqual(1, out.writes)
@@ -0,0 +1,195 @@
+import unittest
+import queue
+import threading
+from concurrent.futures import CancelledError
+from kubernetes import client
+from task.executor import Executor
+from task.pod_watcher import PodWatcher
+from task.task import Task
+
+class FakeCluster():
+    '''
+    Fake of the kubernetes api used by Executor. Pods go through the phases of a task
+    when the executor copies data to them. Task command ["exit", code] exits with the code,
+    ["block"] runs until the pod is removed.
+    '''
+    def __init__(self):
+        self.pods = {}
+        self.events = queue.Queue()
+        self.lock = threading.Lock()
+        self.removed = []
+        self.blocked = {} # pod name -> threading.Event
+        self.uids = {} # pod name -> uid of the pod created last
+
+    # CoreV1Api
+    def list_namespaced_pod(self, namespace, label_selector=None, **kwargs):
+        with self.lock:
+            return client.V1PodList(items=list(self.pods.values()), metadata=client.V1ListMeta(resource_version="0"))
+
+    def watch(self):
+        cluster = self
+        class FakeWatch():
+            def stream(self, func, *args, **kwargs):
+                while True:
+                    event = cluster.events.get()
+                    if event == None:
+                        return
+                    yield event
+            def stop(self):
+                cluster.events.put(None)
+        return FakeWatch()
+
+    def _update(self, name, eventType, **states):
+        pod = client.V1Pod(
+            metadata=client.V1ObjectMeta(name=name, uid=self.uids.get(name), resource_version="1"),
+            status=client.V1PodStatus(init_container_statuses=[
+                client.V1ContainerStatus(name=n, state=s, image="", image_id="", ready=False, restart_count=0) for n, s in states.items()
+            ])
+        )
+        with self.lock:
+            if eventType == "DELETED":
+                self.pods.pop(name, None)
+            else:
+                self.pods[name] = pod
+        self.events.put({"type": eventType, "object": pod})
+
+    def create(self, task):
+        name = f"luna-{task.id}"
+        with self.lock:
+            self.uids[name] = f"{name}-{len(self.uids)}"
+        self._update(name, "ADDED", **{"pre-task": client.V1ContainerState(running=client.V1ContainerStateRunning())})
+        return self.pods[name]
+
+    def run(self, task):
+        # called when the data is copied to the pod
+        name = f"luna-{task.id}"
+        command = task.command[0]
+        if name not in self.pods:
+            return # removed before started
+        if command[0] == "block":
+            event = threading.Event()
+            self.blocked[name] = event
+            self._update(name, "MODIFIED", **{"task-1": client.V1ContainerState(running=client.V1ContainerStateRunning())})
+            event.wait(5)
+            if name not in self.pods:
+                return
+            exitCode = 0
+        else:
+            exitCode = int(command[1])
+
+        terminated = lambda code: client.V1ContainerState(terminated=client.V1ContainerStateTerminated(exit_code=code))
+        self._update(name, "MODIFIED", **{
+            "task-1": terminated(exitCode),
+            "task-2": terminated(0),
+            "post-task": client.V1ContainerState(running=client.V1ContainerStateRunning())
+        })
+
+    def remove(self, name):
+        if name not in self.pods:
+            raise client.rest.ApiException(status=404)
+        with self.lock:
+            self.removed.append(name)
+        self._update(name, "DELETED")
+        if name in self.blocked:
+            self.blocked[name].set()
+
+class FakeKubeExecutor(Executor):
+    def __init__(self, cluster, maxConcurrentTasks):
+        super().__init__(None, maxConcurrentTasks=maxConcurrentTasks)
+        self._cluster = cluster
+        self.running = 0
+        self.maxRunning = 0
+
+    def evaluate(self, task):
+        with self._lock:
+            self.running = self.running + 1
+            self.maxRunning = max(self.maxRunning, self.running)
+        try:
+            return super().evaluate(task)
+        finally:
+            with self._lock:
+                self.running = self.running - 1
+
+    def _podWatcher(self, namespace):
+        with self._lock:
+            if namespace not in self._podWatchers:
+                self._podWatchers[namespace] = PodWatcher(self._cluster, namespace, Executor.TaskLabel, watchFactory=self._cluster.watch)
+            return self._podWatchers[namespace]
+
+    def _startTask(self, task):
+        pod = self._cluster.create(task)
+        return {f"default/Pod/{pod.metadata.name}": client.V1Pod(kind="Pod", metadata=pod.metadata)}
+
+    def _copyDataToContainer(self, namespace, podName, containerName, task):
+        threading.Thread(target=self._cluster.run, args=(task,), daemon=True).start()
+
+    def _copyDataFromContainer(self, namespace, podName, containerName, task):
+        pass
+
+    def _removePod(self, namespace, podName):
+        self._cluster.remove(podName)
+
+class TestExecutorScheduler(unittest.TestCase):
+    def setUp(self):
+        self._cluster = FakeCluster()
+        self._exc = FakeKubeExecutor(self._cluster, maxConcurrentTasks=3)
+
+    def tearDown(self):
+        self._exc.shutdown(cancel=True)
+
+    def _task(self, taskId, command):
+        return Task(taskId=taskId, image=["evaluator", "scorer"], command=[command, None])
+
+    def test_submit_should_run_tasks_concurrently_up_to_the_limit(self):
+        # when
+        futures = [self._exc.submit(self._task(i, ["exit", str(i % 2)])) for i in range(10)]
+
+        # then exit codes are collected
+        self.assertEqual([i % 2 for i in range(10)], [f.result(timeout=10) for f in futures])
+        self.assertTrue(1 < self._exc.maxRunning <= 3)
+
+    def test_cancel(self):
+        # given tasks that occupy all slots, and a waiting task
+        running = [self._exc.submit(self._task(i, ["block"])) for i in range(3)]
+        waiting = self._exc.submit(self._task(3, ["exit", "0"]))
+        self._exc._podWatcher("default").waitFor("luna-0", lambda pod: pod)
+
+        # when
+        self.assertTrue(waiting.cancel())
+        self.assertTrue(running[0].cancel())
+
+        # then
+        self.assertTrue(waiting.cancelled())
+        self.assertTrue(running[0].cancelled())
+        with self.assertRaises(CancelledError):
+            running[0].result(timeout=10)
+        self.assertIn("luna-0", self._cluster.removed)
+        self.assertNotIn("luna-3", self._cluster.removed)
+
+    def test_cancel_after_finished__should_keep_the_result(self):
+        # given
+        future = self._exc.submit(self._task(0, ["exit", "3"]))
+        self.assertEqual(3, future.result(timeout=10))
+
+        # when
+        cancelled = future.cancel()
+
+        # then
+        self.assertFalse(cancelled)
+        self.assertFalse(future.cancelled())
+        self.assertEqual(3, future.result())
+        self.assertEqual(set(), self._exc._cancelled)
+
+    def test_when_task_of_a_cancelled_id_is_submitted_again__then_it_should_run(self):
+        # given a cancelled task, and the DELETED event of its pod
+        first = self._exc.submit(self._task(0, ["block"]))
+        self._exc._podWatcher("default").waitFor("luna-0", lambda pod: pod)
+        first.cancel()
+        with self.assertRaises(CancelledError):
+            first.result(timeout=10)
+
+        # when the pod of the same name is created again
+        second = self._exc.submit(self._task(0, ["exit", "0"]))
+
+        # then
+        self.assertEqual(0, second.result(timeout=10))
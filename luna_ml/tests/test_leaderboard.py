@@ -0,0 +1,66 @@
+import unittest
+import tempfile, os
+import shutil
+from leaderboard.leaderboard import Leaderboard
+
+class TestLeaderboard(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self._path = os.path.join(self._tmpdir, Leaderboard.FileName)
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def _models(self, leaderboard, project="/proj1", evaluator="ev1"):
+        boards = leaderboard.boards(project=project, evaluator=evaluator)
+        return [entry["model"] for entry in boards[0][2]]
+
+    def test_when_add_scores__then_models_should_be_ranked_by_sort_order(self):
+        # given
+        lb = Leaderboard(self._path)
+
+        # when
+        self.assertEqual(1, lb.add("/proj1", "ev1", "models/m1", 0.5))
+        self.assertEqual(1, lb.add("/proj1", "ev1", "models/m2", 0.9))
+        self.assertEqual(3, lb.add("/proj1", "ev1", "models/m3", 0.1))
+        self.assertEqual(1, lb.add("/proj1", "ev2", "models/m1", 0.1, sort="asc"))
+        self.assertEqual(2, lb.add("/proj1", "ev2", "models/m2", 0.2, sort="asc"))
+
+        # then
+        self.assertEqual(["models/m2", "models/m1", "models/m3"], self._models(lb))
+        self.assertEqual(["models/m1", "models/m2"], self._models(lb, evaluator="ev2"))
+        self.assertEqual(2, lb.rank("/proj1", "ev1", "models/m1"))
+        self.assertEqual(None, lb.rank("/proj1", "ev1", "models/m4"))
+        self.assertEqual(None, lb.rank("/proj2", "ev1", "models/m1"))
+
+    def test_when_model_is_evaluated_again__then_rank_should_be_updated(self):
+        # given
+        lb = Leaderboard(self._path)
+        lb.add("/proj1", "ev1", "models/m1", 0.5)
+        lb.add("/proj1", "ev1", "models/m2", 0.9)
+
+        # when
+        rank = lb.add("/proj1", "ev1", "models/m1", 0.95)
+
+        # then
+        self.assertEqual(1, rank)
+        self.assertEqual(["models/m1", "models/m2"], self._models(lb))
+
+    def test_when_reload__then_should_restore_latest_scores(self):
+        # given
+        lb = Leaderboard(self._path)
+        for i in range(300):
+            lb.add("/proj1", "ev1", "models/m1", i)
+        lb.add("/proj1", "ev1", "models/m2", 100, name="model 2")
+
+        # when
+        reloaded = Leaderboard(self._path)
+
+        # then
+        self.assertEqual(["models/m1", "models/m2"], self._models(reloaded))
+        self.assertEqual(299, reloaded.boards()[0][2][0]["score"])
+        self.assertEqual("model 2", reloaded.boards()[0][2][1]["name"])
+
+        # overwritten scores are compacted
+        with open(self._path) as f:
+            self.assertEqual(2, len(f.readlines()))
@@ -0,0 +1,138 @@
+import unittest
+import queue
+import threading
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+from unittest import mock
+from task.pod_watcher import PodWatcher, containerStatus
+
+def pod(name, resourceVersion, uid="uid-1", **states):
+    # states: container name -> V1ContainerState
+    return client.V1Pod(
+        metadata=client.V1ObjectMeta(name=name, uid=uid, resource_version=str(resourceVersion)),
+        status=client.V1PodStatus(init_container_statuses=[
+            client.V1ContainerStatus(name=n, state=s, image="", image_id="", ready=False, restart_count=0) for n, s in states.items()
+        ])
+    )
+
+class FakeCoreV1Api():
+    def __init__(self, pods):
+        self.pods = pods
+        self.listCount = 0
+        self.error = None # raised by list when set
+
+    def list_namespaced_pod(self, namespace, label_selector=None, **kwargs):
+        self.listCount = self.listCount + 1
+        if self.error != None:
+            raise self.error
+        return client.V1PodList(items=self.pods, metadata=client.V1ListMeta(resource_version="1"))
+
+class FakeWatch():
+    # events put to the queue are streamed. None ends the stream
+    events = queue.Queue()
+
+    def __init__(self):
+        # queue of the test that created the watch, so a watcher of a previous test does not take the events
+        self._events = FakeWatch.events
+
+    def stream(self, func, *args, **kwargs):
+        while True:
+            event = self._events.get()
+            if event == None:
+                return
+            yield event
+
+    def stop(self):
+        self._events.put(None)
+
+class TestPodWatcher(unittest.TestCase):
+    def setUp(self):
+        FakeWatch.events = queue.Queue()
+        self._corev1 = FakeCoreV1Api([pod("luna-1", 1, **{"pre-task": client.V1ContainerState(waiting=client.V1ContainerStateWaiting())})])
+        self._watcher = PodWatcher(self._corev1, "default", "luna-ml/task", watchFactory=FakeWatch)
+
+    def tearDown(self):
+        self._watcher.stop()
+
+    def _exitCode(self, containerName):
+        def exitCode(p):
+            status = containerStatus(p, containerName)
+            return status.state.terminated.exit_code if status != None and status.state.terminated else None
+        return exitCode
+
+    def test_waitFor_should_return_on_event(self):
+        # given a waiting thread
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(self._watcher.waitFor("luna-1", self._exitCode("task-1"), timeout=5)))
+        waiter.start()
+
+        # when
+        FakeWatch.events.put({"type": "MODIFIED", "object": pod("luna-1", 2, **{"task-1": client.V1ContainerState(running=client.V1ContainerStateRunning())})})
+        FakeWatch.events.put({"type": "MODIFIED", "object": pod("luna-1", 3, **{"task-1": client.V1ContainerState(terminated=client.V1ContainerStateTerminated(exit_code=3))})})
+        waiter.join(5)
+
+        # then
+        self.assertEqual([3], results)
+        self.assertEqual(1, self._corev1.listCount)
+
+        # pod not created yet
+        with self.assertRaises(TimeoutError):
+            self._watcher.waitFor("luna-2", lambda p: p, timeout=0.1)
+
+    def test_waitFor_should_raise_when_pod_deleted(self):
+        # given
+        errors = []
+        def wait():
+            try:
+                self._watcher.waitFor("luna-1", self._exitCode("task-1"), timeout=5, uid="uid-1")
+            except Exception as e:
+                errors.append(str(e))
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+
+        # when
+        FakeWatch.events.put({"type": "DELETED", "object": pod("luna-1", 2)})
+        waiter.join(5)
+
+        # then
+        self.assertEqual(["Pod luna-1 is deleted"], errors)
+
+    def test_waitFor_should_ignore_deleted_pod_of_the_same_name_with_other_uid(self):
+        # given the pod of a previous task deleted, before the pod of the same name is created
+        self._watcher.start()
+        FakeWatch.events.put({"type": "DELETED", "object": pod("luna-1", 2, uid="uid-1")})
+        with self.assertRaises(TimeoutError):
+            self._watcher.waitFor("luna-2", lambda p: p, timeout=0.1) # events are processed
+
+        for uid in [None, "uid-2"]:
+            results = []
+            errors = []
+            def wait():
+                try:
+                    results.append(self._watcher.waitFor("luna-1", self._exitCode("task-1"), timeout=5, uid=uid))
+                except Exception as e:
+                    errors.append(str(e))
+            waiter = threading.Thread(target=wait)
+            waiter.start()
+
+            # when
+            FakeWatch.events.put({"type": "ADDED", "object": pod("luna-1", 3, uid="uid-2")})
+            FakeWatch.events.put({"type": "MODIFIED", "object": pod("luna-1", 4, uid="uid-2", **{"task-1": client.V1ContainerState(terminated=client.V1ContainerStateTerminated(exit_code=0))})})
+            waiter.join(5)
+
+            # then
+            self.assertEqual([], errors)
+            self.assertEqual([0], results)
+
+    def test_waitFor_should_raise_when_pods_can_not_be_listed(self):
+        # given
+        self._corev1.error = ApiException(status=403, reason="Forbidden")
+
+        # when
+        with mock.patch.object(PodWatcher, "RetryIntervalSeconds", 0.01), mock.patch.object(PodWatcher, "MaxListFailures", 3):
+            with self.assertRaises(Exception) as e:
+                self._watcher.waitFor("luna-1", lambda p: p)
+
+        # then
+        self.assertTrue("failed to list pods" in str(e.exception))
+        self.assertTrue(self._corev1.listCount >= 3)
@@ -1,8 +1,18 @@
 import unittest
 from repository.repo_reader import RepoReader
+from repository.diff_index import DiffIndex
+from repository.records import ResourceList, ModelRecord
+from repository.lunaignore import LunaIgnore
+from repository.scan_cache import ScanCache
+from api.yaml_cache import YamlCache
+from api.model_yaml import ModelYaml
 import tempfile, os
+import json
+import pickle
 import shutil
-from git import Repo
+from git import Repo, GitCommandError
+from unittest import mock
+from luna_ml.repository.git_diff import GitDiff
 
 class TestStorage(unittest.TestCase):
     def setUp(self):
@@ -156,6 +166,31 @@ class TestStorage(unittest.TestCase):
         self.assertTrue(1, len(model2["resources"]))
         self.assertTrue(1, len(model3["resources"]))
 
+    def test_when_scan__then_should_exclude_eval_pycache_and_hidden_files(self):
+        # given
+        self._create_luna_yaml("/proj1/luna.yaml", "proj1")
+        self._create_file("/proj1/file1", "v1")
+        self._create_file("/proj1/eval/result", "v2")
+        self._create_file("/proj1/__pycache__/file.pyc", "v3")
+        self._create_file("/proj1/.hidden", "v4")
+        self._create_file("/proj1/models/m1/model.yaml", """
+        version: v1
+        kind: luna-ml/model
+        name: m1
+        """)
+        self._create_file("/proj1/models/m1/weights", "v5")
+        self._create_file("/proj1/models/m1/__pycache__/file.pyc", "v6")
+
+        # when
+        r = RepoReader(self._tmpdir)
+
+        # then
+        proj1 = r._projects["{}/proj1".format(self._tmpdir)]
+        self.assertEqual(["{}/proj1/file1".format(self._tmpdir)], proj1["resources"])
+
+        model1 = proj1["models"]["{}/proj1/models/m1".format(self._tmpdir)]
+        self.assertEqual(["{}/proj1/models/m1/weights".format(self._tmpdir)], model1["resources"])
+
     def test_filterChangedFileListForProject(self):
         r = RepoReader(self._tmpdir)
 
@@ -194,6 +229,79 @@ class TestStorage(unittest.TestCase):
                 modelPath="/proj1/models/m1"
         ))
 
+    def test_filterChangedFileList_should_match_path_components(self):
+        r = RepoReader(self._tmpdir)
+
+        self.assertEqual(
+            ["/proj1/res1"],
+            r._filterChangedFileListForProject(
+                changedFileList=["/proj1/res1", "/proj10/res1"],
+                projectPath="/proj1",
+                modelbasePath="/proj1/models"
+        ))
+
+        self.assertEqual(
+            ["/proj1/models/m1/file1"],
+            r._filterChangedFileListForModel(
+                changedFileList=["/proj1/models/m1/file1", "/proj1/models/m10/file1"],
+                modelPath="/proj1/models/m1"
+        ))
+
+    def test_diff_index_count_for_project(self):
+        diffIndex = DiffIndex({
+            "added": ["/proj1/luna.yaml", "/proj1/res1", "/proj1/models/file1", "/proj2/luna.yaml"],
+            "modified": [],
+            "deleted": [],
+            "renamed": []
+        })
+
+        # changes of the project, excluding its models
+        self.assertEqual(2, diffIndex.count("/proj1") - diffIndex.count("/proj1/models"))
+        self.assertEqual(1, diffIndex.count("/proj2") - diffIndex.count("/proj2/models"))
+        self.assertEqual(0, diffIndex.count("/proj3"))
+
+    def test_diff_index_count_for_model(self):
+        diffIndex = DiffIndex({
+            "added": ["/proj1/luna.yaml", "/proj1/res1", "/proj1/models/file1", "/proj1/models/m1/file1"],
+            "modified": ["/proj1/models/m2/file2"],
+            "deleted": [],
+            "renamed": []
+        })
+
+        self.assertEqual(1, diffIndex.count("/proj1/models/m1"))
+        self.assertEqual(["/proj1/models/m1/file1"], diffIndex.changesAt("/proj1/models/m1/file1", "added"))
+        self.assertEqual([], diffIndex.changesAt("/proj1/models/m2/file2", "added"))
+
+    def test_diff_index_should_match_path_components(self):
+        diffIndex = DiffIndex({
+            "added": ["/proj1/res1", "/proj10/res1", "/proj1/models/m1/file1", "/proj1/models/m10/file1"],
+            "modified": [],
+            "deleted": [],
+            "renamed": [("/old/res2", "/proj1/res2")]
+        })
+
+        self.assertEqual(4, diffIndex.count("/proj1"))
+        self.assertEqual(1, diffIndex.count("/proj1/models/m1"))
+        self.assertEqual(0, diffIndex.count("/old")) # renamed entry belongs to the new path
+
+    def test_getAction_with_diff_index(self):
+        r = RepoReader(self._tmpdir)
+        diffIndex = DiffIndex({
+            "added": ["/proj10/res1", "/proj2/models/m1/file1"],
+            "modified": [],
+            "deleted": ["/proj3/luna.yaml"],
+            "renamed": [("/proj4-old/luna.yaml", "/proj4/luna.yaml")]
+        })
+
+        self.assertEqual((None, None), r._getActionForProject(diffIndex, "/proj1", "/proj1/models"))
+        self.assertEqual(("update", None), r._getActionForProject(diffIndex, "/proj10", "/proj10/models"))
+        self.assertEqual((None, None), r._getActionForProject(diffIndex, "/proj2", "/proj2/models"))
+        self.assertEqual(("delete", None), r._getActionForProject(diffIndex, "/proj3", "/proj3/models"))
+        self.assertEqual(("rename", "/proj4-old/luna.yaml"), r._getActionForProject(diffIndex, "/proj4", "/proj4/models"))
+
+        self.assertEqual(("update", None), r._getActionForModel(diffIndex, "/proj2/models/m1"))
+        self.assertEqual((None, None), r._getActionForModel(diffIndex, "/proj2/models/m2"))
+
     def test_when_diff_on_working_tree__then_should_return_both_untracked_added(self):
         # given
         self._create_file("/untracked", "v1")
@@ -314,3 +422,480 @@ class TestStorage(unittest.TestCase):
         proj = r._projects["{}".format(self._tmpdir)]
         model = proj["models"]["{}/models/m1".format(self._tmpdir)]
         self.assertEqual("update", model["action"])
+
+    def test_when_incremental__then_only_touched_projects_and_models_should_be_returned(self):
+        # given two projects with models
+        self._create_luna_yaml("/proj1/luna.yaml", "proj1")
+        self._create_luna_yaml("/proj2/luna.yaml", "proj2")
+        self._create_file("/proj1/models/m1/file", "v1")
+        self._create_file("/proj1/models/m2/file", "v2")
+        self._create_file("/proj2/models/m3/file", "v3")
+        self._repo.git.add(f"{self._tmpdir}")
+        initialCommit = self._repo.index.commit("initial commit")
+
+        # given model m1 is modified
+        self._create_file("/proj1/models/m1/file", "v1-1")
+        self._create_file("/proj1/models/m1/subdir/file", "v1-2")
+        self._repo.git.add(f"{self._tmpdir}")
+        secondCommit = self._repo.index.commit("update model")
+
+        # when
+        full = RepoReader(self._tmpdir, initialCommit, secondCommit)
+        r = RepoReader(self._tmpdir, initialCommit, secondCommit, incremental=True)
+
+        # then
+        self.assertEqual(2, len(full._projects))
+        self.assertEqual(1, len(r._projects))
+
+        proj1 = r._projects["{}/proj1".format(self._tmpdir)]
+        self.assertEqual(None, proj1["action"])
+        self.assertEqual(["{}/proj1/models/m1".format(self._tmpdir)], list(proj1["models"].keys()))
+
+        model1 = proj1["models"]["{}/proj1/models/m1".format(self._tmpdir)]
+        fullModel1 = full._projects["{}/proj1".format(self._tmpdir)]["models"]["{}/proj1/models/m1".format(self._tmpdir)]
+        self.assertEqual("update", model1["action"])
+        self.assertEqual(sorted(fullModel1["resources"]), sorted(model1["resources"]))
+
+    def test_when_use_cache__then_unchanged_projects_and_models_should_be_restored_from_cache(self):
+        # given committed project with models
+        self._create_luna_yaml("/proj1/luna.yaml", "proj1")
+        self._create_file("/proj1/res1", "r1")
+        self._create_file("/proj1/models/m1/file", "v1")
+        self._create_file("/proj1/models/m2/file", "v2")
+        self._repo.git.add(f"{self._tmpdir}")
+        self._repo.index.commit("initial commit")
+
+        # when scan twice
+        first = RepoReader(self._tmpdir, useCache=True)
+        second = RepoReader(self._tmpdir, useCache=True)
+
+        # then second scan is restored from the cache
+        self.assertEqual(0, first._cacheHits)
+        self.assertEqual(3, second._cacheHits)
+        self.assertTrue(os.path.isdir(f"{self._tmpdir}/.git/luna-cache"))
+
+        # entries are plain json
+        for dirPath, _, fileNames in os.walk(f"{self._tmpdir}/.git/luna-cache"):
+            for fileName in fileNames:
+                with open(f"{dirPath}/{fileName}") as f:
+                    self.assertTrue(isinstance(json.load(f)["resources"], list))
+
+        proj1 = second._projects["{}/proj1".format(self._tmpdir)]
+        self.assertEqual("proj1", proj1["yaml"].name)
+        self.assertEqual(["{}/proj1/res1".format(self._tmpdir)], proj1["resources"])
+        self.assertEqual(["{}/proj1/models/m1/file".format(self._tmpdir)], proj1["models"]["{}/proj1/models/m1".format(self._tmpdir)]["resources"])
+
+        # when a model has uncommitted change
+        self._create_file("/proj1/models/m2/file2", "v2-2")
+        third = RepoReader(self._tmpdir, useCache=True)
+
+        # then only the changed model is walked again
+        self.assertEqual(1, third._cacheHits)
+        model2 = third._projects["{}/proj1".format(self._tmpdir)]["models"]["{}/proj1/models/m2".format(self._tmpdir)]
+        self.assertEqual(2, len(model2["resources"]))
+
+    def test_scan_cache_should_not_unpickle_entries(self):
+        # given an entry that is not json, e.g. planted in a restored CI cache
+        cache = ScanCache(f"{self._tmpdir}/cache")
+        key = cache.key("project", "0" * 40, "")
+        cache.put(key, {"yaml": "name: a", "resources": ["r"]})
+        self.assertEqual({"yaml": "name: a", "resources": ["r"]}, cache.get(key))
+        with open(cache._path(key), "wb") as f:
+            f.write(pickle.dumps(ScanCache))
+
+        # then it is a cache miss
+        self.assertEqual(None, cache.get(key))
+
+    def test_when_read_from_commit__then_should_scan_without_working_tree(self):
+        # given committed project with a model
+        self._create_luna_yaml("/proj1/luna.yaml", "proj1")
+        self._create_file("/proj1/res1", "r1")
+        self._create_file("/proj1/models/m1/weights", "w1")
+        self._repo.git.add(f"{self._tmpdir}")
+        commit = self._repo.index.commit("initial commit")
+
+        # given working tree is different from the commit
+        shutil.rmtree(f"{self._tmpdir}/proj1")
+
+        # when
+        r = RepoReader(self._tmpdir, diffOrigHash=None, diffCurrHash=commit.hexsha, readFromCommit=True)
+
+        # then
+        proj1 = r._projects["{}/proj1".format(self._tmpdir)]
+        self.assertEqual("proj1", proj1["yaml"].name)
+        self.assertEqual(["{}/proj1/res1".format(self._tmpdir)], proj1["resources"])
+
+        model1 = proj1["models"]["{}/proj1/models/m1".format(self._tmpdir)]
+        self.assertEqual("m1", model1["yaml"].name)
+        self.assertEqual(["{}/proj1/models/m1/weights".format(self._tmpdir)], model1["resources"])
+
+        # then resource is read from git object
+        stat = r.stat("{}/proj1/models/m1/weights".format(self._tmpdir))
+        self.assertEqual(3, stat.size)
+        self.assertEqual(commit.tree["proj1/models/m1/weights"].hexsha, stat.sha)
+        self.assertEqual(b"w1\n", r.open("{}/proj1/models/m1/weights".format(self._tmpdir)).read())
+        self.assertFalse(r.exists("{}/proj1/models/m1/model.yaml".format(self._tmpdir)))
+
+    def test_when_read_from_commit__then_blobs_should_be_streamed(self):
+        # given a large blob
+        self._create_luna_yaml("/proj1/luna.yaml", "proj1")
+        weights = os.urandom(3 * 1024 * 1024)
+        with open(f"{self._tmpdir}/proj1/weights", "wb") as f:
+            f.write(weights)
+        self._repo.git.add(f"{self._tmpdir}")
+        commit = self._repo.index.commit("initial commit")
+        r = RepoReader(self._tmpdir, diffOrigHash=None, diffCurrHash=commit.hexsha, readFromCommit=True)
+
+        # when two files are read at the same time, in chunks
+        read = []
+        with r.open(f"{self._tmpdir}/proj1/weights") as f, r.open(f"{self._tmpdir}/proj1/luna.yaml") as y:
+            lunaYaml = commit.tree["proj1/luna.yaml"].data_stream.read()
+            self.assertEqual(lunaYaml[:7], y.read(7))
+            chunk = f.read(64 * 1024)
+            while chunk:
+                self.assertTrue(len(chunk) <= 64 * 1024)
+                read.append(chunk)
+                chunk = f.read(64 * 1024)
+
+            self.assertEqual(lunaYaml[7:], y.read())
+
+        # then
+        self.assertEqual(weights, b"".join(read))
+
+    @unittest.skipIf(not os.path.isdir("/proc/self/fd"), "/proc is required")
+    def test_when_blob_is_read_to_the_end__then_git_pipes_should_be_closed(self):
+        # given
+        for i in range(30):
+            self._create_file(f"/proj1/res{i}", f"v{i}")
+        self._repo.git.add(f"{self._tmpdir}")
+        commit = self._repo.index.commit("initial commit")
+        r = RepoReader(self._tmpdir, diffOrigHash=None, diffCurrHash=commit.hexsha, readFromCommit=True)
+
+        # when files are read to the end, and kept open like the files of a request
+        numFds = len(os.listdir("/proc/self/fd"))
+        files = [r.open(f"{self._tmpdir}/proj1/res{i}") for i in range(30)]
+        contents = [f.read() for f in files]
+
+        # then
+        self.assertEqual([f"v{i}\n".encode() for i in range(30)], contents)
+        self.assertTrue(len(os.listdir("/proc/self/fd")) - numFds < 5)
+        for f in files:
+            f.close()
+
+    def test_when_diff_with_pathspecs_and_no_renames__then_should_return_changes_under_pathspecs(self):
+        # given
+        self._create_file("/proj1/renamed-a", "v1")
+        self._create_file("/proj2/modified", "v2")
+        self._repo.git.add(f"{self._tmpdir}")
+        initialCommit = self._repo.index.commit("initial commit")
+
+        self._repo.index.remove([f"{self._tmpdir}/proj1/renamed-a"])
+        self._create_file("/proj1/renamed-b", "v1")
+        self._repo.git.add(f"{self._tmpdir}/proj1/renamed-b")
+        self._create_file("/proj2/modified", "v2-1")
+        self._repo.git.add(f"{self._tmpdir}/proj2/modified")
+        currentCommit = self._repo.index.commit("second commit")
+
+        # when
+        r = RepoReader(self._tmpdir, detectRenames=False)
+        diff = r._gitDiff(orig=initialCommit.hexsha, current=currentCommit.hexsha, pathspecs=["proj1"])
+
+        # then
+        self.assertEqual([f"{self._tmpdir}/proj1/renamed-b"], diff["added"])
+        self.assertEqual([f"{self._tmpdir}/proj1/renamed-a"], diff["deleted"])
+        self.assertEqual([], diff["modified"])
+        self.assertEqual([], diff["renamed"])
+
+    def test_when_diff_fails__then_should_raise_with_stderr_of_git(self):
+        self._create_file("/file", "v1")
+        self._repo.git.add(f"{self._tmpdir}")
+        self._repo.index.commit("initial commit")
+        r = RepoReader(self._tmpdir)
+
+        with self.assertRaises(GitCommandError) as e:
+            r._gitDiff(orig="no-such-revision", current="HEAD")
+        self.assertTrue("no-such-revision" in str(e.exception.stderr))
+
+    def test_projectPathspecs(self):
+        # given tracked and untracked projects
+        self._create_luna_yaml("/luna.yaml", "root")
+        self._create_luna_yaml("/proj1/luna.yaml", "proj1")
+        self._repo.git.add(f"{self._tmpdir}/proj1/luna.yaml")
+        self._create_luna_yaml("/sub/proj2/luna.yaml", "proj2")
+
+        # when
+        r = RepoReader(self._tmpdir)
+
+        # then
+        self.assertEqual([".", "proj1", "sub/proj2"], r._projectPathspecs())
+
+    def test_when_diff_between_commits__then_git_diff_should_be_limited_to_project_directories(self):
+        # given a project renamed and a file outside of projects changed between commits
+        self._create_luna_yaml("/proj1/luna.yaml", "proj1")
+        self._create_file("/proj1/models/m1/file", "v1")
+        self._create_luna_yaml("/sub/proj2/luna.yaml", "proj2")
+        self._create_file("/docs/readme", "v1")
+        self._repo.git.add(f"{self._tmpdir}")
+        c1 = self._repo.index.commit("initial commit")
+        self._repo.git.mv("proj1", "proj3")
+        self._create_file("/docs/readme", "v2")
+        self._repo.git.add(f"{self._tmpdir}")
+        c2 = self._repo.index.commit("second commit")
+
+        # when
+        tokens = GitDiff._tokens
+        calls = []
+        def recordTokens(self, command, args, pathspecs):
+            calls.append((command, args, pathspecs))
+            return tokens(self, command, args, pathspecs)
+        with mock.patch.object(GitDiff, "_tokens", recordTokens):
+            r = RepoReader(self._tmpdir, diffOrigHash=c1.hexsha, diffCurrHash=c2.hexsha)
+        diff = r._diff
+
+        # then
+        command, args, pathspecs = calls[-1]
+        self.assertEqual("diff", command)
+        self.assertEqual([c1.hexsha, c2.hexsha], args[-2:])
+        self.assertEqual(["proj1", "proj3", "sub/proj2"], pathspecs)
+        self.assertEqual([(f"{self._tmpdir}/proj1/luna.yaml", f"{self._tmpdir}/proj3/luna.yaml"),
+                          (f"{self._tmpdir}/proj1/models/m1/file", f"{self._tmpdir}/proj3/models/m1/file")],
+                         sorted(diff["renamed"]))
+        self.assertEqual([], diff["modified"])
+
+    def test_when_project_is_renamed_in_working_tree__then_action_should_be_rename(self):
+        # given
+        self._create_luna_yaml("/proj1/luna.yaml", "proj1")
+        self._create_file("/proj1/res1", "resource1")
+        self._create_file("/proj1/models/m1/file", "v1")
+        self._repo.git.add(f"{self._tmpdir}")
+        self._repo.index.commit("initial commit")
+
+        # when
+        self._repo.git.mv("proj1", "proj2")
+        r = RepoReader(self._tmpdir, diffOrigHash="HEAD")
+
+        # then
+        self.assertTrue("proj1" in r._projectPathspecs("HEAD"))
+        proj = r._projects[f"{self._tmpdir}/proj2"]
+        self.assertEqual("rename", proj["action"])
+        self.assertEqual(f"{self._tmpdir}/proj1/luna.yaml", proj["renamedFrom"])
+
+    def test_when_parallel_scan__then_should_return_the_same_result_as_serial_scan(self):
+        # given projects with models
+        for p in range(3):
+            self._create_luna_yaml(f"/proj{p}/luna.yaml", f"proj{p}")
+            self._create_file(f"/proj{p}/src/file", "v")
+            for m in range(5):
+                self._create_file(f"/proj{p}/models/m{m}/weights/file", "v")
+        self._create_file("/proj1/models/m2/model.yaml", """
+        version: v1
+        kind: luna-ml/model
+        name: "my model"
+        """)
+
+        # when
+        serial = RepoReader(self._tmpdir)
+        parallel = RepoReader(self._tmpdir, parallelism=4)
+
+        # then
+        self.assertEqual(list(serial._projects.keys()), list(parallel._projects.keys()))
+        for path, project in serial._projects.items():
+            other = parallel._projects[path]
+            self.assertEqual(project["resources"], other["resources"])
+            self.assertEqual(list(project["models"].keys()), list(other["models"].keys()))
+            for modelPath, model in project["models"].items():
+                self.assertEqual(model["yaml"].name, other["models"][modelPath]["yaml"].name)
+                self.assertEqual(model["resources"], other["models"][modelPath]["resources"])
+
+    def test_when_parallel_iterate__then_first_project_should_be_yielded_before_other_projects_are_walked(self):
+        # given many projects with many directories
+        for p in range(20):
+            self._create_luna_yaml(f"/proj{p:02d}/luna.yaml", f"proj{p}")
+            for d in range(20):
+                self._create_file(f"/proj{p:02d}/src/d{d}/file", "v")
+
+        r = RepoReader(self._tmpdir, parallelism=4, lazy=True)
+        listed = []
+        listDir = r._source.listDir
+        def countingListDir(path):
+            listed.append(path)
+            return listDir(path)
+        r._source.listDir = countingListDir
+
+        # when
+        projects = r.iterProjects()
+        projectPath, _ = next(projects)
+        listedBeforeFirstYield = len(listed)
+        rest = [path for path, _ in projects]
+
+        # then only the first project and a bounded number of directories ahead are listed
+        self.assertEqual(f"{self._tmpdir}/proj00", projectPath)
+        self.assertLess(listedBeforeFirstYield, 1 + 22 + 2 * 4)
+        self.assertEqual([f"{self._tmpdir}/proj{p:02d}" for p in range(1, 20)], rest)
+
+    def test_when_iterate__then_should_yield_the_same_projects_and_models_as_getAll(self):
+        # given projects with models, and a project nested in another project
+        for p in range(3):
+            self._create_luna_yaml(f"/proj{p}/luna.yaml", f"proj{p}")
+            self._create_file(f"/proj{p}/src/file", "v")
+            for m in range(3):
+                self._create_file(f"/proj{p}/models/m{m}/weights/file", "v")
+        self._create_luna_yaml("/proj0/sub/luna.yaml", "sub")
+        self._create_file("/proj0/sub/models/m0/file", "v")
+
+        for parallelism in [1, 4]:
+            # when
+            r = RepoReader(self._tmpdir, parallelism=parallelism, lazy=True)
+            projects = dict(r.iterProjects())
+            models = list(r.iterModels())
+
+            # then
+            expected = RepoReader(self._tmpdir).getAll()
+            self.assertEqual(sorted(expected.keys()), sorted(projects.keys()))
+            for path, project in expected.items():
+                self.assertEqual(project["resources"], projects[path]["resources"])
+                self.assertEqual(list(project["models"].keys()), list(projects[path]["models"].keys()))
+
+            expectedModels = [(p, m) for p, project in expected.items() for m in project["models"]]
+            self.assertEqual(sorted(expectedModels), sorted([(p, m) for p, m, _ in models]))
+            for projectPath, modelPath, model in models:
+                self.assertEqual(expected[projectPath]["models"][modelPath]["resources"], model["resources"])
+
+    def test_records_should_behave_as_dicts_of_absolute_paths(self):
+        # given
+        model = ModelRecord("/repo/models/m1", "commit1")
+        model.resources.add("weights/b")
+        model.resources.append("/repo/models/m1/a")
+        model.resources.sort()
+
+        # then
+        self.assertEqual(["/repo/models/m1/a", "/repo/models/m1/weights/b"], model["resources"])
+        self.assertTrue("/repo/models/m1/weights/b" in model["resources"])
+        self.assertFalse("/repo/models/m10/a" in model["resources"])
+        self.assertEqual(["a", "weights/b"], model.resources.relPaths())
+        self.assertEqual(ResourceList("/repo/models/m2", ["a"]).relPaths()[0], model.resources.relPaths()[0])
+
+        model["action"] = "update"
+        self.assertEqual("update", model.action)
+        self.assertEqual("commit1", model.get("commit"))
+        with self.assertRaises(KeyError):
+            model["unknown"]
+
+    def test_when_skip_synced__then_models_with_the_same_content_as_last_sync_should_have_no_action(self):
+        # given project with models added by the second commit
+        self._create_file("/README", "readme")
+        self._repo.git.add(f"{self._tmpdir}")
+        initialCommit = self._repo.index.commit("initial commit")
+
+        self._create_luna_yaml("/proj1/luna.yaml", "proj1")
+        self._create_file("/proj1/models/m1/file", "v1")
+        self._create_file("/proj1/models/m2/file", "v2")
+        self._repo.git.add(f"{self._tmpdir}")
+        secondCommit = self._repo.index.commit("add project")
+
+        # given everything is synced
+        r = RepoReader(self._tmpdir, initialCommit, secondCommit, skipSynced=True)
+        for projectPath, project in r.getAll().items():
+            self.assertEqual("update", project["action"])
+            r.markSynced(projectPath, project)
+            for modelPath, model in project["models"].items():
+                self.assertEqual("update", model["action"])
+                r.markSynced(modelPath, model)
+        r.saveSynced()
+
+        # when same diff is synced again
+        r = RepoReader(self._tmpdir, initialCommit, secondCommit, skipSynced=True)
+
+        # then
+        proj1 = r._projects["{}/proj1".format(self._tmpdir)]
+        self.assertEqual(None, proj1["action"])
+        self.assertEqual(None, proj1["models"]["{}/proj1/models/m1".format(self._tmpdir)]["action"])
+        self.assertEqual(None, proj1["models"]["{}/proj1/models/m2".format(self._tmpdir)]["action"])
+
+        # when m2 is modified in the working tree
+        self._create_file("/proj1/models/m2/file", "v2-1")
+        r = RepoReader(self._tmpdir, initialCommit, skipSynced=True)
+
+        # then only m2 is updated
+        proj1 = r._projects["{}/proj1".format(self._tmpdir)]
+        self.assertEqual(None, proj1["action"])
+        self.assertEqual(None, proj1["models"]["{}/proj1/models/m1".format(self._tmpdir)]["action"])
+        self.assertEqual("update", proj1["models"]["{}/proj1/models/m2".format(self._tmpdir)]["action"])
+
+    def test_when_lunaignore_exists__then_excluded_files_should_not_be_resources(self):
+        # given .lunaignore in repository root, project and model
+        self._create_file("/.lunaignore", "*.ckpt")
+        self._create_luna_yaml("/proj1/luna.yaml", "proj1")
+        self._create_file("/proj1/.lunaignore", "# datasets\n/data/\n!keep.ckpt")
+        self._create_file("/proj1/src/file", "v")
+        self._create_file("/proj1/src/data/file", "v")
+        self._create_file("/proj1/data/file", "v")
+        self._create_file("/proj1/a.ckpt", "v")
+        self._create_file("/proj1/keep.ckpt", "v")
+        self._create_file("/proj1/models/m1/file", "v")
+        self._create_file("/proj1/models/m1/b.ckpt", "v")
+        self._create_file("/proj1/models/m1/.lunaignore", "venv/")
+        self._create_file("/proj1/models/m1/venv/lib/file", "v")
+
+        # when
+        r = RepoReader(self._tmpdir)
+
+        # then
+        proj1 = r._projects["{}/proj1".format(self._tmpdir)]
+        self.assertEqual([
+            "{}/proj1/keep.ckpt".format(self._tmpdir),
+            "{}/proj1/src/data/file".format(self._tmpdir),
+            "{}/proj1/src/file".format(self._tmpdir)
+        ], proj1["resources"])
+
+        model1 = proj1["models"]["{}/proj1/models/m1".format(self._tmpdir)]
+        self.assertEqual(["{}/proj1/models/m1/file".format(self._tmpdir)], model1["resources"])
+
+    def test_lunaignore_patterns(self):
+        ignore = LunaIgnore("/p", "\n".join([
+            "*.log",
+            "/build",
+            "docs/*.md",
+            "**/tmp/**",
+            "cache/",
+            "!important.log",
+            "data[0-9]"
+        ]))
+
+        self.assertTrue(ignore.match("/p/a.log", False))
+        self.assertTrue(ignore.match("/p/x/y/a.log", False))
+        self.assertFalse(ignore.match("/p/x/important.log", False))
+        self.assertTrue(ignore.match("/p/build", True))
+        self.assertEqual(None, ignore.match("/p/x/build", True))
+        self.assertTrue(ignore.match("/p/docs/a.md", False))
+        self.assertEqual(None, ignore.match("/p/docs/x/a.md", False))
+        self.assertTrue(ignore.match("/p/x/tmp/a", False))
+        self.assertTrue(ignore.match("/p/x/cache", True))
+        self.assertEqual(None, ignore.match("/p/x/cache", False))
+        self.assertTrue(ignore.match("/p/data1", False))
+        self.assertEqual(None, ignore.match("/p/datax", False))
+
+    def test_yaml_cache_should_parse_the_same_content_once(self):
+        # given
+        cache = YamlCache(maxSize=1)
+        reads = []
+        def readText():
+            reads.append(1)
+            return "version: v1\nkind: luna-ml/model\nname: m1"
+
+        # when
+        m1 = cache.get(ModelYaml, "sha1", readText)
+        m2 = cache.get(ModelYaml, "sha1", readText)
+        cache.get(ModelYaml, "sha2", readText)
+        cache.get(ModelYaml, "sha1", readText)
+
+        # then
+        self.assertTrue(m1 is m2)
+        self.assertEqual("m1", m1.name)
+        self.assertEqual(3, len(reads))
+
+    def test_default_model_yaml_should_keep_the_name_as_is(self):
+        m = ModelYaml.default("007")
+        self.assertEqual("007", m.name)
+        self.assertEqual("v1", m.version)
+        self.assertEqual("luna-ml/model", m.kind)
@@ -0,0 +1,65 @@
+import unittest
+import io, os
+import tempfile
+import shutil
+from api.score_file import ScoreFile
+
+class TestScoreFile(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def _create_file(self, name, content):
+        path = os.path.join(self._tmpdir, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def test_fromText(self):
+        score = ScoreFile.fromText("accuracy 0.9\n\nloss\t0.1\nbroken\nname value\naccuracy 0.95")
+        self.assertEqual({"accuracy": 0.95, "loss": 0.1}, score)
+
+    def test_fromFile_should_read_path_and_file_objects(self):
+        path = self._create_file("score", "accuracy 0.9\nloss 0.1\n")
+
+        self.assertEqual({"accuracy": 0.9, "loss": 0.1}, ScoreFile.fromFile(path))
+        self.assertEqual({"accuracy": 0.9}, ScoreFile.fromFile(io.StringIO("accuracy 0.9")))
+        self.assertEqual({"accuracy": 0.9}, ScoreFile.fromFile(io.BytesIO(b"accuracy 0.9")))
+
+        # file object of the caller is not closed
+        b = io.BytesIO(b"accuracy 0.9")
+        ScoreFile.fromFile(b)
+        self.assertFalse(b.closed)
+        with open(path, "rb") as f:
+            self.assertEqual({"accuracy": 0.9, "loss": 0.1}, ScoreFile.fromFile(f))
+
+    def test_when_strict__then_malformed_line_should_raise(self):
+        with self.assertRaises(ValueError):
+            ScoreFile.fromFile(io.StringIO("accuracy 0.9\nloss high"), strict=True)
+
+    def test_columns(self):
+        f1 = self._create_file("s1", "acc 1\nacc 0\nloss 0.5")
+        f2 = self._create_file("s2", "acc 1\nbroken")
+
+        columns = ScoreFile.columns([f1, f2])
+
+        self.assertEqual(4, len(columns))
+        self.assertEqual(["acc", "acc", "loss", "acc"], columns.keys)
+        self.assertEqual([1.0, 0.0, 0.5, 1.0], list(columns.values))
+        self.assertEqual([0, 0, 0, 1], list(columns.fileIndex))
+        self.assertEqual([1.0, 0.0, 1.0], list(columns.select("acc")))
+        self.assertEqual(0.5, columns.mean("acc", fileIndex=0))
+        self.assertEqual(None, columns.mean("f1"))
+        self.assertEqual(["acc", "loss"], columns.keyNames)
+        self.assertEqual([0, 0, 1, 0], list(columns.keyIds))
+
+    def test_columns_of_generator(self):
+        f1 = self._create_file("s1", "acc 1")
+        f2 = self._create_file("s2", "acc 0")
+
+        columns = ScoreFile.columns(f for f in [f1, f2])
+
+        self.assertEqual([f1, f2], columns.files)
+        self.assertEqual([0, 1], list(columns.fileIndex))
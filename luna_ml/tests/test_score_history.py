@@ -0,0 +1,96 @@
+import unittest
+import tempfile, os
+import shutil
+from leaderboard.score_history import ScoreHistory
+
+class TestScoreHistory(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def test_trend_and_best(self):
+        # given
+        h = ScoreHistory(self._tmpdir)
+        h.add("/proj1", "models/m1", "ev1", "c1", {"score": 0.5, "loss": 1.0}, timestamp=1)
+        h.add("/proj1", "models/m2", "ev1", "c1", {"score": 0.7}, timestamp=2)
+        h.add("/proj1", "models/m1", "ev1", "c2", {"score": 0.9}, timestamp=3)
+        h.add("/proj1", "models/m1", "ev2", "c2", {"score": 0.1}, timestamp=4)
+
+        # then
+        self.assertEqual(5, len(h))
+        self.assertEqual([("c1", 0.5, 1.0), ("c2", 0.9, 3.0)], h.trend("/proj1", "models/m1", "ev1"))
+        self.assertEqual([("c1", 1.0, 1.0)], h.trend("/proj1", "models/m1", "ev1", field="loss"))
+        self.assertEqual([], h.trend("/proj1", "models/m3", "ev1"))
+        self.assertEqual(("models/m2", 0.7), h.best("/proj1", "ev1", "c1"))
+        self.assertEqual(("models/m1", 0.5), h.best("/proj1", "ev1", "c1", sort="asc"))
+        self.assertEqual(None, h.best("/proj1", "ev1", "c3"))
+
+    def test_when_reopen__then_should_keep_history_and_drop_incomplete_rows(self):
+        # given
+        h = ScoreHistory(self._tmpdir)
+        h.add("/proj1", "models/m1", "ev1", "c1", {"score": 0.5})
+
+        # given incomplete row and string
+        with open(os.path.join(self._tmpdir, "value.f64"), "ab") as f:
+            f.write(b"\0\0\0")
+        with open(os.path.join(self._tmpdir, "strings.jsonl"), "a") as f:
+            f.write('"c')
+
+        # when
+        reopened = ScoreHistory(self._tmpdir)
+        reopened.add("/proj1", "models/m1", "ev1", "c2", {"score": 0.6})
+
+        # then
+        self.assertEqual(["c1", "c2"], [c for c, _, _ in ScoreHistory(self._tmpdir).trend("/proj1", "models/m1", "ev1")])
+        self.assertEqual([0.5, 0.6], [v for _, v, _ in ScoreHistory(self._tmpdir).trend("/proj1", "models/m1", "ev1")])
+
+    def test_when_add_after_query__then_query_should_include_new_rows(self):
+        # given
+        h = ScoreHistory(self._tmpdir)
+        h.add("/proj1", "models/m1", "ev1", "c1", {"score": 0.5}, timestamp=1)
+        self.assertEqual([("c1", 0.5, 1.0)], h.trend("/proj1", "models/m1", "ev1"))
+
+        # when
+        h.add("/proj1", "models/m1", "ev1", "c2", {"score": 0.8}, timestamp=2)
+
+        # then
+        self.assertEqual([("c1", 0.5, 1.0), ("c2", 0.8, 2.0)], h.trend("/proj1", "models/m1", "ev1"))
+        self.assertEqual(("models/m1", 0.8), h.best("/proj1", "ev1", "c2"))
+
+    def test_when_strings_are_written_but_no_row__then_query_should_return_empty(self):
+        # given strings of a row, and the row lost before it is written
+        h = ScoreHistory(self._tmpdir)
+        h.add("/proj1", "models/m1", "ev1", "c1", {"score": 0.5})
+        os.truncate(os.path.join(self._tmpdir, "value.f64"), 0)
+
+        # when
+        reopened = ScoreHistory(self._tmpdir)
+
+        # then
+        self.assertEqual(0, len(reopened))
+        self.assertEqual([], reopened.trend("/proj1", "models/m1", "ev1"))
+        self.assertEqual(None, reopened.best("/proj1", "ev1", "c1"))
+
+    def test_when_add_many__then_columns_should_be_mapped_once_by_the_next_query(self):
+        # given
+        h = ScoreHistory(self._tmpdir)
+        h.add("/proj1", "models/m1", "ev1", "c0", {"score": 0.0})
+        mapped = []
+        readColumn = h._readColumn
+        def countingReadColumn(name, typecode, numRows):
+            mapped.append(name)
+            return readColumn(name, typecode, numRows)
+        h._readColumn = countingReadColumn
+
+        # when
+        for i in range(1, 10):
+            h.add("/proj1", "models/m1", "ev1", f"c{i}", {"score": i / 10})
+        mappedByAdd = len(mapped)
+        trend = h.trend("/proj1", "models/m1", "ev1")
+
+        # then
+        self.assertEqual(0, mappedByAdd)
+        self.assertEqual(len(ScoreHistory.Columns), len(mapped))
+        self.assertEqual([f"c{i}" for i in range(10)], [c for c, _, _ in trend])
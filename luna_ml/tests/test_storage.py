@@ -0,0 +1,337 @@
+import unittest
+import tempfile, os, io
+import shutil
+import sqlite3
+import time
+from unittest import mock
+from storage.storage_localfs import LocalFsStorage
+from storage.storage_dedup import DedupStorage
+from storage.storage import Storage, openStorage
+
+try:
+    import boto3
+    from storage.storage_s3 import S3Storage
+    try:
+        from moto import mock_aws
+    except ImportError:
+        from moto import mock_s3 as mock_aws # moto < 5
+except ImportError:
+    mock_aws = None
+
+class TestLocalFsStorage(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self._storage = LocalFsStorage(self._tmpdir)
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def _createFile(self, path, content):
+        self._storage.put(io.BytesIO(content.encode()), path)
+
+    def test_list(self):
+        # given
+        self._createFile("/dir/b", "bb")
+        self._createFile("/dir/a/1", "a")
+        self._createFile("/dir/.hidden", "h")
+        self._createFile("/other/c", "c")
+
+        # when
+        files = self._storage.list("/dir")
+
+        # then
+        self.assertEqual(["/dir/a/1", "/dir/b"], sorted([f.path for f in files]))
+        self.assertEqual(2, [f.size for f in files if f.path == "/dir/b"][0])
+        self.assertEqual([], self._storage.list("/not-exists"))
+
+    def test_iterList_should_page_in_path_component_order(self):
+        # given
+        for path in ["/d/a.txt", "/d/a/2", "/d/a/1", "/d/b/x/1", "/d/c", "/d/b/y"]:
+            self._createFile(path, "v")
+        expected = ["/d/a/1", "/d/a/2", "/d/a.txt", "/d/b/x/1", "/d/b/y", "/d/c"]
+
+        # when
+        ordered = [f.path for f in self._storage.iterList("/d", sort=True)]
+
+        pages = []
+        startAfter = None
+        while True:
+            page = [f.path for f in self._storage.iterList("/d", sort=True, startAfter=startAfter, limit=2)]
+            if len(page) == 0:
+                break
+            pages.append(page)
+            startAfter = page[-1]
+
+        # then
+        self.assertEqual(expected, ordered)
+        self.assertEqual([expected[0:2], expected[2:4], expected[4:6]], pages)
+
+    def test_iterList_should_skip_unreadable_directory(self):
+        # given
+        for path in ["/d/a/1", "/d/a.txt", "/d/b/1", "/d/c"]:
+            self._createFile(path, "v")
+        scandir = os.scandir
+        def fakeScandir(path):
+            if path.endswith("/d/a"):
+                raise PermissionError(path)
+            return scandir(path)
+
+        # when
+        with mock.patch("storage.storage_localfs.os.scandir", fakeScandir):
+            files = [f.path for f in self._storage.iterList("/d", sort=True)]
+
+        # then files after the unreadable directory are still listed
+        self.assertEqual(["/d/a.txt", "/d/b/1", "/d/c"], files)
+
+    def test_put_and_copy_should_copy_from_the_current_position(self):
+        # given
+        srcPath = os.path.join(self._tmpdir, "src")
+        with open(srcPath, "wb") as f:
+            f.write(b"0123456789" * 1000)
+
+        # when
+        with open(srcPath, "rb") as f:
+            f.read(5)
+            self._storage.put(f, "/dst1")
+            self.assertEqual(b"", f.read())
+        self._storage.put(io.BytesIO(b"abc"), "/dst2")
+        self._storage.copy("/src", "/dir/dst3")
+        self._storage.copy("/src", "/dir/dst4", link=True)
+
+        # then
+        with open(os.path.join(self._tmpdir, "dst1"), "rb") as f:
+            self.assertEqual((b"0123456789" * 1000)[5:], f.read())
+        with open(os.path.join(self._tmpdir, "dst2"), "rb") as f:
+            self.assertEqual(b"abc", f.read())
+        for name in ["dir/dst3", "dir/dst4"]:
+            with open(os.path.join(self._tmpdir, name), "rb") as f:
+                self.assertEqual(b"0123456789" * 1000, f.read())
+        self.assertEqual(os.stat(srcPath).st_ino, os.stat(os.path.join(self._tmpdir, "dir/dst4")).st_ino)
+        self.assertNotEqual(os.stat(srcPath).st_ino, os.stat(os.path.join(self._tmpdir, "dir/dst3")).st_ino)
+
+    def test_get_should_read_byte_range_and_close(self):
+        # given
+        self._createFile("/file", "0123456789")
+
+        # when
+        with self._storage.get("/file") as f:
+            self.assertEqual(10, f.stat.size)
+            self.assertEqual(b"0123456789", f.read())
+        with self._storage.get("/file", offset=2, length=5) as ranged:
+            self.assertEqual(5, ranged.size)
+            self.assertEqual(b"234", ranged.read(3))
+            self.assertEqual(b"56", ranged.read())
+            ranged.seek(1)
+            self.assertEqual(b"3456", ranged.read())
+
+            # put copies only the range
+            ranged.seek(0)
+            self._storage.put(ranged, "/copy")
+
+        # then
+        self.assertTrue(f.closed)
+        self.assertTrue(ranged.closed)
+        with self._storage.get("/copy") as f:
+            self.assertEqual(b"23456", f.read())
+
+    def test_getMapped(self):
+        # given
+        self._createFile("/file", "0123456789")
+        self._createFile("/empty", "")
+
+        # then
+        with self._storage.getMapped("/file", offset=3, length=4) as m:
+            self.assertEqual(4, len(m))
+            self.assertEqual(b"3456", bytes(m.view))
+            self.assertEqual(b"45", bytes(m[1:3]))
+        with self._storage.getMapped("/empty") as m:
+            self.assertEqual(0, len(m))
+
+
+class TestDedupStorage(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self._storage = DedupStorage(self._tmpdir)
+
+    def tearDown(self):
+        self._storage.close()
+        shutil.rmtree(self._tmpdir)
+
+    def _blobCount(self):
+        return sum([len(files) for _, _, files in os.walk(os.path.join(self._tmpdir, "blobs"))])
+
+    def test_put_should_store_same_content_once(self):
+        # given
+        srcPath = os.path.join(self._tmpdir, "weights")
+        with open(srcPath, "wb") as f:
+            f.write(b"w" * 1000)
+
+        # when
+        for path in ["/eval1/model/weights", "/eval2/model/weights"]:
+            with open(srcPath, "rb") as f:
+                self._storage.put(f, path)
+        self._storage.put(io.BytesIO(b"w" * 1000), "/eval3/model/weights")
+        self._storage.put(io.BytesIO(b"score"), "/eval1/score")
+        self._storage.copy("/eval1/score", "/eval2/score")
+
+        # then
+        self.assertEqual(2, self._blobCount())
+        self.assertEqual((3000 + 10, 1000 + 5), self._storage.usage())
+        self.assertEqual(
+            ["/eval1/model/weights", "/eval1/score", "/eval2/model/weights", "/eval2/score"],
+            [f.path for f in self._storage.list("/eval1") + self._storage.list("/eval2/")]
+        )
+        self.assertEqual(["/eval2/model/weights"], [f.path for f in self._storage.iterList("/", startAfter="/eval1/score", limit=1)])
+        self.assertEqual(5, self._storage.stat("/eval2/score").size)
+        with self._storage.get("/eval3/model/weights", offset=998) as f:
+            self.assertEqual(b"ww", f.read())
+        with self._storage.getMapped("/eval2/score") as m:
+            self.assertEqual(b"score", bytes(m.view))
+
+    def test_when_commit_fails__then_blob_should_be_kept(self):
+        # given
+        self._storage.put(io.BytesIO(b"a"), "/1")
+        db = self._storage._db
+        class FailingCommit():
+            def execute(self, *args):
+                return db.execute(*args)
+            def __enter__(self):
+                return db.__enter__()
+            def __exit__(self, *exc):
+                db.rollback()
+                raise sqlite3.OperationalError("database is locked")
+
+        # when
+        self._storage._db = FailingCommit()
+        with self.assertRaises(sqlite3.OperationalError):
+            self._storage.delete("/1")
+        self._storage._db = db
+
+        # then the reference is rolled back, and its blob is still there
+        with self._storage.get("/1") as f:
+            self.assertEqual(b"a", f.read())
+
+    def test_blob_should_be_removed_with_last_reference(self):
+        # given
+        self._storage.put(io.BytesIO(b"a"), "/1")
+        self._storage.put(io.BytesIO(b"a"), "/2")
+        self._storage.put(io.BytesIO(b"b"), "/3")
+
+        # when overwritten and deleted
+        self._storage.put(io.BytesIO(b"b"), "/1")
+        self.assertEqual(2, self._blobCount())
+        self._storage.delete("/2")
+
+        # then
+        self.assertEqual(1, self._blobCount())
+        self.assertEqual((2, 1), self._storage.usage())
+        with self.assertRaises(FileNotFoundError):
+            self._storage.stat("/2")
+
+        # when reopened, a blob without reference is collected
+        self._storage.close()
+        orphan = os.path.join(self._tmpdir, "blobs", "00", "00orphan")
+        os.makedirs(os.path.dirname(orphan))
+        open(orphan, "wb").close()
+        self._storage = DedupStorage(self._tmpdir)
+
+        # then
+        self.assertEqual(1, self._storage.gc())
+        with self._storage.get("/1") as f:
+            self.assertEqual(b"b", f.read())
+
+    def test_when_gc__then_should_remove_stale_temporary_files_only(self):
+        # given temporary files of a killed put() and of a put() in progress
+        stale = os.path.join(self._tmpdir, "tmp", "stale")
+        recent = os.path.join(self._tmpdir, "tmp", "recent")
+        for path in [stale, recent]:
+            with open(path, "wb") as f:
+                f.write(b"partial")
+        old = time.time() - DedupStorage.TmpMaxAge - 60
+        os.utime(stale, (old, old))
+
+        # when
+        removed = self._storage.gc()
+
+        # then
+        self.assertEqual(1, removed)
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(recent))
+
+
+@unittest.skipIf(mock_aws == None, "boto3 and moto are required")
+class TestS3Storage(unittest.TestCase):
+    def setUp(self):
+        for k, v in [("AWS_ACCESS_KEY_ID", "test"), ("AWS_SECRET_ACCESS_KEY", "test"), ("AWS_DEFAULT_REGION", "us-east-1")]:
+            os.environ.setdefault(k, v)
+        self._mock = mock_aws()
+        self._mock.start()
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="artifacts")
+        # smallest part size of S3 multipart upload
+        self._storage = S3Storage("artifacts", "/luna/", client=client, chunkSize=5 * 1024 * 1024, multipartThreshold=5 * 1024 * 1024, concurrency=4)
+
+    def tearDown(self):
+        self._mock.stop()
+
+    def test_put_and_get_multipart(self):
+        # given
+        data = os.urandom(12 * 1024 * 1024)
+        src = io.BytesIO(b"header" + data)
+        src.seek(6)
+
+        # when
+        self._storage.put(src, "/eval/weights")
+        self._storage.copy("/eval/weights", "/eval/copy")
+
+        # then
+        stat = self._storage.stat("/eval/copy")
+        self.assertEqual(len(data), stat.size)
+        self.assertTrue(stat.etag.endswith("-3")) # uploaded in 3 parts
+        with self._storage.get("/eval/weights") as f:
+            self.assertEqual(len(data), f.size)
+            self.assertEqual(data, f.read())
+        with self._storage.get("/eval/weights", offset=10, length=5) as f:
+            self.assertEqual(data[10:15], f.read())
+        with self._storage.get("/eval/weights", offset=len(data)) as f:
+            self.assertEqual(b"", f.read())
+        with self._storage.getMapped("/eval/copy") as m:
+            self.assertEqual(data[-3:], bytes(m[-3:]))
+        with self._storage.getMapped("/eval/copy", offset=3, length=4) as m:
+            self.assertEqual(data[3:7], bytes(m.view))
+        with self.assertRaises(FileNotFoundError):
+            self._storage.stat("/missing")
+
+    def test_iterList_should_page(self):
+        # given
+        for path in ["/dir/b", "/dir/a/1", "/dir/a/2", "/dir.txt", "/other/c"]:
+            self._storage.put(io.BytesIO(b"x"), path)
+
+        # then
+        self.assertEqual(["/dir/a/1", "/dir/a/2", "/dir/b"], [f.path for f in self._storage.list("/dir")])
+        self.assertEqual(["/dir/a/2"], [f.path for f in self._storage.iterList("/dir/", startAfter="/dir/a/1", limit=1)])
+        self.assertEqual(5, len(self._storage.list("/")))
+
+class TestStorageInterface(unittest.TestCase):
+    def test_backend_without_every_method_should_not_be_created(self):
+        class PartialStorage(Storage):
+            def put(self, file, targetPath):
+                pass
+
+        with self.assertRaises(TypeError):
+            PartialStorage()
+
+class TestOpenStorage(unittest.TestCase):
+    def test_openStorage(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            # class names, storage package is imported as luna_ml.storage by openStorage
+            self.assertEqual("LocalFsStorage", type(openStorage(None)).__name__)
+            self.assertEqual("LocalFsStorage", type(openStorage(f"file://{tmpdir}")).__name__)
+            storage = openStorage(f"dedup://{tmpdir}")
+            self.assertEqual("DedupStorage", type(storage).__name__)
+            storage.close()
+            with self.assertRaises(ValueError):
+                openStorage("ftp://host/path")
+        finally:
+            shutil.rmtree(tmpdir)
@@ -0,0 +1,196 @@
+import unittest
+import tempfile, os, io
+import shutil
+import base64
+import gzip
+import tarfile
+from unittest import mock
+from task.executor import Executor
+from task.task import Task
+from task.transfer import Base64ChunkWriter, Base64ChunkReader, GzipWriter
+from task.codec import AutoCodec
+
+class FakeExecResp():
+    '''exec websocket of a process that reads stdin'''
+    def __init__(self, subprotocol="v5.channel.k8s.io", stdout=[]):
+        self.subprotocol = subprotocol
+        self.stdin = []
+        self.stdout = list(stdout) # chunks the process writes. it exits after
+        self.open = True
+        self.stdinClosed = False
+        self.returncode = 0
+
+    def write_stdin(self, data):
+        self.stdin.append(data)
+
+    def update(self, timeout=0):
+        if self.stdinClosed or len(self.stdout) == 0:
+            self.open = False # process exits at the end of stdin
+
+    def is_open(self):
+        return self.open
+
+    def peek_stdout(self):
+        return len(self.stdout) > 0
+
+    def read_stdout(self):
+        return self.stdout.pop(0)
+
+    def peek_stderr(self):
+        return False
+
+    def close_channel(self, channel):
+        self.stdinClosed = True
+
+    def close(self):
+        self.open = False
+
+class TestTransfer(unittest.TestCase):
+    def test_Base64ChunkWriter_should_send_fixed_size_chunks(self):
+        # given
+        chunks = []
+        data = os.urandom(10000)
+
+        # when written in odd sizes
+        with Base64ChunkWriter(chunks.append, chunkSize=400) as w:
+            for pos in range(0, len(data), 777):
+                w.write(data[pos:pos + 777])
+
+        # then
+        self.assertTrue(all([len(c) == 400 for c in chunks[:-1]]))
+        self.assertEqual(data, base64.b64decode(b"".join(chunks)))
+
+    def test_Base64ChunkReader_should_carry_over_incomplete_groups(self):
+        # given base64 with line breaks, split at odd positions
+        data = os.urandom(5000)
+        text = base64.encodebytes(data).decode()
+        chunks = [text[pos:pos + 333] for pos in range(0, len(text), 333)]
+
+        # when
+        with Base64ChunkReader(chunks) as r:
+            read = r.read()
+
+        # then
+        self.assertEqual(data, read)
+        with self.assertRaises(ValueError):
+            Base64ChunkReader(["YWJj", "ZA"]).read()
+
+    def test_GzipWriter(self):
+        out = io.BytesIO()
+        with GzipWriter(out, level=1) as w:
+            w.write(b"a" * 1000)
+            w.write(b"b")
+        self.assertEqual(b"a" * 1000 + b"b", gzip.decompress(out.getvalue()))
+
+class TestCopyDataToContainer(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self._exc = Executor(self._tmpdir, uploadCodec="gzip")
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def _createFile(self, path, content):
+        os.makedirs(os.path.dirname(f"{self._tmpdir}/{path}"), exist_ok=True)
+        with open(f"{self._tmpdir}/{path}", "wb") as f:
+            f.write(content)
+
+    def test_should_stream_tar_gz_in_base64_chunks(self):
+        # given
+        weights = os.urandom(3 * 1024 * 1024)
+        self._createFile("/model/weights", weights)
+        self._createFile("/model/conf/a.yaml", b"a: 1")
+        task = Task(taskId=1, image=["a", "b"], command=[None, None], copyToContainerBeforeStart=[("/model", "/workspace/model"), ("/empty", "/workspace")])
+        responses = []
+        def fakeStream(*args, **kwargs):
+            responses.append(FakeExecResp())
+            return responses[-1]
+
+        # when
+        with mock.patch("task.executor.stream", fakeStream):
+            self._exc._copyDataToContainer("default", "luna-1", "pre-task", task)
+
+        # then only the model dir is copied, and the 'done' file is created
+        self.assertEqual(2, len(responses))
+        chunks = responses[0].stdin
+        self.assertTrue(len(chunks) > 1)
+        self.assertTrue(max([len(c) for c in chunks]) <= 512 * 1024)
+        self.assertTrue(responses[0].stdinClosed)
+
+        with tarfile.open(fileobj=io.BytesIO(base64.b64decode(b"".join(chunks))), mode="r:gz") as tar:
+            self.assertEqual(weights, tar.extractfile("/weights").read())
+            self.assertEqual(b"a: 1", tar.extractfile("/conf/a.yaml").read())
+
+    def test_auto_codec_should_not_list_every_file_before_sending(self):
+        # given incompressible files, listed lazily
+        exc = Executor(self._tmpdir, uploadCodec="auto")
+        for i in range(5):
+            self._createFile(f"/model/w{i}", os.urandom(400 * 1024))
+        task = Task(taskId=1, image=["a", "b"], command=[None, None], copyToContainerBeforeStart=[("/model", "/workspace/model")])
+
+        listed = []
+        iterList = exc._storage.iterList
+        def countingIterList(*args, **kwargs):
+            for fileStat in iterList(*args, **kwargs):
+                listed.append(fileStat.path)
+                yield fileStat
+        exc._storage.iterList = countingIterList
+
+        listedAtFirstChunk = []
+        class Resp(FakeExecResp):
+            def write_stdin(self, data):
+                if len(self.stdin) == 0:
+                    listedAtFirstChunk.append(len(listed))
+                super().write_stdin(data)
+        responses = []
+        def fakeStream(*args, **kwargs):
+            responses.append(Resp())
+            return responses[-1]
+
+        # when
+        with mock.patch("task.executor.stream", fakeStream), mock.patch.object(AutoCodec, "MaxListed", 2):
+            exc._copyDataToContainer("default", "luna-1", "pre-task", task)
+
+        # then the first chunk is sent before the listing ends, without compression
+        self.assertTrue(listedAtFirstChunk[0] < 5)
+        with tarfile.open(fileobj=io.BytesIO(base64.b64decode(b"".join(responses[0].stdin))), mode="r:") as tar:
+            self.assertEqual(5, len(tar.getnames()))
+
+class TestCopyDataFromContainer(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self._exc = Executor(self._tmpdir)
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def test_should_extract_files_while_output_arrives(self):
+        # given output of the compress command of 'none' codec
+        files = {"./score/result.json": b'{"loss": 0.1}', "./.hidden": b"h", "./eval/big": os.urandom(1024 * 1024)}
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode="w") as tar:
+            dirInfo = tarfile.TarInfo("./eval")
+            dirInfo.type = tarfile.DIRTYPE
+            tar.addfile(dirInfo)
+            for name, content in files.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(content)
+                tar.addfile(info, io.BytesIO(content))
+        text = base64.encodebytes(b"N" + buf.getvalue()).decode() # header of 'none' codec
+        stdout = [text[pos:pos + 65537] for pos in range(0, len(text), 65537)]
+
+        task = Task(taskId=1, image=["a", "b"], command=[None, None], copyFromContainerAfterFinish=[("/workspace/eval", "/out")])
+        responses = []
+        def fakeStream(*args, **kwargs):
+            responses.append(FakeExecResp(stdout=stdout if len(responses) == 0 else []))
+            return responses[-1]
+
+        # when
+        with mock.patch("task.executor.stream", fakeStream):
+            self._exc._copyDataFromContainer("default", "luna-1", "post-task", task)
+
+        # then
+        self.assertEqual([], responses[0].stdout)
+        for name, content in files.items():
+            with open(f"{self._tmpdir}/out/{name[2:]}", "rb") as f:
+                self.assertEqual(content, f.read())
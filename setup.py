@@ -44,9 +44,17 @@ setuptools.setup(
         "PyYAML >= 5.4.1",
         "requests >= 2.25.1",
         "kubernetes >= 12.0.1",
-        "base64io >= 1.0.3",
-        "Jinja2 >= 2.11.3"
+        "Jinja2 >= 2.11.3",
+        "sortedcontainers >= 2.3.0"
     ],
+    extras_require={
+        # numpy arrays for ScoreFile.columns(). array.array is used without it
+        "numpy": ["numpy >= 1.19"],
+        # S3Storage
+        "s3": ["boto3 >= 1.16"],
+        # zstd transfer codec
+        "zstd": ["zstandard >= 0.15"]
+    },
     scripts=[
         'bin/luna-ml'
     ]